@@ -1,5 +1,5 @@
 
-import React, { useState, useCallback } from 'react';
+import React, { useState, useCallback, useEffect } from 'react';
 import { WorkspaceType, Member, Product, Target, CreditRecord } from './types';
 import { useMembers } from './hooks/useMembers';
 import { useProducts } from './hooks/useProducts';
@@ -17,18 +17,25 @@ import AdminPanel from './components/AdminPanel';
 import { ShoppingBag, Factory, ShieldCheck, Loader2, Settings } from 'lucide-react';
 
 const App: React.FC = () => {
-  const [workspace, setWorkspace] = useState<WorkspaceType | null>(null);
   const [activeTab, setActiveTab] = useState('dashboard');
   const [showAdmin, setShowAdmin] = useState(false);
 
   // 认证状态管理
-  const { user, isAuthenticated, isLoading, loginError, login, logout } = useAuth();
+  const { user, isAuthenticated, isLoading, loginError, login, logout, workspace, setWorkspace, bootstrap } = useAuth();
 
   // 通过自定义 Hooks 从后端加载数据
   const { members, setMembers, fetchMembers } = useMembers();
   const { products: currentProducts, setProducts: handleSetProducts, fetchProducts } = useProducts(workspace);
   const { targets: currentTargets, setTargets: handleSetTargets, fetchTargets } = useTargets(workspace);
 
+  // 首屏数据由 useAuth 通过一次 /api/bootstrap 请求取回，之后的刷新再走各自的接口
+  useEffect(() => {
+    if (!bootstrap) return;
+    setMembers(bootstrap.members);
+    handleSetProducts(bootstrap.products);
+    handleSetTargets(bootstrap.targets);
+  }, [bootstrap, setMembers, handleSetProducts, handleSetTargets]);
+
   /**
    * 信用事件触发器 — 调用后端 API 完成去重与积分计算。
    * 调用后自动刷新成员列表以同步最新积分。
@@ -132,8 +139,8 @@ const App: React.FC = () => {
     <Layout workspace={workspace} onBack={() => setWorkspace(null)} activeTab={activeTab} setActiveTab={setActiveTab} user={user} onLogout={logout}>
       {activeTab === 'dashboard' && <Dashboard members={members} products={currentProducts} targets={currentTargets} />}
       {activeTab === 'visualLab' && <VisualLab triggerCreditEvent={triggerCreditEvent} />}
-      {activeTab === 'productOps' && <ProductOps members={members} products={currentProducts} setProducts={handleSetProducts} workspace={workspace} triggerCreditEvent={triggerCreditEvent} />}
-      {activeTab === 'productLibrary' && <ProductLibrary products={currentProducts} setProducts={handleSetProducts} members={members} triggerCreditEvent={triggerCreditEvent} />}
+      {activeTab === 'productOps' && <ProductOps members={members} products={currentProducts} setProducts={handleSetProducts} workspace={workspace} triggerCreditEvent={triggerCreditEvent} refreshMembers={fetchMembers} />}
+      {activeTab === 'productLibrary' && <ProductLibrary products={currentProducts} setProducts={handleSetProducts} members={members} triggerCreditEvent={triggerCreditEvent} refreshMembers={fetchMembers} />}
       {activeTab === 'targetManager' && <TargetManager targets={currentTargets} setTargets={handleSetTargets} members={members} workspace={workspace} triggerCreditEvent={triggerCreditEvent} />}
     </Layout>
   );
@@ -1 +1,5 @@
 """FastAPI 后端包"""
+
+from .env import loadEnv
+
+loadEnv()
@@ -0,0 +1,181 @@
+"""
+准入控制中间件 — 按路由把请求划分为流量类别，每类有独立的并发上限（隔离舱）、
+每用户并发上限与每用户令牌桶限速；超限请求立即返回，不在服务端排队：
+  每用户超限（限速或并发）→ 429，整类并发已满 → 503，均带 Retry-After。
+请求的类别同时写入 trafficClass，上游调用据此进入 SupabaseRestClient 中对应的隔离舱，
+重请求（统计、导出、首屏聚合、批量导入）无法挤占信用事件上报等关键写入的连接预算。
+"""
+
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .auth_utils import verifyToken
+from .resilience import trafficClass
+from .serialization import dumps
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# 令牌桶最多保留的 (类别, 用户) 数量，超出时淘汰最久未用的
+MAX_TRACKED_USERS = 10000
+
+
+class TrafficClass:
+    def __init__(self, name: str, maxConcurrent: int, perUserConcurrent: int,
+                 rate: float, burst: int):
+        self.name = name
+        self.maxConcurrent = maxConcurrent
+        self.perUserConcurrent = perUserConcurrent
+        # 令牌桶：每秒补充 rate 个令牌，容量 burst
+        self.rate = rate
+        self.burst = burst
+        self.inflight = 0
+
+
+TRAFFIC_CLASSES = {
+    # 信用事件上报：保证有余量，不受重请求影响
+    "critical": TrafficClass("critical", maxConcurrent=64, perUserConcurrent=8, rate=20, burst=40),
+    # 全量读取与批量操作：并发与频率都严格限制。只放低频的页面级操作，
+    # 成员列表等在每次交互后都会刷新的核心读取留在 default，避免正常点击触发 429
+    "heavy": TrafficClass("heavy", maxConcurrent=4, perUserConcurrent=2, rate=1, burst=5),
+    "default": TrafficClass("default", maxConcurrent=128, perUserConcurrent=16, rate=30, burst=60),
+}
+
+# (方法, 路径, 类别)；方法为 None 表示任意方法，路径以 * 结尾表示前缀匹配，按顺序取第一个命中
+ROUTE_CLASSES = [
+    ("POST", "/api/credits/trigger", "critical"),
+    (None, "/api/admin/stats", "heavy"),
+    (None, "/api/export/*", "heavy"),
+    (None, "/api/bootstrap", "heavy"),
+    ("POST", "/api/products/import", "heavy"),
+    ("POST", "/api/products/alerts/scan", "heavy"),
+]
+
+# 不做准入控制的路径
+EXEMPT_PATHS = ("/api/health",)
+
+
+def classify(method: str, path: str) -> Optional[TrafficClass]:
+    if not path.startswith("/api/") or path in EXEMPT_PATHS or method == "OPTIONS":
+        return None
+    for routeMethod, pattern, name in ROUTE_CLASSES:
+        if routeMethod is not None and routeMethod != method:
+            continue
+        if pattern.endswith("*") and path.startswith(pattern[:-1]) or path == pattern:
+            return TRAFFIC_CLASSES[name]
+    return TRAFFIC_CLASSES["default"]
+
+
+def _identify(scope) -> str:
+    """已登录用户按 token 中的 sub 区分，否则按客户端地址；verifyToken 按 token 缓存，重复请求不再解码签名"""
+    for key, value in scope.get("headers", ()):
+        if key == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                payload = verifyToken(token)
+                if payload and payload.get("sub"):
+                    return f"user:{payload['sub']}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updatedAt", "inflight")
+
+    def __init__(self, burst: int):
+        self.tokens = float(burst)
+        self.updatedAt = time.monotonic()
+        self.inflight = 0
+
+
+class AdmissionController:
+    """
+    准入判定。中间件运行在事件循环中，计数器只在单线程内修改，无需加锁。
+    """
+
+    def __init__(self):
+        self._buckets: OrderedDict[tuple[str, str], _Bucket] = OrderedDict()
+        self.stats = {"admitted": 0, "rateLimited": 0, "userConcurrency": 0, "shed": 0}
+
+    def _bucket(self, cls: TrafficClass, user: str) -> _Bucket:
+        key = (cls.name, user)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(cls.burst)
+            if len(self._buckets) > MAX_TRACKED_USERS:
+                # 进行中的请求持有桶的引用，淘汰后仍能正确释放
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def admit(self, cls: TrafficClass, user: str) -> tuple[Optional[int], float, Optional[_Bucket]]:
+        """返回 (拒绝状态码或 None, Retry-After 秒数, 用户桶)"""
+        bucket = self._bucket(cls, user)
+        now = time.monotonic()
+        bucket.tokens = min(cls.burst, bucket.tokens + (now - bucket.updatedAt) * cls.rate)
+        bucket.updatedAt = now
+
+        if bucket.tokens < 1:
+            self.stats["rateLimited"] += 1
+            return 429, (1 - bucket.tokens) / cls.rate, None
+        if bucket.inflight >= cls.perUserConcurrent:
+            self.stats["userConcurrency"] += 1
+            return 429, 1.0, None
+        if cls.inflight >= cls.maxConcurrent:
+            self.stats["shed"] += 1
+            return 503, 1.0, None
+
+        bucket.tokens -= 1
+        bucket.inflight += 1
+        cls.inflight += 1
+        self.stats["admitted"] += 1
+        return None, 0.0, bucket
+
+    def release(self, cls: TrafficClass, bucket: _Bucket):
+        bucket.inflight -= 1
+        cls.inflight -= 1
+
+
+# 单例实例
+admissionController = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """ASGI 中间件：在路由处理前做准入判定，响应（含流式响应）发送完毕后释放占用"""
+
+    def __init__(self, app, controller: AdmissionController = admissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_ENABLED:
+            return await self.app(scope, receive, send)
+        cls = classify(scope["method"], scope["path"])
+        if cls is None:
+            return await self.app(scope, receive, send)
+
+        status, retryAfter, bucket = self.controller.admit(cls, _identify(scope))
+        if status is not None:
+            detail = "请求过于频繁，请稍后重试" if status == 429 else "服务繁忙，请稍后重试"
+            body = dumps({"detail": detail})
+            await send({
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(1, math.ceil(retryAfter))).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        token = trafficClass.set(cls.name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            trafficClass.reset(token)
+            self.controller.release(cls, bucket)
@@ -0,0 +1,180 @@
+"""
+商品预警扫描 — 每天早上为所有 Active 商品计算 alertLevel（normal / warning / critical），
+替代前端逐个商品读取后诊断。
+一个工作区的最近 ALERT_WINDOW + 1 天分析记录载入 (商品数 × 天数) 矩阵，阈值规则与趋势规则一次向量化求值：
+  roiCollapse  — 有推广花费且最新投产比低于 ALERT_ROI_FLOOR（critical），或较前几日均值下跌超过 ALERT_ROI_DROP（warning）
+  cvrDrop      — 最新转化率较前几日均值下跌超过 ALERT_CVR_DROP（warning）
+  adCostSpike  — 最新推广花费超过前几日均值的 ALERT_ADCOST_SPIKE 倍（warning，同时投产比下滑则为 critical）
+趋势规则至少需要 ALERT_MIN_HISTORY 天的历史。只有预警级别发生变化的商品才会写回。
+NumPy 为可选依赖，首次扫描时才导入，未安装时退回逐商品计算，结果一致。
+"""
+
+import math
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+from .database import USE_SUPABASE, pgList, supabase_client
+from .memory_store import memory_store
+
+TABLE = "products"
+WORKSPACES = ("Tmall", "TaoFactory")
+
+ALERT_WINDOW = int(os.getenv("ALERT_WINDOW", "7"))
+ALERT_MIN_HISTORY = int(os.getenv("ALERT_MIN_HISTORY", "3"))
+ALERT_ROI_FLOOR = float(os.getenv("ALERT_ROI_FLOOR", "1.0"))
+ALERT_ROI_DROP = float(os.getenv("ALERT_ROI_DROP", "0.5"))
+ALERT_CVR_DROP = float(os.getenv("ALERT_CVR_DROP", "0.4"))
+ALERT_ADCOST_SPIKE = float(os.getenv("ALERT_ADCOST_SPIKE", "2.0"))
+
+LEVELS = ("normal", "warning", "critical")
+METRICS = ("roi", "cvr", "adCost")
+
+SCAN_COLUMNS = "id,alertLevel,analysisRecords"
+
+
+@lru_cache(maxsize=None)
+def _numpy():
+    """首次扫描时才导入 numpy（可选依赖，未安装时返回 None，逐商品计算）"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _value(record: dict, field: str) -> float:
+    try:
+        value = record.get(field)
+        return math.nan if value is None else float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _series(product, field: str) -> list[float]:
+    """按日期取最近 ALERT_WINDOW + 1 天的指标，不足的天数在左侧以 NaN 补齐"""
+    records = sorted(
+        (r for r in product.get("analysisRecords") or [] if r.get("date")),
+        key=lambda r: r["date"],
+    )[-(ALERT_WINDOW + 1):]
+    values = [_value(r, field) for r in records]
+    return [math.nan] * (ALERT_WINDOW + 1 - len(values)) + values
+
+
+def _evaluateNumpy(series: dict[str, list[list[float]]]) -> tuple[list[int], list[list[str]]]:
+    np = _numpy()
+    latest, baseline, enough = {}, {}, None
+    for field in METRICS:
+        m = np.array(series[field], dtype=float).reshape(-1, ALERT_WINDOW + 1)
+        hist = m[:, :-1]
+        count = (~np.isnan(hist)).sum(axis=1)
+        latest[field] = m[:, -1]
+        baseline[field] = np.where(count > 0, np.nansum(hist, axis=1) / np.maximum(count, 1), np.nan)
+        if field == "roi":
+            enough = count >= ALERT_MIN_HISTORY
+
+    # NaN 参与的比较结果恒为 False，缺失数据不会触发规则
+    roiFloor = (latest["adCost"] > 0) & (latest["roi"] < ALERT_ROI_FLOOR)
+    roiDrop = enough & (latest["roi"] < baseline["roi"] * (1 - ALERT_ROI_DROP))
+    cvrDrop = enough & (baseline["cvr"] > 0) & (latest["cvr"] < baseline["cvr"] * (1 - ALERT_CVR_DROP))
+    spike = enough & (baseline["adCost"] > 0) & (latest["adCost"] > baseline["adCost"] * ALERT_ADCOST_SPIKE)
+    spikeCritical = spike & (latest["roi"] < baseline["roi"])
+
+    level = np.where(roiDrop | cvrDrop | spike, 1, 0)
+    level = np.where(roiFloor | spikeCritical, 2, level)
+    # 没有任何最新数据的商品不评级
+    level = np.where(np.isnan(latest["roi"]) & np.isnan(latest["cvr"]) & np.isnan(latest["adCost"]), -1, level)
+
+    flags = {"roiCollapse": roiFloor | roiDrop, "cvrDrop": cvrDrop, "adCostSpike": spike}
+    reasons = [[name for name, f in flags.items() if f[i]] for i in range(len(level))]
+    return level.tolist(), reasons
+
+
+def _evaluatePython(series: dict[str, list[list[float]]]) -> tuple[list[int], list[list[str]]]:
+    levels, reasons = [], []
+    for i in range(len(series["roi"])):
+        latest, baseline, count = {}, {}, 0
+        for field in METRICS:
+            row = series[field][i]
+            hist = [v for v in row[:-1] if not math.isnan(v)]
+            latest[field] = row[-1]
+            baseline[field] = sum(hist) / len(hist) if hist else math.nan
+            if field == "roi":
+                count = len(hist)
+        if all(math.isnan(v) for v in latest.values()):
+            levels.append(-1)
+            reasons.append([])
+            continue
+        enough = count >= ALERT_MIN_HISTORY
+        roiFloor = latest["adCost"] > 0 and latest["roi"] < ALERT_ROI_FLOOR
+        roiDrop = enough and latest["roi"] < baseline["roi"] * (1 - ALERT_ROI_DROP)
+        cvrDrop = enough and baseline["cvr"] > 0 and latest["cvr"] < baseline["cvr"] * (1 - ALERT_CVR_DROP)
+        spike = enough and baseline["adCost"] > 0 and latest["adCost"] > baseline["adCost"] * ALERT_ADCOST_SPIKE
+        spikeCritical = spike and latest["roi"] < baseline["roi"]
+
+        level = 1 if roiDrop or cvrDrop or spike else 0
+        if roiFloor or spikeCritical:
+            level = 2
+        levels.append(level)
+        flags = {"roiCollapse": roiFloor or roiDrop, "cvrDrop": cvrDrop, "adCostSpike": spike}
+        reasons.append([name for name, f in flags.items() if f])
+    return levels, reasons
+
+
+def evaluateAlerts(products: list[dict]) -> list[tuple[Optional[str], list[str]]]:
+    """对一批商品求值预警规则，返回 [(alertLevel 或 None, 触发的规则)]，与输入顺序一致"""
+    if not products:
+        return []
+    series = {field: [_series(p, field) for p in products] for field in METRICS}
+    levels, reasons = (_evaluateNumpy if _numpy() is not None else _evaluatePython)(series)
+    return [(LEVELS[lv] if lv >= 0 else None, rs) for lv, rs in zip(levels, reasons)]
+
+
+def scanWorkspace(workspace: str) -> dict:
+    """扫描一个工作区的 Active 商品，只写回预警级别发生变化的商品"""
+    if USE_SUPABASE:
+        products = supabase_client.select(
+            TABLE, columns=SCAN_COLUMNS,
+            filters={"workspace": f"eq.{workspace}", "status": "eq.Active"},
+        )
+    else:
+        products = memory_store.get_all(TABLE, {"workspace": workspace, "status": "Active"})
+
+    changed: dict[str, Optional[str]] = {}
+    counts = {level: 0 for level in LEVELS}
+    alerts = []
+    for product, (level, reasons) in zip(products, evaluateAlerts(products)):
+        if level is not None:
+            counts[level] += 1
+        if level != product.get("alertLevel"):
+            changed[product["id"]] = level
+        if level in ("warning", "critical"):
+            alerts.append({"id": product["id"], "alertLevel": level, "reasons": reasons})
+
+    if changed:
+        if USE_SUPABASE:
+            # 按目标级别分组，每个级别一次批量 PATCH
+            byLevel: dict[Optional[str], list[str]] = {}
+            for productId, level in changed.items():
+                byLevel.setdefault(level, []).append(productId)
+            for level, ids in byLevel.items():
+                supabase_client.update(TABLE, {"id": f"in.{pgList(ids)}"}, {"alertLevel": level})
+        else:
+            memory_store.modify_many(
+                TABLE, list(changed),
+                # 读-改-写期间级别已被其他写入改成目标值时跳过
+                lambda row: None if row.get("alertLevel") == changed[row["id"]]
+                else {"alertLevel": changed[row["id"]]},
+            )
+
+    return {"scanned": len(products), "changed": len(changed), **counts, "alerts": alerts}
+
+
+def runAlertScan(now: datetime) -> dict:
+    """定时任务：扫描所有工作区"""
+    summary: dict = {"date": now.date().isoformat()}
+    for workspace in WORKSPACES:
+        result = scanWorkspace(workspace)
+        summary[workspace] = {k: v for k, v in result.items() if k != "alerts"}
+    return summary
@@ -1,20 +1,17 @@
 """
 JWT 认证工具模块 — 提供 token 生成/验证和密码加密功能。
-使用 python-jose 实现 JWT，passlib 实现 bcrypt 密码哈希。
+使用 PyJWT 实现 JWT，bcrypt 直接实现密码哈希（与原 passlib 生成的 $2b$ 哈希兼容）。
+两个库都在首次使用时才导入，不计入进程启动的导入耗时。
+验证通过的 token 按原文缓存 payload，准入中间件、认证依赖与性能剖析对同一请求只需解码一次签名。
 """
 
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from jose import JWTError, jwt
-
-# 修复 passlib 与新版 bcrypt 的兼容性问题
-import bcrypt
-if not hasattr(bcrypt, '__about__'):
-    bcrypt.__about__ = type('about', (), {'__version__': bcrypt.__version__})()
-
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -24,8 +21,14 @@ ALGORITHM = "HS256"
 # token 有效期 7 天，减少频繁登录
 ACCESS_TOKEN_EXPIRE_DAYS = 7
 
-# 密码上下文 — 使用 bcrypt 加密
-passwordContext = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt 只使用密码的前 72 字节，与 passlib 的截断行为保持一致
+BCRYPT_MAX_BYTES = 72
+
+# 缓存验证结果的 token 数量上限，超出时淘汰最久未用的
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+
+_tokenCache: OrderedDict[str, dict] = OrderedDict()
+_tokenCacheLock = threading.Lock()
 
 # Bearer token 提取器
 bearerScheme = HTTPBearer(auto_error=False)
@@ -33,12 +36,18 @@ bearerScheme = HTTPBearer(auto_error=False)
 
 def hashPassword(password: str) -> str:
     """将明文密码加密为 bcrypt 哈希"""
-    return passwordContext.hash(password)
+    import bcrypt
+    return bcrypt.hashpw(password.encode("utf-8")[:BCRYPT_MAX_BYTES], bcrypt.gensalt()).decode("ascii")
 
 
 def verifyPassword(plainPassword: str, hashedPassword: str) -> bool:
     """验证明文密码是否匹配 bcrypt 哈希"""
-    return passwordContext.verify(plainPassword, hashedPassword)
+    import bcrypt
+    try:
+        return bcrypt.checkpw(plainPassword.encode("utf-8")[:BCRYPT_MAX_BYTES], hashedPassword.encode("ascii"))
+    except ValueError:
+        # 哈希格式无效
+        return False
 
 
 def createAccessToken(data: dict, expiresDelta: Optional[timedelta] = None) -> str:
@@ -49,19 +58,34 @@ def createAccessToken(data: dict, expiresDelta: Optional[timedelta] = None) -> s
     toEncode = data.copy()
     expire = datetime.now(timezone.utc) + (expiresDelta or timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS))
     toEncode.update({"exp": expire})
+    import jwt
     return jwt.encode(toEncode, SECRET_KEY, algorithm=ALGORITHM)
 
 
 def verifyToken(token: str) -> Optional[dict]:
     """
-    验证 JWT token 并返回 payload。
-    token 无效或过期时返回 None。
+    验证 JWT token 并返回 payload（副本，调用方可自由修改）。
+    token 无效或过期时返回 None。只缓存验证通过的 token，命中时仍按 exp 判断是否过期。
     """
+    with _tokenCacheLock:
+        payload = _tokenCache.get(token)
+        if payload is not None:
+            if payload.get("exp", float("inf")) > time.time():
+                _tokenCache.move_to_end(token)
+                return dict(payload)
+            del _tokenCache[token]
+            return None
+
+    import jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
+    except jwt.PyJWTError:
         return None
+    with _tokenCacheLock:
+        _tokenCache[token] = payload
+        if len(_tokenCache) > TOKEN_CACHE_SIZE:
+            _tokenCache.popitem(last=False)
+    return dict(payload)
 
 
 async def getCurrentUser(
@@ -0,0 +1,87 @@
+"""
+导入耗时基准 — 在全新子进程中导入 backend.main，测量冷启动的导入耗时并与预算比较，
+同时检查应当按需导入的重依赖没有在启动时被加载。超出预算或出现提前加载时以非零状态退出，可直接用于 CI。
+运行方式: python -m backend.bench_import [次数] [预算毫秒]
+预算默认取环境变量 IMPORT_BUDGET_MS（默认 1500 毫秒），取多次运行的中位数比较；最后列出自身耗时最高的模块。
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+# 只应在首次使用时导入的模块
+LAZY_MODULES = ("jwt", "bcrypt", "numpy", "PIL", "jose", "passlib", "dotenv")
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = (
+    "import sys, time\n"
+    "t = time.perf_counter()\n"
+    "import backend.main\n"
+    "ms = (time.perf_counter() - t) * 1000\n"
+    f"eager = [m for m in {LAZY_MODULES!r} if m in sys.modules]\n"
+    "print(f'{ms:.1f} ' + ','.join(eager))\n"
+)
+
+
+def _run(args: list[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=_ROOT, capture_output=True, text=True, check=True,
+    )
+
+
+def _measure() -> tuple[float, list[str]]:
+    lastLine = _run(["-c", _PROBE]).stdout.strip().splitlines()[-1]
+    ms, _, eager = lastLine.partition(" ")
+    return float(ms), [m for m in eager.split(",") if m]
+
+
+def _topModules(limit: int = 15) -> list[tuple[int, str]]:
+    """-X importtime 输出中自身耗时（不含子模块）最高的模块"""
+    stderr = _run(["-X", "importtime", "-c", "import backend.main"]).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        selfUs, _, name = line[len("import time:"):].split("|")
+        rows.append((int(selfUs), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else IMPORT_BUDGET_MS
+
+    # .env 存在时 python-dotenv 会在包初始化时被导入，属于预期行为
+    lazy = [m for m in LAZY_MODULES if not (m == "dotenv" and os.path.exists(os.path.join(_ROOT, "backend", ".env")))]
+
+    timings, eager = [], set()
+    for _ in range(runs):
+        ms, loaded = _measure()
+        timings.append(ms)
+        eager.update(m for m in loaded if m in lazy)
+    median = statistics.median(timings)
+
+    print(f"import backend.main: 中位数 {median:.1f} ms（{runs} 次: {', '.join(f'{t:.0f}' for t in timings)}）")
+    print(f"预算: {budget:.0f} ms")
+    print("\n自身耗时最高的模块:")
+    for selfUs, name in _topModules():
+        print(f"  {selfUs / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if eager:
+        print(f"\n[FAIL] 以下模块应按需导入，却在启动时被加载: {', '.join(sorted(eager))}")
+        failed = True
+    if median > budget:
+        print(f"\n[FAIL] 导入耗时 {median:.1f} ms 超出预算 {budget:.0f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("\n[OK] 导入耗时在预算内")
+
+
+if __name__ == "__main__":
+    main()
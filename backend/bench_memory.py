@@ -0,0 +1,78 @@
+"""
+MemoryStore 行内存基准 — 对比 dict 行与 __slots__ 紧凑记录的每行字节数。
+运行方式: python -m backend.bench_memory [行数]
+"""
+
+import json
+import sys
+import tracemalloc
+
+from .memory_store import make_row
+
+STATUSES = ["Pending", "Active", "Abandoned", "Maintenance", "Trashed"]
+EVENT_TYPES = ["TASK_COMPLETE", "DAY_COMPLETE", "GOAL_OVERDUE_PENALTY", "PUBLIC_POOL_TAKEN"]
+
+
+def _creditRecord(i: int) -> dict:
+    return {
+        "id": f"{i:08x}",
+        "userId": f"m{i % 20}",
+        "change": 2,
+        "reason": "完成运营任务步骤",
+        "eventType": EVENT_TYPES[i % len(EVENT_TYPES)],
+        "relatedId": f"p{i % 5000}",
+        "cycleKey": "default",
+        "createdAt": "2026-01-01T08:00:00",
+    }
+
+
+def _product(i: int) -> dict:
+    return {
+        "id": f"{i:08x}",
+        "name": f"商品{i}",
+        "productId": f"SKU{i}",
+        "image": "",
+        "storeName": "旗舰店",
+        "link": "",
+        "profitLink": None,
+        "imagePackagePath": None,
+        "operatorId": f"m{i % 20}",
+        "status": STATUSES[i % len(STATUSES)],
+        "workspace": "Tmall" if i % 2 else "TaoFactory",
+        "dayCount": i % 14,
+        "history": [],
+        "taskProgress": {},
+        "strategy": None,
+        "lifecycleStage": "new_arrival",
+        "lastUpdateDate": None,
+        "analysisRecords": [],
+    }
+
+
+def _measure(build, count: int, wrap) -> float:
+    """
+    每行常驻的平均字节数。
+    行先经 JSON 往返，模拟从请求体/数据库解析出的独立字符串对象。
+    """
+    payloads = [json.dumps(build(i), ensure_ascii=False) for i in range(count)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rows = [wrap(json.loads(p)) for p in payloads]
+    perRow = (tracemalloc.get_traced_memory()[0] - before) / count
+    del rows
+    tracemalloc.stop()
+    return perRow
+
+
+def run(count: int = 50_000):
+    print(f"rows per table: {count}")
+    print(f"{'table':<16}{'dict B/row':>12}{'record B/row':>14}{'saving':>9}")
+    for table, build in (("credit_records", _creditRecord), ("products", _product)):
+        dictPerRow = _measure(build, count, lambda row: row)
+        recordPerRow = _measure(build, count, lambda row: make_row(table, row))
+        saving = 1 - recordPerRow / dictPerRow
+        print(f"{table:<16}{dictPerRow:>12.0f}{recordPerRow:>14.0f}{saving:>8.0%}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
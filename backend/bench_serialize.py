@@ -0,0 +1,81 @@
+"""
+响应序列化基准 — 对比 response_model 校验路径与 FAST_RESPONSE 快速路径的各端点吞吐。
+运行方式: python -m backend.bench_serialize [商品数] [请求数]
+仅在内存模式下运行（不要配置 Supabase 凭证）。
+"""
+
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+from . import serialization
+from .main import app
+from .memory_store import memory_store
+
+
+def _seed(productCount: int):
+    for i in range(productCount):
+        memory_store.insert("products", {
+            "id": f"bench{i}",
+            "name": f"基准商品{i}",
+            "productId": f"SKU{i}",
+            "image": "",
+            "storeName": "旗舰店",
+            "link": "",
+            "operatorId": f"m{i % 4 + 1}",
+            "status": "Active",
+            "workspace": "Tmall",
+            "dayCount": i % 14,
+            "history": [
+                {"id": f"h{d}", "date": "2026-01-01", "dayIndex": d,
+                 "content": "完成当日运营任务", "images": [], "operatorName": "张三"}
+                for d in range(14)
+            ],
+            "taskProgress": {str(d): {"0": {"images": []}} for d in range(14)},
+            "analysisRecords": [
+                {"id": f"a{d}", "productId": f"bench{i}", "date": "2026-01-01",
+                 "uv": 1000, "payUsers": 30, "gmv": 2999.0, "adCost": 500.0,
+                 "cvr": 0.03, "roi": 6.0}
+                for d in range(30)
+            ],
+        })
+    for i in range(productCount // 10):
+        memory_store.insert("targets", {
+            "id": f"benchT{i}", "title": f"目标{i}", "type": "sales",
+            "priority": "Medium", "deadline": "2026-12-31",
+            "operatorId": "m1", "workspace": "Tmall",
+        })
+        memory_store.insert("credit_records", {
+            "id": f"benchC{i}", "userId": f"m{i % 4 + 1}", "change": 2,
+            "reason": "完成运营任务步骤", "eventType": "TASK_COMPLETE",
+            "relatedId": "", "cycleKey": "default", "createdAt": "2026-01-01T00:00:00",
+        })
+
+
+def _throughput(client: TestClient, path: str, requests: int) -> float:
+    client.get(path)
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(path)
+    return requests / (time.perf_counter() - start)
+
+
+def run(productCount: int = 500, requests: int = 30):
+    _seed(productCount)
+    client = TestClient(app)
+    endpoints = ["/api/products?workspace=Tmall", "/api/targets?workspace=Tmall", "/api/members"]
+    encoder = "orjson" if serialization.orjson is not None else "json"
+    print(f"products: {productCount}, requests/endpoint: {requests}, encoder: {encoder}")
+    print(f"{'endpoint':<32}{'validated req/s':>16}{'fast req/s':>12}{'speedup':>9}")
+    for path in endpoints:
+        serialization.FAST_RESPONSE = False
+        validated = _throughput(client, path, requests)
+        serialization.FAST_RESPONSE = True
+        fast = _throughput(client, path, requests)
+        print(f"{path:<32}{validated:>16.1f}{fast:>12.1f}{fast / validated:>8.1f}x")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -0,0 +1,207 @@
+"""
+内容寻址的图片存储 — 商品主图、运营日志与目标完成凭证的图片按 sha256 存放一次，
+行内只保留形如 /api/blobs/<hash> 的短引用，不再内联体积巨大的 data URL。
+相同内容重复上传直接复用已有文件；缩略图在后台线程池中生成（需安装 Pillow，未安装时只保存原图）。
+文件布局：BLOB_DIR/ab/cd/<hash>，元数据为同目录的 <hash>.json，缩略图为 <hash>.<variant>.jpg。
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Optional
+
+BLOB_DIR = os.getenv("BLOB_DIR", os.path.join(os.path.dirname(__file__), "data", "blobs"))
+MAX_BLOB_BYTES = int(os.getenv("BLOB_MAX_BYTES", str(10 * 1024 * 1024)))
+THUMBNAIL_WORKERS = int(os.getenv("BLOB_THUMBNAIL_WORKERS", "2"))
+
+# 缩略图规格：名称 -> 最长边像素
+THUMBNAIL_SIZES = {"sm": 160, "md": 480}
+
+REF_PREFIX = "/api/blobs/"
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+DATA_URL_PATTERN = re.compile(r"^data:(image/[\w.+-]+);base64,", re.IGNORECASE)
+
+# 只接受常见位图格式，并以文件头确认声明的类型；SVG/HTML 等可携带脚本的内容一律拒绝
+ALLOWED_TYPES = frozenset({"image/png", "image/jpeg", "image/webp", "image/gif"})
+TYPE_ALIASES = {"image/jpg": "image/jpeg", "image/pjpeg": "image/jpeg"}
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+@lru_cache(maxsize=None)
+def _pilImage():
+    """首次生成缩略图时才导入 Pillow（缩略图为可选功能，未安装时返回 None）"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+class BlobTooLarge(ValueError):
+    pass
+
+
+class UnsupportedBlobType(ValueError):
+    pass
+
+
+def normalizeType(contentType: str) -> str:
+    contentType = contentType.split(";")[0].strip().lower()
+    return TYPE_ALIASES.get(contentType, contentType)
+
+
+def sniffImageType(data: bytes) -> Optional[str]:
+    """按文件头识别允许的图片格式，无法识别时返回 None"""
+    for magic, contentType in IMAGE_SIGNATURES:
+        if data.startswith(magic):
+            return contentType
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def isBlobHash(value: str) -> bool:
+    return bool(HASH_PATTERN.match(value))
+
+
+class BlobStore:
+    def __init__(self, root: str = BLOB_DIR):
+        self.root = root
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    # ---- 路径 ----
+
+    def path(self, digest: str, variant: Optional[str] = None) -> str:
+        name = digest if variant is None else f"{digest}.{variant}.jpg"
+        return os.path.join(self.root, digest[:2], digest[2:4], name)
+
+    def _metaPath(self, digest: str) -> str:
+        return self.path(digest) + ".json"
+
+    def _atomicWrite(self, target: str, data: bytes):
+        """写入临时文件后原子替换，并发写同一内容时不会读到半个文件"""
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    # ---- 读写 ----
+
+    def put(self, data: bytes, contentType: Optional[str] = None) -> dict[str, Any]:
+        """
+        保存图片并返回元数据；内容已存在时直接返回已有记录。
+        文件头不是允许的位图格式、或与声明的 contentType 不符时抛出 UnsupportedBlobType，
+        保存的类型以文件头识别结果为准。
+        """
+        if len(data) > MAX_BLOB_BYTES:
+            raise BlobTooLarge(f"文件超过 {MAX_BLOB_BYTES} 字节上限")
+        sniffed = sniffImageType(data)
+        if sniffed is None or (contentType is not None and normalizeType(contentType) != sniffed):
+            raise UnsupportedBlobType(f"仅支持 {', '.join(sorted(ALLOWED_TYPES))} 图片")
+        contentType = sniffed
+        digest = hashlib.sha256(data).hexdigest()
+        meta = self.meta(digest)
+        if meta is not None:
+            return meta
+        meta = {
+            "hash": digest,
+            "ref": REF_PREFIX + digest,
+            "size": len(data),
+            "contentType": contentType,
+        }
+        self._atomicWrite(self.path(digest), data)
+        self._atomicWrite(self._metaPath(digest), json.dumps(meta).encode("utf-8"))
+        if _pilImage() is not None:
+            self._submitThumbnails(digest)
+        return meta
+
+    def meta(self, digest: str) -> Optional[dict[str, Any]]:
+        try:
+            with open(self._metaPath(digest), "rb") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def variantPath(self, digest: str, variant: str) -> Optional[str]:
+        """缩略图已生成时返回其路径"""
+        if variant not in THUMBNAIL_SIZES:
+            return None
+        p = self.path(digest, variant)
+        return p if os.path.exists(p) else None
+
+    # ---- 缩略图 ----
+
+    def _submitThumbnails(self, digest: str):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumb")
+        self._pool.submit(self._makeThumbnails, digest)
+
+    def _makeThumbnails(self, digest: str):
+        try:
+            with _pilImage().open(self.path(digest)) as img:
+                img = img.convert("RGB")
+                for variant, edge in THUMBNAIL_SIZES.items():
+                    thumb = img.copy()
+                    thumb.thumbnail((edge, edge))
+                    target = self.path(digest, variant)
+                    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".tmp-")
+                    with os.fdopen(fd, "wb") as f:
+                        thumb.save(f, "JPEG", quality=82, optimize=True)
+                    os.replace(tmp, target)
+        except Exception as e:
+            # 无法解码的图片只保留原图，读取缩略图时回退到原图
+            print(f"[WARN] 缩略图生成失败 {digest[:12]}: {e}")
+
+    # ---- data URL 外置 ----
+
+    def ingestDataUrl(self, value: str) -> str:
+        """
+        把 data:image/...;base64, 字符串存为 blob 并返回短引用；其他字符串原样返回。
+        超限或不是允许的位图格式时保留原值，不会以 blob 的形式从本站下发。
+        """
+        match = DATA_URL_PATTERN.match(value)
+        if not match:
+            return value
+        try:
+            data = base64.b64decode(value[match.end():], validate=False)
+        except (binascii.Error, ValueError):
+            return value
+        try:
+            return self.put(data, match.group(1).lower())["ref"]
+        except (BlobTooLarge, UnsupportedBlobType):
+            return value
+
+    def externalize(self, value: Any) -> Any:
+        """递归替换字符串、列表、字典中的图片 data URL 为短引用"""
+        if isinstance(value, str):
+            return self.ingestDataUrl(value) if value.startswith("data:") else value
+        if isinstance(value, list):
+            return [self.externalize(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self.externalize(v) for k, v in value.items()}
+        return value
+
+    def externalizeFields(self, data: dict, fields: tuple[str, ...]) -> dict:
+        """返回 fields 中图片 data URL 已替换为短引用的新 dict"""
+        changed = {f: self.externalize(data[f]) for f in fields if data.get(f)}
+        return {**data, **changed} if changed else data
+
+
+# 单例实例
+blobStore = BlobStore()
@@ -0,0 +1,46 @@
+"""
+乐观并发控制 — products / targets 行带 version 字段，每次写入递增。
+客户端以 If-Match 携带读到的版本号发起条件更新，版本不符时返回 409，
+无需先重新拉取列表或加锁即可安全地并发编辑。
+"""
+
+from typing import Optional
+
+from fastapi import HTTPException
+
+# 带 version 字段的表
+VERSIONED_TABLES = frozenset({"products", "targets"})
+
+
+class VersionConflict(Exception):
+    """条件更新的期望版本与行的当前版本不一致"""
+
+    def __init__(self, currentVersion: Optional[int]):
+        super().__init__(f"Version conflict, current version is {currentVersion}")
+        self.currentVersion = currentVersion
+
+    def __reduce__(self):
+        # 共享内存存储跨进程传回异常时保持构造参数
+        return (VersionConflict, (self.currentVersion,))
+
+
+def parseIfMatch(value: Optional[str]) -> Optional[int]:
+    """
+    解析 If-Match 头，接受 "3"、W/"3" 与 3 三种写法。
+    缺省或为 * 时返回 None，表示无条件更新。
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value in ("", "*"):
+        return None
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid If-Match header")
+
+
+def etag(version: Optional[int]) -> str:
+    return f'"{version or 1}"'
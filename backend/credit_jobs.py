@@ -0,0 +1,249 @@
+"""
+周期性信用任务 — 由调度器定时执行。
+扣分任务替代前端逐成员触发 /api/credits/trigger：每次执行只做一次索引查询找出候选数据，
+并通过 applyCreditEvents 一次性幂等写入，重复执行不会重复扣分。
+流水任务定期把冷数据归档并生成积分检查点，再以检查点 + 近期流水核对成员积分。
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from .database import USE_SUPABASE, pgList, supabase_client
+from .ids import newId
+from .memory_store import memory_store
+from .routers.credits import (
+    ARCHIVE_TABLE, CHECKPOINTS_TABLE, CREDITS_TABLE,
+    applyCreditEvents, buildCreditRecord, latestCheckpoints, replayCredit,
+)
+
+TARGETS_TABLE = "targets"
+MEMBERS_TABLE = "members"
+
+# 每周最少需要设定的目标数量
+WEEKLY_GOAL_MIN_COUNT = 5
+# 逾期目标每 3 天为一个扣分周期
+OVERDUE_CYCLE_DAYS = 3
+# 信用流水在热表中保留的天数，更早的流水归档并折算进检查点
+CREDIT_HOT_DAYS = int(os.getenv("CREDIT_HOT_DAYS", "90"))
+
+
+def _parseDeadline(deadline: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(deadline).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+
+def runOverduePenalties(now: datetime) -> dict:
+    """对逾期未完成的目标按周期扣分（GOAL_OVERDUE_PENALTY）"""
+    nowIso = now.isoformat(timespec="seconds")
+    if USE_SUPABASE:
+        # 命中 idx_target_open_deadline 部分索引
+        targets = supabase_client.select(
+            TARGETS_TABLE,
+            columns="id,operatorId,deadline",
+            filters={"completedAt": "is.null", "deadline": f"lt.{nowIso}"},
+        )
+    else:
+        # 与 Supabase 查询一致：completedAt 索引取出未完成目标，再筛选已过截止时间的
+        targets = [
+            t for t in memory_store.get_all(TARGETS_TABLE, {"completedAt": None})
+            if (t.get("deadline") or "") < nowIso
+        ]
+
+    records = []
+    for t in targets:
+        deadline = _parseDeadline(t.get("deadline"))
+        if deadline is None or deadline >= now or not t.get("operatorId"):
+            continue
+        cycleId = (now - deadline).days // OVERDUE_CYCLE_DAYS
+        records.append(buildCreditRecord(
+            t["operatorId"], "GOAL_OVERDUE_PENALTY",
+            relatedId=t["id"], cycleKey=f"cycle-{cycleId}",
+        ))
+
+    applied = applyCreditEvents(records)
+    return {"overdueTargets": len(records), "applied": len(applied)}
+
+
+def weekRange(now: datetime) -> tuple[datetime, datetime]:
+    """当前周（周日为第一天，与前端一致）的起止日期"""
+    start = (now - timedelta(days=(now.weekday() + 1) % 7)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    return start, start + timedelta(days=6)
+
+
+def runWeeklyGoalCheck(now: datetime) -> dict:
+    """本周目标数量不足的成员扣分（WEEKLY_GOAL_COUNT_INSUFFICIENT）"""
+    start, end = weekRange(now)
+    # 按周起始日所在的 ISO 周编号，跨月、跨年均唯一
+    isoYear, isoWeek, _ = start.isocalendar()
+    cycleKey = f"W{isoYear}-{isoWeek:02d}"
+    lo, hi = start.date().isoformat(), (end + timedelta(days=1)).date().isoformat()
+
+    if USE_SUPABASE:
+        members = supabase_client.select(MEMBERS_TABLE, columns="id")
+        targets = supabase_client.select(
+            TARGETS_TABLE,
+            columns="operatorId",
+            filters={"and": f"(deadline.gte.{lo},deadline.lt.{hi})"},
+        )
+    else:
+        members = memory_store.get_all(MEMBERS_TABLE)
+        targets = [
+            t for t in memory_store.get_all(TARGETS_TABLE)
+            if lo <= (t.get("deadline") or "") < hi
+        ]
+
+    counts: dict[str, int] = {}
+    for t in targets:
+        counts[t["operatorId"]] = counts.get(t["operatorId"], 0) + 1
+
+    records = [
+        buildCreditRecord(
+            m["id"], "WEEKLY_GOAL_COUNT_INSUFFICIENT",
+            cycleKey=cycleKey, data={"count": counts.get(m["id"], 0)},
+        )
+        for m in members
+        if counts.get(m["id"], 0) < WEEKLY_GOAL_MIN_COUNT
+    ]
+
+    applied = applyCreditEvents(records)
+    return {"cycleKey": cycleKey, "insufficientMembers": len(records), "applied": len(applied)}
+
+
+def _baseline(score: int, recent: list[dict]) -> int:
+    """
+    由当前积分与近期流水反推近期流水之前的积分。
+    截断到 0 会丢失信息，可能有多个基线重放后都得到当前积分，此时取最小的一个。
+    """
+    hi = max(0, score - sum(r["change"] for r in recent))
+    if replayCredit(0, recent) > score:
+        return hi  # 流水与积分本身不一致，交给对账报告
+    lo = 0
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if replayCredit(mid, recent) >= score:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def runLedgerCheckpoint(now: datetime) -> dict:
+    """
+    归档 CREDIT_HOT_DAYS 天之前的信用流水，并为涉及的成员写入检查点。
+    首个检查点的余额由当前积分与近期流水反推；之后在上一个检查点余额上重放归档流水。
+    """
+    cutoff = (now - timedelta(days=CREDIT_HOT_DAYS)).isoformat(timespec="seconds")
+
+    if USE_SUPABASE:
+        cold = supabase_client.select(
+            CREDITS_TABLE, filters={"createdAt": f"lt.{cutoff}"}, order="createdAt.asc"
+        )
+    else:
+        cold = [r for r in memory_store.get_all(CREDITS_TABLE) if r["createdAt"] < cutoff]
+    if not cold:
+        return {"cutoff": cutoff, "archived": 0, "checkpoints": 0}
+
+    byUser: dict[str, list] = {}
+    for r in cold:
+        byUser.setdefault(r["userId"], []).append(r)
+    previous = latestCheckpoints()
+
+    # 没有检查点的成员需要当前积分与近期流水来反推基线
+    newUsers = [u for u in byUser if u not in previous]
+    baselines: dict[str, int] = {}
+    if newUsers:
+        if USE_SUPABASE:
+            members = supabase_client.select(
+                MEMBERS_TABLE, columns="id,creditScore", filters={"id": f"in.{pgList(newUsers)}"}
+            )
+            recent = supabase_client.select(
+                CREDITS_TABLE, columns="userId,change,createdAt",
+                filters={"userId": f"in.{pgList(newUsers)}", "createdAt": f"gte.{cutoff}"},
+            )
+        else:
+            members = [m for m in memory_store.get_all(MEMBERS_TABLE) if m["id"] in byUser]
+            recent = [
+                r for u in newUsers for r in memory_store.get_all(CREDITS_TABLE, {"userId": u})
+                if r["createdAt"] >= cutoff
+            ]
+        recentByUser: dict[str, list] = {}
+        for r in recent:
+            recentByUser.setdefault(r["userId"], []).append(r)
+        baselines = {
+            m["id"]: _baseline(m.get("creditScore", 0), recentByUser.get(m["id"], []))
+            for m in members
+        }
+
+    createdAt = now.isoformat()
+    checkpoints = []
+    for userId, rows in byUser.items():
+        if userId in previous:
+            balance = replayCredit(previous[userId]["balance"], rows)
+        elif userId in baselines:
+            balance = baselines[userId]
+        else:
+            continue  # 成员已删除，流水随成员级联清理
+        checkpoints.append({
+            "id": newId(),
+            "userId": userId,
+            "balance": balance,
+            "cutoff": cutoff,
+            "archivedCount": len(rows),
+            "createdAt": createdAt,
+        })
+
+    # 先写归档与检查点，再删除热表中的流水；中途失败时重跑只会重复归档、不会丢数据
+    coldIds = [r["id"] for r in cold]
+    if USE_SUPABASE:
+        supabase_client.insert(ARCHIVE_TABLE, cold)
+        if checkpoints:
+            supabase_client.insert(CHECKPOINTS_TABLE, checkpoints)
+        for i in range(0, len(coldIds), 200):
+            supabase_client.delete(CREDITS_TABLE, {"id": f"in.{pgList(coldIds[i:i + 200])}"})
+    else:
+        memory_store.insert_many(ARCHIVE_TABLE, [dict(r) for r in cold])
+        if checkpoints:
+            memory_store.insert_many(CHECKPOINTS_TABLE, checkpoints)
+        memory_store.delete_many(CREDITS_TABLE, coldIds)
+
+    return {"cutoff": cutoff, "archived": len(cold), "checkpoints": len(checkpoints)}
+
+
+def runLedgerReconcile(now: datetime) -> dict:
+    """以 检查点余额 + 检查点之后的流水 核对 members.creditScore，返回不一致的成员"""
+    checkpoints = latestCheckpoints()
+    if not checkpoints:
+        return {"checked": 0, "mismatches": []}
+
+    if USE_SUPABASE:
+        members = supabase_client.select(
+            MEMBERS_TABLE, columns="id,creditScore", filters={"id": f"in.{pgList(checkpoints)}"}
+        )
+        tail = supabase_client.select(
+            CREDITS_TABLE, columns="userId,change,createdAt",
+            filters={"userId": f"in.{pgList(checkpoints)}"},
+        )
+    else:
+        members = [m for m in memory_store.get_all(MEMBERS_TABLE) if m["id"] in checkpoints]
+        tail = [r for u in checkpoints for r in memory_store.get_all(CREDITS_TABLE, {"userId": u})]
+
+    tailByUser: dict[str, list] = {}
+    for r in tail:
+        cp = checkpoints.get(r["userId"])
+        if cp and r["createdAt"] >= cp["cutoff"]:
+            tailByUser.setdefault(r["userId"], []).append(r)
+    expected = {u: replayCredit(cp["balance"], tailByUser.get(u, [])) for u, cp in checkpoints.items()}
+
+    mismatches = [
+        {"userId": m["id"], "creditScore": m.get("creditScore", 0), "expected": expected[m["id"]]}
+        for m in members
+        if m.get("creditScore", 0) != expected[m["id"]]
+    ]
+    if mismatches:
+        print(f"[WARN] 信用积分核对发现 {len(mismatches)} 名成员不一致: {mismatches[:5]}")
+    return {"checked": len(members), "mismatches": mismatches}
@@ -5,13 +5,19 @@ Supabase 数据库客户端初始化模块。
 """
 
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
 from typing import Optional
 import httpx
-from dotenv import load_dotenv
 
-# 加载 backend/ 目录下的 .env 文件
-load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+from .concurrency import VersionConflict
+from .resilience import (
+    Bulkhead, CircuitBreaker, LatencyTracker, UpstreamUnavailable, backoffDelay, trafficClass,
+)
+from .serialization import loads
 
+# backend/.env 由包初始化时统一加载（见 env.py）
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY", "")
 
@@ -21,14 +27,55 @@ USE_SUPABASE = bool(
     and SUPABASE_URL != "https://your-project.supabase.co"
 )
 
+# 上游调用弹性配置
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "15"))
+# 幂等读取失败后的最大重试次数（写入不重试）
+SUPABASE_READ_RETRIES = int(os.getenv("SUPABASE_READ_RETRIES", "2"))
+SUPABASE_RETRY_BASE = float(os.getenv("SUPABASE_RETRY_BASE", "0.1"))
+SUPABASE_RETRY_CAP = float(os.getenv("SUPABASE_RETRY_CAP", "2"))
+# 读取耗时超过该分位数仍未返回时发起对冲请求，0 表示关闭
+SUPABASE_HEDGE_PERCENTILE = float(os.getenv("SUPABASE_HEDGE_PERCENTILE", "0"))
+
+# 视为上游暂时故障、可以重试的状态码
+RETRYABLE_STATUS = {429, 502, 503, 504}
+# 各流量类别可同时占用的上游调用数（类别由准入中间件按路由划分，见 admission.py）
+UPSTREAM_BULKHEADS = {
+    "critical": int(os.getenv("UPSTREAM_BULKHEAD_CRITICAL", "8")),
+    "heavy": int(os.getenv("UPSTREAM_BULKHEAD_HEAVY", "4")),
+    "default": int(os.getenv("UPSTREAM_BULKHEAD_DEFAULT", "12")),
+}
+
+
+def pgList(values) -> str:
+    """构造 PostgREST 列表过滤值，如 in.(...) / not.in.(...) 中的 ("a","b")"""
+    return "(" + ",".join(f'"{v}"' for v in sorted(set(values))) + ")"
+
+
+class _Flight:
+    """一次进行中的上游读请求，后到的相同请求等待其结果"""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: list[dict] = []
+        self.error: Optional[BaseException] = None
+
 
 class SupabaseRestClient:
     """
     轻量 Supabase REST 客户端，通过 PostgREST API 操作数据。
     不依赖 supabase-py SDK，兼容所有密钥格式。
+    相同参数的并发 select 会合并为一次上游请求（singleflight），结果行在等待者之间共享，
+    调用方不得原地修改 select 返回的行。
+    客户端是同步阻塞的：调用它的路由处理函数需声明为普通 def，由 FastAPI 放入线程池执行，
+    否则上游等待、重试退避都会占住事件循环，并发请求也无法同时进入合并读。
+    上游调用带熔断器；幂等读取按抖动退避重试，并可在超过延迟分位后发起对冲请求。
+    transport 参数可注入自定义 httpx 传输层（如故障注入的本地替身）。
     """
 
-    def __init__(self, url: str, key: str):
+    def __init__(self, url: str, key: str, transport: Optional[httpx.BaseTransport] = None,
+                 breaker: Optional[CircuitBreaker] = None):
         self.base_url = f"{url}/rest/v1"
         self.headers = {
             "apikey": key,
@@ -36,6 +83,69 @@ class SupabaseRestClient:
             "Content-Type": "application/json",
             "Prefer": "return=representation",
         }
+        self._http = httpx.Client(
+            headers=self.headers,
+            timeout=SUPABASE_TIMEOUT,
+            transport=transport,
+            verify=False  # Disable SSL verification to avoid proxy/firewall issues
+        )
+        self.breaker = breaker or CircuitBreaker()
+        self.bulkheads = {name: Bulkhead(limit) for name, limit in UPSTREAM_BULKHEADS.items()}
+        self.latency = LatencyTracker()
+        self.readRetries = SUPABASE_READ_RETRIES
+        self.hedgePercentile = SUPABASE_HEDGE_PERCENTILE
+        self._hedgePool: Optional[ThreadPoolExecutor] = None
+        self._inflight: dict[tuple, _Flight] = {}
+        self._inflightLock = threading.Lock()
+        # upstreamReads: 实际发往上游的读请求数；coalescedReads: 被合并而节省的请求数
+        # retries / hedgedReads / rejected: 重试次数、对冲次数、熔断拒绝次数
+        self.stats = {
+            "upstreamReads": 0, "coalescedReads": 0,
+            "retries": 0, "hedgedReads": 0, "rejected": 0,
+        }
+        # 本实例经由该客户端的写入计数，作为响应缓存的表版本令牌；
+        # 存储过程可能修改任意表，计入 _rpcWrites 并叠加到所有表的版本上
+        self._writeCounts: dict[str, int] = {}
+        self._rpcWrites = 0
+
+    def _count(self, name: str):
+        """统计计数会被多个工作线程同时更新，与合并读计数共用一把锁"""
+        with self._inflightLock:
+            self.stats[name] += 1
+
+    def _send(self, method: str, url: str, params: dict,
+              json_data: Optional[dict | list], headers: Optional[dict] = None) -> httpx.Response:
+        start = time.monotonic()
+        resp = self._http.request(method, url, params=params, json=json_data, headers=headers)
+        if resp.status_code < 500:
+            self.latency.record(time.monotonic() - start)
+        return resp
+
+    def _hedgedSend(self, method: str, url: str, params: dict) -> httpx.Response:
+        """
+        对冲读取：首个请求超过历史延迟分位仍未返回时，再并行发起一次相同请求，取先成功者。
+        样本不足或未开启时退化为普通请求。
+        """
+        delay = self.latency.percentile(self.hedgePercentile) if self.hedgePercentile else None
+        if delay is None:
+            return self._send(method, url, params, None)
+        if self._hedgePool is None:
+            self._hedgePool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+        first = self._hedgePool.submit(self._send, method, url, params, None)
+        try:
+            return first.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        self._count("hedgedReads")
+        second = self._hedgePool.submit(self._send, method, url, params, None)
+        error: Optional[BaseException] = None
+        for future in as_completed([first, second]):
+            try:
+                return future.result()
+            except Exception as e:
+                error = e
+        raise error
 
     def _request(
         self,
@@ -43,22 +153,56 @@ class SupabaseRestClient:
         table: str,
         params: Optional[dict] = None,
         json_data: Optional[dict | list] = None,
+        headers: Optional[dict] = None,
     ) -> list[dict]:
-        """发送 HTTP 请求到 PostgREST 端点"""
+        """
+        发送 HTTP 请求到 PostgREST 端点，headers 覆盖客户端的默认请求头。
+        整个调用（含重试）占用当前流量类别隔离舱的一个位置，隔离舱已满时快速抛出 UpstreamUnavailable。
+        """
+        bulkhead = self.bulkheads.get(trafficClass.get()) or self.bulkheads["default"]
+        with bulkhead.slot():
+            return self._requestWithRetries(method, table, params, json_data, headers)
+
+    def _requestWithRetries(
+        self,
+        method: str,
+        table: str,
+        params: Optional[dict],
+        json_data: Optional[dict | list],
+        headers: Optional[dict] = None,
+    ) -> list[dict]:
+        """传输错误与 429/5xx 计入熔断器失败；GET 在这些情况下退避重试，写入直接抛出"""
         url = f"{self.base_url}/{table}"
-        resp = httpx.request(
-            method,
-            url,
-            headers=self.headers,
-            params=params or {},
-            json=json_data,
-            timeout=15.0,
-            verify=False  # Disable SSL verification to avoid proxy/firewall issues
-        )
-        resp.raise_for_status()
-        if resp.status_code == 204 or not resp.text:
-            return []
-        return resp.json()
+        params = params or {}
+        idempotent = method == "GET"
+        attempts = 1 + (self.readRetries if idempotent else 0)
+
+        for attempt in range(attempts):
+            try:
+                self.breaker.allow()
+            except UpstreamUnavailable:
+                self._count("rejected")
+                raise
+            try:
+                if idempotent:
+                    resp = self._hedgedSend(method, url, params)
+                else:
+                    resp = self._send(method, url, params, json_data, headers)
+            except httpx.TransportError:
+                self.breaker.record(False)
+                if attempt + 1 >= attempts:
+                    raise
+            else:
+                failed = resp.status_code in RETRYABLE_STATUS or resp.status_code >= 500
+                self.breaker.record(not failed)
+                if not failed or attempt + 1 >= attempts:
+                    resp.raise_for_status()
+                    if resp.status_code == 204 or not resp.content:
+                        return []
+                    return loads(resp.content)
+            self._count("retries")
+            # 处理函数运行在线程池中，阻塞退避只占用当前工作线程，不会卡住事件循环
+            time.sleep(backoffDelay(attempt, SUPABASE_RETRY_BASE, SUPABASE_RETRY_CAP))
 
     # ---- 查询 ----
 
@@ -76,29 +220,119 @@ class SupabaseRestClient:
             params["order"] = order
         if limit:
             params["limit"] = str(limit)
-        return self._request("GET", table, params=params)
+        return self._coalescedGet(table, params)
+
+    def _coalescedGet(self, table: str, params: dict) -> list[dict]:
+        """合并进行中的相同读请求：首个调用方请求上游，其余调用方等待并共享结果"""
+        key = (table, tuple(sorted(params.items())))
+        with self._inflightLock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.stats["upstreamReads"] += 1
+            else:
+                self.stats["coalescedReads"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return list(flight.result)
+
+        try:
+            flight.result = self._request("GET", table, params=params)
+            return list(flight.result)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._inflightLock:
+                self._inflight.pop(key, None)
+            flight.done.set()
 
     # ---- 写入 ----
 
-    def insert(self, table: str, data: dict) -> list[dict]:
-        """INSERT 一条记录"""
-        return self._request("POST", table, json_data=data)
+    def writeVersion(self, table: str) -> int:
+        """表的本地写入版本号，每次经由本客户端的写入后递增"""
+        return self._writeCounts.get(table, 0) + self._rpcWrites
+
+    def _bumpVersion(self, table: str):
+        with self._inflightLock:
+            self._writeCounts[table] = self._writeCounts.get(table, 0) + 1
+
+    def insert(self, table: str, data: dict | list[dict],
+               ignoreConflicts: Optional[str] = None) -> list[dict]:
+        """
+        INSERT 记录，传入列表时为一次请求批量插入。
+        ignoreConflicts 为唯一约束的列（逗号分隔）时，与已有行冲突的记录被数据库跳过（ON CONFLICT DO NOTHING），
+        返回值只包含实际插入的行。
+        """
+        params, headers = None, None
+        if ignoreConflicts:
+            params = {"on_conflict": ignoreConflicts}
+            headers = {"Prefer": "return=representation,resolution=ignore-duplicates"}
+        try:
+            return self._request("POST", table, params=params, json_data=data, headers=headers)
+        finally:
+            self._bumpVersion(table)
+
+    def update(self, table: str, filters: dict, data: dict,
+               expectedVersion: Optional[int] = None) -> list[dict]:
+        """
+        UPDATE 记录，filters 为 PostgREST 过滤条件。
+        给定 expectedVersion 时附加 version=eq.N 条件（版本号由数据库触发器递增）；
+        未更新到任何行而行仍存在时说明版本已变，抛出 VersionConflict。
+        """
+        try:
+            return self._conditionalUpdate(table, filters, data, expectedVersion)
+        finally:
+            self._bumpVersion(table)
 
-    def update(self, table: str, filters: dict, data: dict) -> list[dict]:
-        """UPDATE 记录，filters 为 PostgREST 过滤条件"""
-        return self._request("PATCH", table, params=filters, json_data=data)
+    def _conditionalUpdate(self, table: str, filters: dict, data: dict,
+                           expectedVersion: Optional[int]) -> list[dict]:
+        if expectedVersion is None:
+            return self._request("PATCH", table, params=filters, json_data=data)
+        rows = self._request(
+            "PATCH", table, params={**filters, "version": f"eq.{expectedVersion}"}, json_data=data
+        )
+        if not rows:
+            current = self._request("GET", table, params={**filters, "select": "version"})
+            if current:
+                raise VersionConflict(current[0].get("version"))
+        return rows
 
     def delete(self, table: str, filters: dict) -> list[dict]:
         """DELETE 记录"""
-        return self._request("DELETE", table, params=filters)
+        try:
+            return self._request("DELETE", table, params=filters)
+        finally:
+            self._bumpVersion(table)
+
+    # ---- 存储过程 ----
+
+    def rpc(self, function: str, params: Optional[dict] = None) -> list[dict]:
+        """调用 PostgreSQL 函数（POST /rpc/{function}），用于集合式批量更新"""
+        try:
+            return self._request("POST", f"rpc/{function}", json_data=params or {})
+        finally:
+            with self._inflightLock:
+                self._rpcWrites += 1
 
 
-# 初始化客户端
+# 初始化客户端（不在导入时发起网络请求，连接测试见 checkConnection）
 supabase_client: Optional[SupabaseRestClient] = None
 
 if USE_SUPABASE:
     supabase_client = SupabaseRestClient(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-    # 通过一个简单请求测试连接
+else:
+    print("[WARN] Supabase not configured, using in-memory storage")
+
+
+def checkConnection():
+    """通过一个简单请求测试 Supabase 连接；由应用启动后在后台调用，只输出诊断信息"""
+    if supabase_client is None:
+        return
     try:
         supabase_client.select("members", limit=1)
         print("[OK] Supabase connected and 'members' table exists")
@@ -111,5 +345,3 @@ if USE_SUPABASE:
     except Exception as e:
         print(f"[WARN] Supabase connection test failed: {e}")
         print("[INFO] Will retry on first actual request")
-else:
-    print("[WARN] Supabase not configured, using in-memory storage")
@@ -0,0 +1,422 @@
+"""
+AI 诊断任务队列 — 商品数据分析记录（analysisRecords）的 aiDiagnosis 改由后端生成，
+不再依赖浏览器逐条调用模型后回写。
+待诊断记录进入队列，调度线程在 DIAGNOSIS_BATCH_WAIT 秒内凑满至多 DIAGNOSIS_BATCH_SIZE 条后合并为一次模型调用，
+同时进行的模型调用不超过 DIAGNOSIS_CONCURRENCY；结果按“指标哈希”缓存，指标相同的记录直接复用。
+模型客户端可插拔：DIAGNOSIS_PROVIDER=gemini 时调用 Gemini REST API，默认 local 为确定性的本地规则实现，
+便于开发与测试。诊断结果按商品合并后一次写回。
+"""
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional, Protocol
+
+import httpx
+
+from .concurrency import VersionConflict
+from .database import USE_SUPABASE, supabase_client
+from .ids import newId
+from .memory_store import memory_store
+from .serialization import loads
+
+TABLE = "products"
+WORKSPACES = ("Tmall", "TaoFactory")
+
+DIAGNOSIS_PROVIDER = os.getenv("DIAGNOSIS_PROVIDER", "local").lower()
+DIAGNOSIS_MODEL = os.getenv("DIAGNOSIS_MODEL", "gemini-2.5-flash")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+BATCH_SIZE = int(os.getenv("DIAGNOSIS_BATCH_SIZE", "16"))
+BATCH_WAIT = float(os.getenv("DIAGNOSIS_BATCH_WAIT", "0.5"))
+CONCURRENCY = int(os.getenv("DIAGNOSIS_CONCURRENCY", "2"))
+CACHE_SIZE = int(os.getenv("DIAGNOSIS_CACHE_SIZE", "5000"))
+# 保留最近多少个任务的状态供查询
+JOB_HISTORY = 2000
+WRITE_RETRIES = 3
+
+# 记录中不参与诊断的字段，其余字段均视为指标
+NON_METRIC_FIELDS = ("id", "productId", "date", "aiDiagnosis")
+
+
+def recordMetrics(record: dict) -> dict:
+    return {k: v for k, v in record.items() if k not in NON_METRIC_FIELDS}
+
+
+def metricsHash(item: dict, clientName: str) -> str:
+    """按模型与规范化后的指标、生命周期阶段计算缓存键"""
+    canonical = json.dumps(
+        {"client": clientName, "stage": item.get("lifecycleStage"), "metrics": item["metrics"]},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# ============== 模型客户端 ==============
+
+class DiagnosisClient(Protocol):
+    name: str
+
+    def diagnose(self, items: list[dict]) -> list[dict]:
+        """items 为 [{key, productName, lifecycleStage, metrics}]，按相同顺序返回 AIDiagnosis 字典"""
+        ...
+
+
+def _num(metrics: dict, key: str) -> float:
+    try:
+        return float(metrics.get(key) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class LocalDiagnosisClient:
+    """确定性的本地规则诊断：相同指标总得到相同结果，不访问网络"""
+
+    name = "local"
+
+    def diagnose(self, items: list[dict]) -> list[dict]:
+        return [self._diagnoseOne(item["metrics"]) for item in items]
+
+    @staticmethod
+    def _diagnoseOne(m: dict) -> dict:
+        roi, cvr, uv, adCost = _num(m, "roi"), _num(m, "cvr"), _num(m, "uv"), _num(m, "adCost")
+        score = round(40 + min(roi, 5) * 8 + min(cvr, 10) * 2)
+        if uv == 0:
+            score = min(score, 30)
+        score = max(0, min(100, score))
+
+        if adCost > 0 and roi < 1:
+            alert, summary = "critical", f"投产比 {roi:.2f} 低于 1，推广处于亏损状态"
+            suggestion = "立即收缩低效关键词出价，排查主图点击率与详情页转化"
+        elif uv == 0:
+            alert, summary = "warning", "当日无访客数据，链接可能未获得曝光"
+            suggestion = "检查商品上架状态与推广计划是否正常投放"
+        elif score < 60:
+            alert, summary = "warning", f"转化率 {cvr:.2f}% 偏低，整体表现一般"
+            suggestion = "优化主图与 SKU 价格梯度，补充评价与买家秀"
+        else:
+            alert, summary = "normal", f"投产比 {roi:.2f}、转化率 {cvr:.2f}%，运营状态健康"
+            suggestion = "保持当前节奏，可逐步放量测试新关键词"
+        return {"score": score, "summary": summary, "suggestion": suggestion, "alertLevel": alert}
+
+
+class GeminiDiagnosisClient:
+    """通过 Gemini REST API 批量诊断：一次请求携带整批记录，要求按 key 返回 JSON 数组"""
+
+    name = "gemini"
+    ENDPOINT = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+
+    def __init__(self, apiKey: str, model: str = DIAGNOSIS_MODEL, timeout: float = 60):
+        self.model = model
+        self.name = f"gemini:{model}"
+        self._http = httpx.Client(timeout=timeout, headers={"x-goog-api-key": apiKey})
+
+    def _prompt(self, items: list[dict]) -> str:
+        lines = [
+            "你是一位顶尖电商运营总监。逐条分析以下商品的当日数据，",
+            "对每条记录输出 {key, score(0-100), summary(一句话核心评价), "
+            "suggestion(战术性排查或优化建议), alertLevel(normal|warning|critical)}，",
+            "以 JSON 数组返回，key 与输入一致。",
+        ]
+        for item in items:
+            lines.append(json.dumps({
+                "key": item["key"],
+                "product": item.get("productName", ""),
+                "lifecycleStage": item.get("lifecycleStage") or "新推期",
+                "metrics": item["metrics"],
+            }, ensure_ascii=False, default=str))
+        return "\n".join(lines)
+
+    def diagnose(self, items: list[dict]) -> list[dict]:
+        resp = self._http.post(
+            self.ENDPOINT.format(model=self.model),
+            json={
+                "contents": [{"parts": [{"text": self._prompt(items)}]}],
+                "generationConfig": {"responseMimeType": "application/json"},
+            },
+        )
+        resp.raise_for_status()
+        text = resp.json()["candidates"][0]["content"]["parts"][0]["text"]
+        byKey = {r.get("key"): r for r in loads(text) if isinstance(r, dict)}
+        results = []
+        for item in items:
+            r = byKey.get(item["key"])
+            if r is None:
+                raise ValueError(f"模型未返回记录 {item['key']} 的诊断")
+            results.append({
+                "score": int(r.get("score", 0)),
+                "summary": str(r.get("summary", "")),
+                "suggestion": str(r.get("suggestion", "")),
+                "alertLevel": r.get("alertLevel") if r.get("alertLevel") in ("normal", "warning", "critical") else "normal",
+            })
+        return results
+
+
+def defaultClient() -> DiagnosisClient:
+    if DIAGNOSIS_PROVIDER == "gemini" and GEMINI_API_KEY:
+        return GeminiDiagnosisClient(GEMINI_API_KEY)
+    if DIAGNOSIS_PROVIDER == "gemini":
+        print("[WARN] DIAGNOSIS_PROVIDER=gemini 但未配置 GEMINI_API_KEY，使用本地规则诊断")
+    return LocalDiagnosisClient()
+
+
+# ============== 任务队列 ==============
+
+class DiagnosisJob:
+    __slots__ = ("id", "productId", "recordId", "item", "hash", "status",
+                 "diagnosis", "error", "createdAt", "finishedAt")
+
+    def __init__(self, productId: str, recordId: str, item: dict, digest: str):
+        self.id = newId()
+        self.productId = productId
+        self.recordId = recordId
+        self.item = item
+        self.hash = digest
+        self.status = "queued"
+        self.diagnosis: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.createdAt = datetime.now().isoformat()
+        self.finishedAt: Optional[str] = None
+
+    def toDict(self) -> dict:
+        return {
+            "jobId": self.id,
+            "productId": self.productId,
+            "recordId": self.recordId,
+            "status": self.status,
+            "diagnosis": self.diagnosis,
+            "error": self.error,
+            "createdAt": self.createdAt,
+            "finishedAt": self.finishedAt,
+        }
+
+
+class DiagnosisQueue:
+    def __init__(self, client: Optional[DiagnosisClient] = None):
+        self.client = client or defaultClient()
+        self._pending: queue.Queue[Optional[DiagnosisJob]] = queue.Queue()
+        self._jobs: OrderedDict[str, DiagnosisJob] = OrderedDict()
+        self._cache: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        # 调度线程在提交批次前获取，限制同时进行的模型调用数
+        self._slots = threading.BoundedSemaphore(CONCURRENCY)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        self.stats = {"submitted": 0, "cacheHits": 0, "batches": 0, "modelItems": 0, "failed": 0}
+
+    def _count(self, name: str, n: int = 1):
+        """统计计数由请求线程与批次线程同时更新，统一在锁内累加"""
+        with self._lock:
+            self.stats[name] += n
+
+    def setClient(self, client: DiagnosisClient):
+        """替换模型客户端（缓存键包含客户端名，不同模型的结果互不复用）"""
+        self.client = client
+
+    # ---- 提交 ----
+
+    def submit(self, product, records: list[dict]) -> list[DiagnosisJob]:
+        """为商品的若干分析记录创建诊断任务；命中缓存的记录立即完成并写回"""
+        jobs, cached = [], []
+        for record in records:
+            item = {
+                "key": record["id"],
+                "productName": product.get("name", ""),
+                "lifecycleStage": product.get("lifecycleStage"),
+                "metrics": recordMetrics(record),
+            }
+            job = DiagnosisJob(product["id"], record["id"], item, metricsHash(item, self.client.name))
+            with self._lock:
+                self._jobs[job.id] = job
+                while len(self._jobs) > JOB_HISTORY:
+                    self._jobs.popitem(last=False)
+                hit = self._cache.get(job.hash)
+                if hit is not None:
+                    self._cache.move_to_end(job.hash)
+            self._count("submitted")
+            if hit is not None:
+                self._count("cacheHits")
+                job.diagnosis = hit
+                cached.append(job)
+            else:
+                self._pending.put(job)
+            jobs.append(job)
+        if cached:
+            self._complete(cached)
+        if len(cached) < len(jobs):
+            self._ensureDispatcher()
+        return jobs
+
+    def job(self, jobId: str) -> Optional[DiagnosisJob]:
+        with self._lock:
+            return self._jobs.get(jobId)
+
+    def pendingCount(self) -> int:
+        return self._pending.qsize()
+
+    def stop(self):
+        """应用关闭时调用：停止调度线程，等待进行中的批次写回"""
+        with self._lock:
+            dispatcher, pool = self._dispatcher, self._pool
+            self._dispatcher = self._pool = None
+        if dispatcher is not None and dispatcher.is_alive():
+            self._pending.put(None)
+            dispatcher.join(timeout=BATCH_WAIT + 1)
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    # ---- 调度 ----
+
+    def _ensureDispatcher(self):
+        with self._lock:
+            if self._dispatcher is not None and self._dispatcher.is_alive():
+                return
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix="diagnosis")
+            self._dispatcher = threading.Thread(target=self._dispatchLoop, name="diagnosis-dispatch", daemon=True)
+            self._dispatcher.start()
+
+    def _dispatchLoop(self):
+        pool = self._pool
+        while True:
+            first = self._pending.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + BATCH_WAIT
+            while len(batch) < BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if job is None:
+                    # 停止信号：先提交已凑好的批次再退出
+                    self._pending.put(None)
+                    break
+                batch.append(job)
+            self._slots.acquire()
+            pool.submit(self._runBatch, batch)
+
+    def _runBatch(self, batch: list[DiagnosisJob]):
+        try:
+            # 同批内指标相同的记录只送模型一次
+            unique: dict[str, DiagnosisJob] = {}
+            for job in batch:
+                job.status = "running"
+                unique.setdefault(job.hash, job)
+            try:
+                results = self.client.diagnose([j.item for j in unique.values()])
+                self._count("batches")
+                self._count("modelItems", len(unique))
+            except Exception as e:
+                self._fail(batch, f"模型调用失败: {e}")
+                return
+            # 响应被截断等情况下结果条数与请求不符，无法按顺序对应到记录，整批按失败处理
+            if len(results) != len(unique):
+                self._fail(batch, f"模型返回 {len(results)} 条结果，预期 {len(unique)} 条")
+                return
+            byHash = dict(zip(unique, results))
+            with self._lock:
+                for digest, diagnosis in byHash.items():
+                    self._cache[digest] = diagnosis
+                    self._cache.move_to_end(digest)
+                while len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+            for job in batch:
+                job.diagnosis = byHash[job.hash]
+            self._complete(batch)
+        finally:
+            self._slots.release()
+
+    # ---- 写回 ----
+
+    def _complete(self, jobs: list[DiagnosisJob]):
+        byProduct: dict[str, list[DiagnosisJob]] = {}
+        for job in jobs:
+            byProduct.setdefault(job.productId, []).append(job)
+        for productId, productJobs in byProduct.items():
+            try:
+                _writeBack(productId, {j.recordId: j.diagnosis for j in productJobs})
+            except Exception as e:
+                self._fail(productJobs, f"写回失败: {e}")
+                continue
+            now = datetime.now().isoformat()
+            for job in productJobs:
+                job.status, job.finishedAt = "done", now
+
+    def _fail(self, jobs: list[DiagnosisJob], error: str):
+        now = datetime.now().isoformat()
+        for job in jobs:
+            job.status, job.error, job.finishedAt = "failed", error, now
+        self._count("failed", len(jobs))
+
+
+def _withDiagnoses(records: Optional[list], diagnoses: dict[str, dict]) -> list:
+    return [
+        {**r, "aiDiagnosis": diagnoses[r.get("id")]} if r.get("id") in diagnoses else r
+        for r in records or []
+    ]
+
+
+def _writeBack(productId: str, diagnoses: dict[str, dict]):
+    """把同一商品的多条诊断一次写回 analysisRecords"""
+    if not USE_SUPABASE:
+        memory_store.modify(
+            TABLE, productId,
+            lambda row: {"analysisRecords": _withDiagnoses(row.get("analysisRecords"), diagnoses)},
+        )
+        return
+    # 以版本号做条件更新，并发编辑同一商品时重读后重试，不覆盖他人的修改
+    for _ in range(WRITE_RETRIES):
+        rows = supabase_client.select(
+            TABLE, columns="id,version,analysisRecords", filters={"id": f"eq.{productId}"}
+        )
+        if not rows:
+            return
+        try:
+            supabase_client.update(
+                TABLE, {"id": f"eq.{productId}"},
+                {"analysisRecords": _withDiagnoses(rows[0].get("analysisRecords"), diagnoses)},
+                rows[0].get("version"),
+            )
+            return
+        except VersionConflict:
+            continue
+    raise VersionConflict(None)
+
+
+def undiagnosedRecords(product) -> list[dict]:
+    return [r for r in product.get("analysisRecords") or [] if r.get("id") and not r.get("aiDiagnosis")]
+
+
+def runDiagnosisSweep(now: datetime) -> dict:
+    """定时任务：为所有尚未诊断的分析记录排队诊断"""
+    submitted = 0
+    for workspace in WORKSPACES:
+        if USE_SUPABASE:
+            products = supabase_client.select(
+                TABLE, columns="id,name,lifecycleStage,analysisRecords",
+                filters={"workspace": f"eq.{workspace}", "status": "neq.Trashed"},
+            )
+        else:
+            products = [
+                p for p in memory_store.get_all(TABLE, {"workspace": workspace})
+                if p.get("status") != "Trashed"
+            ]
+        for product in products:
+            records = undiagnosedRecords(product)
+            if records:
+                submitted += len(diagnosisQueue.submit(product, records))
+    return {"submitted": submitted, "pending": diagnosisQueue.pendingCount()}
+
+
+# 单例实例
+diagnosisQueue = DiagnosisQueue()
@@ -0,0 +1,20 @@
+"""
+环境变量加载 — 包初始化时加载一次 backend/.env，各模块在导入时读取的配置都能看到其中的值。
+.env 不存在时（部署平台直接注入环境变量）不导入 python-dotenv。已存在的环境变量优先于 .env。
+"""
+
+import os
+
+ENV_FILE = os.path.join(os.path.dirname(__file__), ".env")
+
+_loaded = False
+
+
+def loadEnv():
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    if os.path.exists(ENV_FILE):
+        from dotenv import load_dotenv
+        load_dotenv(ENV_FILE)
@@ -0,0 +1,84 @@
+"""
+统一 ID 生成 — 按时间有序、带进程位的紧凑 ID，替代原先的 str(uuid.uuid4())[:8]（仅 32 位随机，数万行后即可能碰撞）。
+布局（共 80 位，小写 Crockford base32 编码为 16 个字符，定长，字典序即生成顺序）：
+  48 位毫秒时间戳 | 10 位 worker | 22 位序号（每毫秒从随机值起递增）
+ID_MODE：
+  mixed（默认）— 新 ID 加前缀 "x"，与存量 8 位十六进制 ID 共存时仍整体排在其后，键集分页不乱序；
+  sortable — 无前缀，适合没有存量数据的新部署；
+  legacy — 回退为旧的 8 位随机 ID。
+多进程部署时通过 ID_WORKER（0-1023）为每个进程指定不同的 worker 位，未设置时由主机名与 pid 推导。
+"""
+
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+import zlib
+
+ID_MODE = os.getenv("ID_MODE", "mixed").lower()
+
+ALPHABET = "0123456789abcdefghjkmnpqrstvwxyz"
+MIXED_PREFIX = "x"
+
+WORKER_BITS = 10
+SEQUENCE_BITS = 22
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+def _defaultWorker() -> int:
+    seed = f"{socket.gethostname()}:{os.getpid()}".encode()
+    return zlib.crc32(seed) & ((1 << WORKER_BITS) - 1)
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        chars.append(ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+class IdGenerator:
+    def __init__(self, worker: int, mode: str = ID_MODE):
+        if not 0 <= worker < (1 << WORKER_BITS):
+            raise ValueError(f"ID_WORKER 超出范围 0-{(1 << WORKER_BITS) - 1}: {worker}")
+        self.worker = worker
+        self.mode = mode
+        self._lastMs = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def _next(self) -> int:
+        with self._lock:
+            now = time.time_ns() // 1_000_000
+            # 时钟回拨时沿用上一毫秒，保证单调
+            if now <= self._lastMs:
+                now = self._lastMs
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    # 同一毫秒序号用尽，借用下一毫秒
+                    now = self._lastMs = now + 1
+                    self._sequence = random.getrandbits(SEQUENCE_BITS - 1)
+            else:
+                self._lastMs = now
+                # 每毫秒从随机值起步，降低 worker 位偶然相同的进程间碰撞概率
+                self._sequence = random.getrandbits(SEQUENCE_BITS - 1)
+            return (now << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker << SEQUENCE_BITS) | self._sequence
+
+    def newId(self) -> str:
+        if self.mode == "legacy":
+            return str(uuid.uuid4())[:8]
+        encoded = _encode(self._next(), 16)
+        return MIXED_PREFIX + encoded if self.mode == "mixed" else encoded
+
+
+# 单例实例
+_worker = os.getenv("ID_WORKER")
+idGenerator = IdGenerator(int(_worker) if _worker else _defaultWorker())
+
+
+def newId() -> str:
+    """生成新行 ID"""
+    return idGenerator.newId()
@@ -36,6 +36,81 @@ CREATE TABLE IF NOT EXISTS credit_records (
 );
 
 CREATE INDEX IF NOT EXISTS idx_credit_user ON credit_records("userId");
+-- 信用事件去重键：同一事件在同一周期只记一次，并发写入由 ON CONFLICT DO NOTHING 在数据库内去重
+-- 已有重复数据的库需先清理重复行（保留最早的一条）才能建立该索引
+DROP INDEX IF EXISTS idx_credit_event;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_credit_event
+    ON credit_records("userId", "eventType", "relatedId", "cycleKey") NULLS NOT DISTINCT;
+
+
+-- 信用流水归档表（结构同 credit_records），冷数据由检查点任务迁入
+CREATE TABLE IF NOT EXISTS credit_records_archive (LIKE credit_records INCLUDING DEFAULTS);
+CREATE INDEX IF NOT EXISTS idx_credit_archive_user ON credit_records_archive("userId");
+-- 归档后的流水不再受 uq_credit_event 约束，插入前按归档表去重，同一事件归档后也不会被再次计分
+-- 归档任务先写归档再删热表，同一事件键任何时刻至少存在于其中一张表
+CREATE INDEX IF NOT EXISTS idx_credit_archive_event
+    ON credit_records_archive("userId", "eventType", "relatedId", "cycleKey");
+
+CREATE OR REPLACE FUNCTION skip_archived_credit_event()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM credit_records_archive a
+        WHERE a."userId" = NEW."userId"
+          AND a."eventType" = NEW."eventType"
+          AND a."relatedId" IS NOT DISTINCT FROM NEW."relatedId"
+          AND a."cycleKey" IS NOT DISTINCT FROM NEW."cycleKey"
+    ) THEN
+        RETURN NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_credit_skip_archived ON credit_records;
+CREATE TRIGGER trg_credit_skip_archived BEFORE INSERT ON credit_records
+    FOR EACH ROW EXECUTE FUNCTION skip_archived_credit_event();
+
+-- 成员积分检查点：cutoff 之前的流水已归档，balance 为截至 cutoff 的积分
+CREATE TABLE IF NOT EXISTS credit_checkpoints (
+    id TEXT PRIMARY KEY,
+    "userId" TEXT NOT NULL REFERENCES members(id) ON DELETE CASCADE,
+    balance INTEGER NOT NULL,
+    cutoff TEXT NOT NULL,
+    "archivedCount" INTEGER DEFAULT 0,
+    "createdAt" TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_checkpoint_user ON credit_checkpoints("userId", cutoff DESC);
+
+-- 成员积分批量变动 — 一次调用写入整批信用事件的积分变动
+-- deltas 为该成员按时间排序的变动，逐条累加并截断到 0（与后端 replayCredit 一致）；
+-- 行锁内基于当前积分计算，多个 worker 并发写入不会互相覆盖；按 id 顺序加锁避免死锁。返回更新后的积分
+CREATE OR REPLACE FUNCTION apply_credit_deltas(changes JSONB)
+RETURNS TABLE (id TEXT, "creditScore" INTEGER)
+LANGUAGE plpgsql AS $$
+DECLARE
+    c RECORD;
+    delta INTEGER;
+    score INTEGER;
+BEGIN
+    FOR c IN
+        SELECT x.id, x.deltas FROM jsonb_to_recordset(changes) AS x(id TEXT, deltas INTEGER[])
+        ORDER BY x.id
+    LOOP
+        SELECT COALESCE(m."creditScore", 0) INTO score FROM members m WHERE m.id = c.id FOR UPDATE;
+        CONTINUE WHEN NOT FOUND;
+        FOREACH delta IN ARRAY c.deltas LOOP
+            score := GREATEST(0, score + delta);
+        END LOOP;
+        UPDATE members m SET "creditScore" = score WHERE m.id = c.id;
+        id := c.id;
+        "creditScore" := score;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$;
 
 
 -- 3. 商品表
@@ -58,11 +133,18 @@ CREATE TABLE IF NOT EXISTS products (
     "lifecycleStage" TEXT,
     "lastUpdateDate" TEXT,
     "analysisRecords" JSONB DEFAULT '[]'::JSONB,
+    "alertLevel" TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
 CREATE INDEX IF NOT EXISTS idx_product_workspace ON products(workspace);
 CREATE INDEX IF NOT EXISTS idx_product_operator ON products("operatorId");
+-- 运营人工作视图：按工作区 + 运营人 + 状态 / 工作区 + 状态 + 阶段过滤
+CREATE INDEX IF NOT EXISTS idx_product_ws_operator_status ON products(workspace, "operatorId", status);
+CREATE INDEX IF NOT EXISTS idx_product_ws_status_stage ON products(workspace, status, "lifecycleStage");
+-- 每日预警扫描写入的预警级别（已有库执行此语句补列）
+ALTER TABLE products ADD COLUMN IF NOT EXISTS "alertLevel" TEXT;
 
 
 -- 4. 致富目标表
@@ -77,10 +159,13 @@ CREATE TABLE IF NOT EXISTS targets (
     "completionImages" JSONB DEFAULT '[]'::JSONB,
     "operatorId" TEXT NOT NULL REFERENCES members(id),
     workspace TEXT NOT NULL DEFAULT 'Tmall',
+    version INTEGER NOT NULL DEFAULT 1,
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
 CREATE INDEX IF NOT EXISTS idx_target_workspace ON targets(workspace);
+-- 定时扣分任务：按截止时间查找未完成目标
+CREATE INDEX IF NOT EXISTS idx_target_open_deadline ON targets(deadline) WHERE "completedAt" IS NULL;
 
 
 -- 5. 管理员账号表
@@ -94,7 +179,50 @@ CREATE TABLE IF NOT EXISTS admin_users (
 );
 
 
--- 6. 启用行级安全策略（RLS）— 可选
+-- 6. 商品日终推进 — 后端计算好的变更通过一条 UPDATE 整批写入
+-- 以读到的 dayCount（fromDay）为条件，期间已被推进（如运营人手动完成当天）的商品不会重复推进；返回实际被更新的商品 id
+DROP FUNCTION IF EXISTS apply_product_rollover(JSONB, TEXT);
+CREATE OR REPLACE FUNCTION apply_product_rollover(changes JSONB)
+RETURNS TABLE (id TEXT)
+LANGUAGE sql AS $$
+    UPDATE products p SET
+        "dayCount" = c."dayCount",
+        status = COALESCE(c.status, p.status),
+        "lifecycleStage" = COALESCE(c."lifecycleStage", p."lifecycleStage")
+    FROM jsonb_to_recordset(changes) AS c(
+        id TEXT, "fromDay" INTEGER, "dayCount" INTEGER, status TEXT, "lifecycleStage" TEXT
+    )
+    WHERE p.id = c.id
+      AND p.status = 'Active'
+      AND COALESCE(p."dayCount", 0) = c."fromDay"
+    RETURNING p.id;
+$$;
+
+
+-- 7. 行版本号 — 乐观并发控制
+-- 每次 UPDATE 由触发器递增 version，后端以 version=eq.N 做条件更新（If-Match）
+ALTER TABLE products ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE targets ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION bump_row_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_products_version ON products;
+CREATE TRIGGER trg_products_version BEFORE UPDATE ON products
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+
+DROP TRIGGER IF EXISTS trg_targets_version ON targets;
+CREATE TRIGGER trg_targets_version BEFORE UPDATE ON targets
+    FOR EACH ROW EXECUTE FUNCTION bump_row_version();
+
+
+-- 8. 启用行级安全策略（RLS）— 可选
 -- 如果使用 service_role key 访问则不需要 RLS
 -- ALTER TABLE members ENABLE ROW LEVEL SECURITY;
 -- ALTER TABLE products ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,19 @@
+"""
+定时批处理任务注册。
+由 API 进程（main.py）导入；共享内存存储模式下由属主进程导入并运行调度器，各 worker 不再各自执行一遍。
+"""
+
+from . import alert_scan, credit_jobs, product_jobs
+from .diagnosis import runDiagnosisSweep
+from .scheduler import daily, scheduler, weekly
+
+scheduler.register("goalOverduePenalty", credit_jobs.runOverduePenalties, daily(0, 5))
+# 周日为一周第一天，周六深夜结算本周目标数量
+scheduler.register("weeklyGoalCheck", credit_jobs.runWeeklyGoalCheck, weekly(5, 23, 30))
+scheduler.register("lifecycleRollover", product_jobs.runLifecycleRollover, daily(0, 15))
+# 早上上班前刷新所有 Active 商品的预警级别
+scheduler.register("alertScan", alert_scan.runAlertScan, daily(7, 30))
+scheduler.register("ledgerCheckpoint", credit_jobs.runLedgerCheckpoint, weekly(6, 3, 0))
+scheduler.register("ledgerReconcile", credit_jobs.runLedgerReconcile, daily(4, 0))
+# 每天凌晨为尚未诊断的分析记录补诊断
+scheduler.register("diagnosisSweep", runDiagnosisSweep, daily(2, 30))
@@ -0,0 +1,124 @@
+"""
+成员积分排行榜 — 增量维护的有序结构，避免每次请求全量排序。
+条目按 (-creditScore, memberId) 有序存放，排名与窗口查询通过二分定位，O(log n)；
+更新需在 list 中删除并插入，是 O(n) 的内存搬移，在团队成员规模下远低于每次全量排序的开销。
+内存模式下更新时以存储中的当前积分为准，乱序到达的并发更新也会收敛到最新值。
+由信用事件、管理员调分、成员增删改路径实时更新；首次使用时从存储加载，
+Supabase 模式下其他实例的写入无法感知，因此按 LEADERBOARD_REFRESH_SECONDS 定期重建。
+"""
+
+import bisect
+import os
+import threading
+import time
+from typing import Optional
+
+from .database import USE_SUPABASE, supabase_client
+from .memory_store import memory_store
+
+REFRESH_SECONDS = int(os.getenv("LEADERBOARD_REFRESH_SECONDS", "300"))
+
+
+class Leaderboard:
+    def __init__(self):
+        self._entries: list[tuple[int, str]] = []
+        self._scores: dict[str, int] = {}
+        self._info: dict[str, dict] = {}
+        self._lock = threading.RLock()
+        self._loadedAt: Optional[float] = None
+
+    # ---- 维护 ----
+
+    def _ensureLoaded(self):
+        if self._loadedAt is not None and not (
+            (USE_SUPABASE or memory_store.shared) and time.monotonic() - self._loadedAt > REFRESH_SECONDS
+        ):
+            return
+        if USE_SUPABASE:
+            members = supabase_client.select("members", columns="id,name,role,creditScore")
+        else:
+            members = memory_store.get_all("members")
+        with self._lock:
+            self._info = {m["id"]: {"name": m.get("name", ""), "role": m.get("role", "")} for m in members}
+            self._scores = {m["id"]: m.get("creditScore", 0) for m in members}
+            self._entries = sorted((-s, mid) for mid, s in self._scores.items())
+            self._loadedAt = time.monotonic()
+
+    def invalidate(self):
+        """下次查询时从存储重建"""
+        self._loadedAt = None
+
+    def setScore(self, memberId: str, score: int, name: Optional[str] = None, role: Optional[str] = None):
+        """新增或更新成员积分；尚未加载时忽略，加载时会读到最新值"""
+        with self._lock:
+            if self._loadedAt is None:
+                return
+            if not USE_SUPABASE:
+                # 存储写入与本次调用不在同一把锁内，两个并发更新的 setScore 可能乱序到达；
+                # 在锁内回读存储，读取必然晚于调用方自己的写入，最后一次调用总能看到最新积分
+                member = memory_store.get_by_id("members", memberId)
+                if member is None:
+                    self._removeLocked(memberId)
+                    return
+                score, name, role = member.get("creditScore", 0), member.get("name", ""), member.get("role", "")
+            old = self._scores.get(memberId)
+            if old is not None and old != score:
+                self._entries.pop(bisect.bisect_left(self._entries, (-old, memberId)))
+            if old is None or old != score:
+                bisect.insort(self._entries, (-score, memberId))
+            self._scores[memberId] = score
+            info = self._info.setdefault(memberId, {"name": "", "role": ""})
+            if name is not None:
+                info["name"] = name
+            if role is not None:
+                info["role"] = role
+
+    def remove(self, memberId: str):
+        with self._lock:
+            self._removeLocked(memberId)
+
+    def _removeLocked(self, memberId: str):
+        old = self._scores.pop(memberId, None)
+        if old is not None:
+            self._entries.pop(bisect.bisect_left(self._entries, (-old, memberId)))
+            self._info.pop(memberId, None)
+
+    # ---- 查询 ----
+
+    def _entry(self, i: int) -> dict:
+        negScore, memberId = self._entries[i]
+        # 并列积分取相同名次（1224 排名）
+        rank = bisect.bisect_left(self._entries, (negScore,)) + 1
+        return {"id": memberId, **self._info.get(memberId, {}), "creditScore": -negScore, "rank": rank}
+
+    def size(self) -> int:
+        self._ensureLoaded()
+        return len(self._entries)
+
+    def top(self, k: int) -> list[dict]:
+        self._ensureLoaded()
+        with self._lock:
+            return [self._entry(i) for i in range(min(k, len(self._entries)))]
+
+    def rankOf(self, memberId: str) -> Optional[dict]:
+        self._ensureLoaded()
+        with self._lock:
+            score = self._scores.get(memberId)
+            if score is None:
+                return None
+            return self._entry(bisect.bisect_left(self._entries, (-score, memberId)))
+
+    def around(self, memberId: str, radius: int) -> list[dict]:
+        """成员前后各 radius 名组成的窗口"""
+        self._ensureLoaded()
+        with self._lock:
+            score = self._scores.get(memberId)
+            if score is None:
+                return []
+            pos = bisect.bisect_left(self._entries, (-score, memberId))
+            lo, hi = max(0, pos - radius), min(len(self._entries), pos + radius + 1)
+            return [self._entry(i) for i in range(lo, hi)]
+
+
+# 单例实例
+leaderboard = Leaderboard()
@@ -3,17 +3,57 @@ BossOps 电商工作台 — FastAPI 后端入口。
 提供团队成员、商品、目标、信用积分的 RESTful API。
 """
 
+import asyncio
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import members, products, targets, credits, auth, admin
+from fastapi.responses import JSONResponse
+from .routers import members, products, targets, credits, auth, admin, export, product_import, bootstrap, blobs, diagnosis
+from .admission import AdmissionMiddleware, admissionController
+from .profiler import ProfilerMiddleware
+from .concurrency import VersionConflict, etag
+from .database import checkConnection
+from .resilience import UpstreamUnavailable
+from .memory_store import memory_store
+from .scheduler import SCHEDULER_ENABLED, scheduler
+from .diagnosis import diagnosisQueue
+from . import jobs  # noqa: F401  注册定时批处理任务
+
+
+def _warmUp():
+    """启动后在后台执行的初始化：连接测试与默认管理员（bcrypt 哈希），不阻塞启动与首个请求的导入"""
+    checkConnection()
+    try:
+        auth.ensureDefaultAdmin()
+    except UpstreamUnavailable:
+        print("[WARN] 默认管理员初始化未完成，将在首次认证请求时重试")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    asyncio.get_running_loop().run_in_executor(None, _warmUp)
+    # 共享内存存储模式下定时任务由属主进程执行，worker 只提供手动触发与状态查询
+    if SCHEDULER_ENABLED and not memory_store.shared:
+        scheduler.start()
+    yield
+    await scheduler.stop()
+    diagnosisQueue.stop()
+
 
 app = FastAPI(
     title="BossOps 电商工作台 API",
     description="数字化电商战略指挥塔后端服务",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# 按需采样分析：注册在准入控制内侧，被拒绝的请求不会被分析
+app.add_middleware(ProfilerMiddleware)
+
+# 准入控制：按路由类别限流与并发隔离，先于 CORS 注册，使被拒绝的响应也带上 CORS 头
+app.add_middleware(AdmissionMiddleware)
+
 # CORS 配置 — 通过环境变量 CORS_ORIGINS 支持动态配置（逗号分隔）
 # 默认允许本地开发 + Vercel 部署域名
 _defaultOrigins = "http://localhost:5173,http://localhost:3000,http://127.0.0.1:5173"
@@ -27,8 +67,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 浏览器端需要读取分析 ID 与乐观并发版本
+    expose_headers=["X-Profile-Id", "ETag"],
 )
 
+@app.exception_handler(UpstreamUnavailable)
+async def upstreamUnavailableHandler(request: Request, exc: UpstreamUnavailable):
+    """上游熔断期间快速返回 503，提示客户端稍后重试"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "数据服务暂时不可用，请稍后重试"},
+        headers={"Retry-After": str(int(exc.retryAfter))},
+    )
+
+
+@app.exception_handler(VersionConflict)
+async def versionConflictHandler(request: Request, exc: VersionConflict):
+    """条件更新版本不符：返回 409 与当前版本，客户端据此重新读取后再提交"""
+    return JSONResponse(
+        status_code=409,
+        content={"detail": "数据已被他人修改，请刷新后重试", "currentVersion": exc.currentVersion},
+        headers={"ETag": etag(exc.currentVersion)},
+    )
+
+
 # 注册路由
 app.include_router(members.router)
 app.include_router(products.router)
@@ -36,13 +98,28 @@ app.include_router(targets.router)
 app.include_router(credits.router)
 app.include_router(auth.router)
 app.include_router(admin.router)
+app.include_router(export.router)
+app.include_router(product_import.router)
+app.include_router(bootstrap.router)
+app.include_router(blobs.router)
+app.include_router(diagnosis.router)
 
 
 @app.get("/api/health")
 async def healthCheck():
     """健康检查端点"""
-    from .database import USE_SUPABASE
-    return {
+    from .database import USE_SUPABASE, supabase_client
+    result = {
         "status": "ok",
         "storage": "supabase" if USE_SUPABASE else "memory",
     }
+    from .response_cache import responseCache
+    result["responseCache"] = responseCache.stats
+    result["admission"] = admissionController.stats
+    if supabase_client is not None:
+        result["upstream"] = {
+            **supabase_client.stats,
+            "circuit": supabase_client.breaker.state,
+            "bulkheadRejected": {k: b.rejected for k, b in supabase_client.bulkheads.items()},
+        }
+    return result
@@ -1,11 +1,25 @@
 """
 内存存储 — 在未配置 Supabase 凭证时作为回退方案使用。
 所有数据仅存活于进程生命周期内，重启后重置。
+设置 MEMORY_STORE_SOCKET 时 memory_store 为连接共享属主进程的代理，多个 worker 共用一份数据（见 shared_store.py）。
 """
 
 from __future__ import annotations
-import uuid
-from datetime import datetime
+import bisect
+import os
+import sys
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from pydantic import BaseModel
+
+from .concurrency import VERSIONED_TABLES, VersionConflict
+from .ids import newId
+from .models import (
+    CreditCheckpoint, CreditRecord, DailyAnalysisRecord, Member, OperationLog, Product, Target,
+)
 
 
 # ============== 初始种子数据 ==============
@@ -38,55 +52,504 @@ SEED_MEMBERS = [
 ]
 
 
+class FrozenRow(dict):
+    """
+    只读映射 — 存储层交给读者的行对象，以及行内嵌套的 dict（如 taskProgress）。
+    写入一律通过 MemoryStore 以写时复制方式替换整行，写入时嵌套的 list / dict 被递归冻结，
+    读者拿到的引用（含嵌套容器）永远不会被改动，因此并发读取无需深拷贝；
+    需要修改时请构造新对象（如 {**row, "x": ...}、list(row["history"]) + [...]）。
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("FrozenRow 为只读快照，请通过 memory_store.update() 修改")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    update = pop = popitem = clear = setdefault = _readonly
+
+    def __reduce__(self):
+        return (FrozenRow, (dict(self),))
+
+
+class FrozenList(list):
+    """行内嵌套的只读列表（如 history、analysisRecords），语义同 FrozenRow"""
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("FrozenList 为只读快照，请通过 memory_store.update() 修改")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = remove = pop = clear = sort = reverse = _readonly
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+
+def freeze(value: Any) -> Any:
+    """递归冻结嵌套容器：list -> FrozenList，dict -> FrozenRow；已冻结的值与标量原样返回"""
+    kind = type(value)
+    if kind is list or kind is tuple:
+        return FrozenList(freeze(v) for v in value)
+    if kind is dict:
+        return FrozenRow({k: freeze(v) for k, v in value.items()})
+    return value
+
+
+# ============== 紧凑行记录 ==============
+
+_MISSING = object()
+
+# 取值集合很小的字段，驻留后所有行共享同一个字符串对象
+INTERNED_FIELDS = frozenset({
+    "status", "workspace", "eventType", "cycleKey", "lifecycleStage",
+    "strategy", "priority", "type", "operatorId", "userId",
+})
+
+
+class Record(Mapping):
+    """
+    基于 __slots__ 的只读行记录，字段由 Pydantic 模型推导。
+    相比 dict 每行省去哈希表开销，对外仍表现为只读 Mapping（r["x"] / r.get / {**r}），
+    路由与 response_model 校验无需改动；仅在响应边界才物化为 dict。
+    未出现在数据中的字段视为不存在，模型之外的键存放在 _extra 中；嵌套的 list / dict 写入时冻结为 FrozenList / FrozenRow。
+    """
+
+    __slots__ = ("_extra",)
+    _fields: tuple[str, ...] = ()
+    _field_set: frozenset[str] = frozenset()
+
+    def __init__(self, data: Mapping):
+        setattr_ = object.__setattr__
+        extra = None
+        for key, val in data.items():
+            if key in self._field_set:
+                if key in INTERNED_FIELDS and type(val) is str:
+                    val = sys.intern(val)
+                setattr_(self, key, freeze(val))
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = freeze(val)
+        for key in self._fields:
+            if key not in data:
+                setattr_(self, key, _MISSING)
+        setattr_(self, "_extra", extra)
+
+    def __setattr__(self, name, value):
+        raise TypeError(f"{type(self).__name__} 为只读记录，请通过 memory_store.update() 修改")
+
+    __delattr__ = __setattr__
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._field_set:
+            val = getattr(self, key)
+            if val is not _MISSING:
+                return val
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._field_set:
+            val = getattr(self, key)
+            return default if val is _MISSING else val
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self._fields:
+            if getattr(self, key) is not _MISSING:
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+
+def _record_class(name: str, model: type[BaseModel], exclude: tuple[str, ...] = ()) -> type[Record]:
+    """根据 Pydantic 模型生成带 __slots__ 的记录类"""
+    fields = tuple(f for f in model.model_fields if f not in exclude)
+    clash = [f for f in fields if hasattr(Record, f)]
+    if clash:
+        raise ValueError(f"{model.__name__} 字段与 Mapping 方法重名: {clash}")
+    return type(name, (Record,), {
+        "__slots__": fields,
+        "__module__": __name__,
+        "_fields": fields,
+        "_field_set": frozenset(fields),
+    })
+
+
+MemberRow = _record_class("MemberRow", Member, exclude=("creditHistory",))
+CreditRecordRow = _record_class("CreditRecordRow", CreditRecord)
+CreditCheckpointRow = _record_class("CreditCheckpointRow", CreditCheckpoint)
+ProductRow = _record_class("ProductRow", Product)
+TargetRow = _record_class("TargetRow", Target)
+OperationLogRow = _record_class("OperationLogRow", OperationLog)
+AnalysisRecordRow = _record_class("AnalysisRecordRow", DailyAnalysisRecord)
+
+# 表名 -> 行记录类；未登记的表回退为 FrozenRow
+ROW_TYPES: dict[str, type[Record]] = {
+    "members": MemberRow,
+    "credit_records": CreditRecordRow,
+    "credit_records_archive": CreditRecordRow,
+    "credit_checkpoints": CreditCheckpointRow,
+    "products": ProductRow,
+    "targets": TargetRow,
+    "operation_logs": OperationLogRow,
+    "analysis_records": AnalysisRecordRow,
+}
+
+Row = Record | FrozenRow
+
+
+def make_row(table: str, data: Mapping) -> Row:
+    """按表结构构造只读行，嵌套容器一并冻结"""
+    row_type = ROW_TYPES.get(table)
+    if row_type is None:
+        return FrozenRow({k: freeze(v) for k, v in data.items()})
+    return row_type(data)
+
+
+def _new_row(table: str, data: dict) -> Row:
+    """插入用：补齐缺省 id，带版本的表从 version 1 开始"""
+    if not data.get("id"):
+        data = {**data, "id": newId()}
+    if table in VERSIONED_TABLES and not data.get("version"):
+        data = {**data, "version": 1}
+    return make_row(table, data)
+
+
+def _revise(table: str, row: Row, changes: dict) -> Row:
+    """更新用：合并变更，带版本的表版本号加一"""
+    data = {**row, **changes}
+    if table in VERSIONED_TABLES:
+        data["version"] = (row.get("version") or 1) + 1
+    return make_row(table, data)
+
+
+class _RWLock:
+    """读写锁：允许多个读者并发，写者独占；有写者等待时阻止新读者进入，避免写饥饿。"""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
 class MemoryStore:
-    """简易内存存储，键值结构：{ table_name: [row_dict, ...] }"""
+    """
+    线程安全的内存存储，键值结构：{ table_name: { row_id: Row } }。
+    每张表一把读写锁，每次写入递增表版本号；读者拿到的是不可变的行快照（嵌套容器同样只读），
+    已登记结构的表以紧凑的 Record 存储，其余表使用 FrozenRow。
+    可按字段组合建立等值哈希索引，get_all 的过滤条件覆盖索引字段时直接命中。
+    """
+
+    # 是否与其他进程共享数据（RemoteMemoryStore 为 True）
+    shared = False
 
     def __init__(self):
-        self.tables: dict[str, list[dict]] = {
-            "members": [dict(m) for m in SEED_MEMBERS],
-            "credit_records": [],
-            "products": [],
-            "targets": [],
-            "operation_logs": [],
-            "analysis_records": [],
-        }
+        self.tables: dict[str, dict[str, Row]] = {}
+        # 每张表按 id 排序的键列表，供键集分页使用
+        self._sorted_ids: dict[str, list[str]] = {}
+        # 表 -> { 字段组合: { 字段值元组: { row_id: None } } }，内层 dict 作为有序集合
+        self._indexes: dict[str, dict[tuple[str, ...], dict[tuple, dict[str, None]]]] = {}
+        self._locks: dict[str, _RWLock] = {}
+        self._versions: dict[str, int] = {}
+        self._tables_lock = threading.Lock()
+        for name in (
+            "members", "credit_records", "credit_records_archive", "credit_checkpoints",
+            "products", "targets", "operation_logs", "analysis_records", "admin_users",
+        ):
+            self._ensure_table(name)
+        self.create_index("credit_records", ("userId",))
+        self.create_index("credit_records", ("userId", "eventType", "relatedId", "cycleKey"))
+        self.create_index("credit_records_archive", ("userId", "eventType", "relatedId", "cycleKey"))
+        self.create_index("credit_checkpoints", ("userId",))
+        self.create_index("products", ("workspace",))
+        self.create_index("products", ("workspace", "status"))
+        self.create_index("products", ("workspace", "operatorId"))
+        self.create_index("products", ("workspace", "operatorId", "status"))
+        self.create_index("targets", ("workspace",))
+        self.create_index("targets", ("completedAt",))
+        self.create_index("admin_users", ("username",))
+        for m in SEED_MEMBERS:
+            self.insert("members", m)
+
+    def _ensure_table(self, table: str) -> _RWLock:
+        lock = self._locks.get(table)
+        if lock is None:
+            with self._tables_lock:
+                lock = self._locks.get(table)
+                if lock is None:
+                    self.tables[table] = {}
+                    self._sorted_ids[table] = []
+                    self._indexes[table] = {}
+                    self._versions[table] = 0
+                    lock = self._locks[table] = _RWLock()
+        return lock
+
+    def version(self, table: str) -> int:
+        """表版本号，每次写入后递增，可用于缓存失效判断"""
+        return self._versions.get(table, 0)
+
+    # ---- 索引 ----
+
+    def create_index(self, table: str, fields: tuple[str, ...]):
+        """建立（或重建）字段组合上的等值索引"""
+        with self._ensure_table(table).write():
+            index: dict[tuple, dict[str, None]] = {}
+            for row_id, row in self.tables[table].items():
+                index.setdefault(tuple(row.get(f) for f in fields), {})[row_id] = None
+            self._indexes[table][fields] = index
+
+    def _lookup(self, table: str, filters: dict) -> tuple[list[Row], dict]:
+        """
+        选取被过滤条件完全覆盖的最长索引取候选行，返回 (候选行, 未被索引覆盖的剩余条件)。
+        需在读锁或写锁内调用。
+        """
+        rows = self.tables[table]
+        best = max(
+            (f for f in self._indexes[table] if all(k in filters for k in f)),
+            key=len, default=None,
+        )
+        if best is None:
+            return list(rows.values()), filters
+        ids = self._indexes[table][best].get(tuple(filters[k] for k in best), {})
+        rest = {k: v for k, v in filters.items() if k not in best}
+        return [rows[i] for i in ids], rest
+
+    def _put(self, table: str, row: Row):
+        """写入一行并维护排序键与索引，需在写锁内调用"""
+        rows = self.tables[table]
+        row_id = row["id"]
+        old = rows.get(row_id)
+        if old is None:
+            bisect.insort(self._sorted_ids[table], row_id)
+        for fields, index in self._indexes[table].items():
+            key = tuple(row.get(f) for f in fields)
+            if old is not None:
+                old_key = tuple(old.get(f) for f in fields)
+                if old_key == key:
+                    continue
+                self._discard(index, old_key, row_id)
+            index.setdefault(key, {})[row_id] = None
+        rows[row_id] = row
+
+    @staticmethod
+    def _discard(index: dict, key: tuple, row_id: str):
+        ids = index.get(key)
+        if ids is not None:
+            ids.pop(row_id, None)
+            if not ids:
+                del index[key]
 
     # ---- 通用 CRUD ----
 
-    def get_all(self, table: str, filters: dict | None = None) -> list[dict]:
-        rows = self.tables.get(table, [])
-        if filters:
-            for key, val in filters.items():
-                rows = [r for r in rows if r.get(key) == val]
+    def get_all(self, table: str, filters: dict | None = None) -> list[Row]:
+        with self._ensure_table(table).read():
+            if not filters:
+                return list(self.tables[table].values())
+            rows, rest = self._lookup(table, filters)
+        for key, val in rest.items():
+            rows = [r for r in rows if r.get(key) == val]
+        return rows
+
+    def get_by_id(self, table: str, row_id: str) -> Row | None:
+        with self._ensure_table(table).read():
+            return self.tables[table].get(row_id)
+
+    def page(self, table: str, after: str | None = None, limit: int = 500,
+             filters: dict | None = None) -> list[Row]:
+        """
+        键集分页：按 id 升序返回 id > after 的至多 limit 行。
+        每页只在读锁内扫描所需的键，导出等大批量读取不必一次取出整表。
+        """
+        with self._ensure_table(table).read():
+            rows, ids = self.tables[table], self._sorted_ids[table]
+            i = bisect.bisect_right(ids, after) if after is not None else 0
+            result = []
+            while i < len(ids) and len(result) < limit:
+                row = rows[ids[i]]
+                i += 1
+                if filters and any(row.get(k) != v for k, v in filters.items()):
+                    continue
+                result.append(row)
+            return result
+
+    def insert(self, table: str, data: dict) -> Row:
+        return self.insert_many(table, [data])[0]
+
+    def insert_many(self, table: str, items: list[dict]) -> list[Row]:
+        """批量插入，整批在一次写锁内完成"""
+        rows = [_new_row(table, d) for d in items]
+        with self._ensure_table(table).write():
+            for row in rows:
+                self._put(table, row)
+            self._versions[table] += 1
         return rows
 
-    def get_by_id(self, table: str, row_id: str) -> dict | None:
-        for row in self.tables.get(table, []):
-            if row.get("id") == row_id:
-                return row
-        return None
-
-    def insert(self, table: str, data: dict) -> dict:
-        if "id" not in data or not data["id"]:
-            data["id"] = str(uuid.uuid4())[:8]
-        self.tables.setdefault(table, []).append(data)
-        return data
-
-    def update(self, table: str, row_id: str, data: dict) -> dict | None:
-        for i, row in enumerate(self.tables.get(table, [])):
-            if row.get("id") == row_id:
-                row.update({k: v for k, v in data.items() if v is not None})
-                return row
-        return None
+    def insert_unique(self, table: str, items: list[dict], key: tuple[str, ...]) -> list[Row]:
+        """
+        幂等批量插入：在一次写锁内跳过 key 字段组合已存在（含本批次内重复）的行，
+        返回实际插入的行。key 上建有索引时为 O(1) 判重。
+        """
+        with self._ensure_table(table).write():
+            index = self._indexes[table].get(key)
+            if index is not None:
+                exists = lambda k: k in index
+            else:
+                existing = {tuple(r.get(f) for f in key) for r in self.tables[table].values()}
+                exists = existing.__contains__
+            inserted = []
+            for d in items:
+                k = tuple(d.get(f) for f in key)
+                if exists(k):
+                    continue
+                row = _new_row(table, d)
+                self._put(table, row)
+                if index is None:
+                    existing.add(k)
+                inserted.append(row)
+            if inserted:
+                self._versions[table] += 1
+            return inserted
+
+    def update(self, table: str, row_id: str, data: dict,
+               expected_version: int | None = None) -> Row | None:
+        """
+        部分更新，None 值字段被忽略。
+        给定 expected_version 时为条件更新：当前版本不符抛出 VersionConflict。
+        """
+        changes = {k: v for k, v in data.items() if v is not None}
+        if expected_version is None:
+            return self.modify(table, row_id, lambda row: changes)
+
+        def check(row: Row) -> dict:
+            current = row.get("version") or 1
+            if current != expected_version:
+                raise VersionConflict(current)
+            return changes
+
+        return self.modify(table, row_id, check)
+
+    def compare_and_set(self, table: str, row_id: str, expected: dict, data: dict) -> Row | None:
+        """
+        条件更新：仅当行的 expected 各字段与当前值相等时合并 data，否则不做修改。
+        行不存在或条件不满足均返回 None，调用方据此判定竞争失败。
+        """
+        with self._ensure_table(table).write():
+            row = self.tables[table].get(row_id)
+            if row is None or any(row.get(k) != v for k, v in expected.items()):
+                return None
+            new_row = _revise(table, row, data)
+            self._put(table, new_row)
+            self._versions[table] += 1
+            return new_row
+
+    def modify(self, table: str, row_id: str, fn: Callable[[Row], dict]) -> Row | None:
+        """
+        原子的读-改-写：在写锁内以当前行调用 fn，fn 返回需要合并的字段。
+        用于积分增减等依赖旧值的更新，避免并发请求互相覆盖。
+        """
+        with self._ensure_table(table).write():
+            row = self.tables[table].get(row_id)
+            if row is None:
+                return None
+            new_row = _revise(table, row, fn(row))
+            self._put(table, new_row)
+            self._versions[table] += 1
+            return new_row
+
+    def modify_many(self, table: str, row_ids: list[str],
+                    fn: Callable[[Row], dict | None]) -> list[Row]:
+        """
+        批量原子读-改-写：在一次写锁内对每行调用 fn，fn 返回 None 表示跳过该行。
+        返回实际修改后的行。
+        """
+        with self._ensure_table(table).write():
+            rows = self.tables[table]
+            changed = []
+            for row_id in row_ids:
+                row = rows.get(row_id)
+                if row is None:
+                    continue
+                changes = fn(row)
+                if changes is None:
+                    continue
+                new_row = _revise(table, row, changes)
+                self._put(table, new_row)
+                changed.append(new_row)
+            if changed:
+                self._versions[table] += 1
+            return changed
 
     def delete(self, table: str, row_id: str) -> bool:
-        rows = self.tables.get(table, [])
-        for i, row in enumerate(rows):
-            if row.get("id") == row_id:
-                rows.pop(i)
-                return True
-        return False
+        return self.delete_many(table, [row_id]) == 1
+
+    def delete_many(self, table: str, row_ids: list[str]) -> int:
+        """批量删除，返回实际删除的行数"""
+        with self._ensure_table(table).write():
+            rows, ids = self.tables[table], self._sorted_ids[table]
+            deleted = 0
+            for row_id in row_ids:
+                row = rows.pop(row_id, None)
+                if row is None:
+                    continue
+                ids.pop(bisect.bisect_left(ids, row_id))
+                for fields, index in self._indexes[table].items():
+                    self._discard(index, tuple(row.get(f) for f in fields), row_id)
+                deleted += 1
+            if deleted:
+                self._versions[table] += 1
+            return deleted
 
 
 # 单例实例
-memory_store = MemoryStore()
+MEMORY_STORE_SOCKET = os.getenv("MEMORY_STORE_SOCKET", "")
+
+if MEMORY_STORE_SOCKET:
+    from .shared_store import RemoteMemoryStore
+    memory_store = RemoteMemoryStore(MEMORY_STORE_SOCKET)
+else:
+    memory_store = MemoryStore()
@@ -53,6 +53,22 @@ class CreditRecord(BaseModel):
     createdAt: str
 
 
+class CreditCheckpoint(BaseModel):
+    """成员积分检查点：cutoff 之前的流水已归档，balance 为截至 cutoff 的积分"""
+    id: str
+    userId: str
+    balance: int
+    cutoff: str
+    archivedCount: int = 0
+    createdAt: str
+
+
+class CreditHistory(BaseModel):
+    """检查点 + 近期流水"""
+    checkpoint: Optional[CreditCheckpoint] = None
+    records: list[CreditRecord] = []
+
+
 # ============== 团队成员 ==============
 
 class MemberCreate(BaseModel):
@@ -176,6 +192,15 @@ class Product(BaseModel):
     lifecycleStage: Optional[str] = None
     lastUpdateDate: Optional[str] = None
     analysisRecords: Optional[list[dict]] = None
+    # 预警级别（normal / warning / critical），由每日预警扫描写入
+    alertLevel: Optional[str] = None
+    # 乐观并发版本号，每次写入递增
+    version: int = 1
+
+
+class PoolClaimRequest(BaseModel):
+    memberId: str
+    workspace: str = "Tmall"
 
 
 # ============== 致富目标 ==============
@@ -213,3 +238,4 @@ class Target(BaseModel):
     completionImages: Optional[list[str]] = None
     operatorId: str
     workspace: str = "Tmall"
+    version: int = 1
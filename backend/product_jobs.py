@@ -0,0 +1,156 @@
+"""
+商品生命周期日终任务 — 由调度器每晚执行，服务端是商品天数（dayCount）的唯一写入方。
+完成当天任务的规则与前端 ProductOps.handleDayComplete 一致：当天模板中的每个任务都上传了截图，
+天数加一并发放 DAY_COMPLETE，超过运营周期后转入维护期并发放 ASSET_COMPLETE。
+运营人点击“完成今日”走 POST /api/products/{id}/complete-day 立即推进；
+日终任务对当天任务已全部完成但未点击的 Active 商品整批推进，信用事件批量发放。
+写入以读到的 dayCount 为条件，并发推进或重复执行同一天不会重复推进，DAY_COMPLETE 以 D{天数} 为周期键去重。
+lastUpdateDate 表示当天经营数据的录入日期（数据驾驶舱据此统计待录入商品），不随天数推进；
+EARLY_MAINTAIN 需要运营人填写业绩指标后手动提前转维护，仍由前端触发，日终任务不会发放。
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from .database import USE_SUPABASE, supabase_client
+from .memory_store import memory_store
+from .routers.credits import applyCreditEvents, buildCreditRecord
+
+TABLE = "products"
+WORKSPACES = ("Tmall", "TaoFactory")
+
+# 每天的任务数，与前端 constants.tsx 的 OPERATION_LIFECYCLE / TAO_3DAY_STRATEGY / TAO_7DAY_STRATEGY 保持一致
+STANDARD_DAYS = 14
+STANDARD_TASKS = {1: 4, 2: 2, 3: 3, 4: 2, 5: 2, 6: 1, 7: 2, 8: 2, 9: 2, 10: 2, 11: 1, 12: 2, 13: 1, 14: 1}
+TAO_STRATEGIES = {
+    "tao-3day": (3, {1: 3, 2: 3, 3: 3}),
+    "tao-7day": (7, {1: 2, 2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 2}),
+}
+
+# 运营周期结束转入维护期时的生命周期阶段（前端 LifecycleStage）；其余阶段没有按天数划分的规则，保持不变
+MAINTENANCE_STAGE = "maintenance"
+
+# 可以完成当天任务的状态（前端对维护期商品不显示完成按钮，放弃 / 废弃的商品不在运营列表中）
+OPERATING_STATUSES = ("Pending", "Active")
+
+ROLLOVER_COLUMNS = "id,operatorId,workspace,strategy,status,dayCount,taskProgress"
+
+
+def lifecycle(product) -> tuple[int, dict[int, int]]:
+    """商品的 (运营周期天数, 每天任务数)；淘工厂按打法选择模板，其余为标准 14 天"""
+    if product.get("workspace") == "TaoFactory" and product.get("strategy") in TAO_STRATEGIES:
+        return TAO_STRATEGIES[product["strategy"]]
+    return STANDARD_DAYS, STANDARD_TASKS
+
+
+def dayTasksDone(product, day: int) -> bool:
+    """当天上传了截图的任务数是否不少于模板任务数（与前端的判断一致）"""
+    _, tasks = lifecycle(product)
+    progress = (product.get("taskProgress") or {}).get(str(day)) or {}
+    done = sum(1 for t in progress.values() if (t or {}).get("images"))
+    return done >= tasks.get(day, 0)
+
+
+def planDayComplete(product) -> Optional[tuple[dict, list[tuple[str, dict]]]]:
+    """
+    完成当天任务时的 (字段变更, [(事件类型, 事件参数)])；状态不允许或任务未完成返回 None。
+    """
+    if product.get("status") not in OPERATING_STATUSES:
+        return None
+    day = product.get("dayCount") or 0
+    if not dayTasksDone(product, day):
+        return None
+
+    maxDays, _ = lifecycle(product)
+    nextDay = day + 1
+    changes: dict = {"dayCount": nextDay}
+    events: list[tuple[str, dict]] = [("DAY_COMPLETE", {"day": day, "cycleKey": f"D{day}"})]
+    if nextDay > maxDays:
+        changes["status"] = "Maintenance"
+        changes["lifecycleStage"] = MAINTENANCE_STAGE
+        events.append(("ASSET_COMPLETE", {}))
+    return changes, events
+
+
+def planRollover(product) -> Optional[tuple[dict, list[tuple[str, dict]]]]:
+    """
+    日终自动推进：只处理 Active 且当天位于运营模板内（有任务可核对）的商品，
+    没有任务模板的天数（如新建商品的第 0 天）需要运营人手动完成。
+    """
+    if product.get("status") != "Active":
+        return None
+    _, tasks = lifecycle(product)
+    if not tasks.get(product.get("dayCount") or 0):
+        return None
+    return planDayComplete(product)
+
+
+def creditRecords(product, events: list[tuple[str, dict]]) -> list[dict]:
+    return [
+        buildCreditRecord(
+            product["operatorId"], eventType,
+            relatedId=product["id"],
+            cycleKey=params.get("cycleKey", "default"),
+            data=params,
+        )
+        for eventType, params in events
+        if product.get("operatorId")
+    ]
+
+
+def _rolloverWorkspace(workspace: str) -> tuple[int, list[dict]]:
+    """推进一个工作区，返回 (推进的商品数, 待发放的信用记录)"""
+    records: list[dict] = []
+
+    if USE_SUPABASE:
+        products = supabase_client.select(
+            TABLE, columns=ROLLOVER_COLUMNS,
+            filters={"workspace": f"eq.{workspace}", "status": "eq.Active"},
+        )
+        plans = {}
+        for p in products:
+            plan = planRollover(p)
+            if plan:
+                plans[p["id"]] = (p, plan)
+        if not plans:
+            return 0, records
+        # 一条 UPDATE ... FROM jsonb_to_recordset 完成整批写入，以读到的 dayCount 为条件，返回真正被更新的 id
+        applied = supabase_client.rpc("apply_product_rollover", {
+            "changes": [
+                {"id": pid, "fromDay": p.get("dayCount") or 0, **plan[0]}
+                for pid, (p, plan) in plans.items()
+            ],
+        })
+        for row in applied:
+            product, (_, events) = plans[row["id"]]
+            records += creditRecords(product, events)
+        return len(applied), records
+
+    # 按商品记录待发放的事件：共享内存存储下 apply 可能因写入冲突对同一商品重复调用，以最后一次为准
+    events: dict[str, list[tuple[str, dict]]] = {}
+
+    def apply(product):
+        plan = planRollover(product)
+        if plan is None:
+            return None
+        events[product["id"]] = plan[1]
+        return plan[0]
+
+    active = memory_store.get_all(TABLE, {"workspace": workspace, "status": "Active"})
+    changed = memory_store.modify_many(TABLE, [p["id"] for p in active], apply)
+    for product in changed:
+        records += creditRecords(product, events[product["id"]])
+    return len(changed), records
+
+
+def runLifecycleRollover(now: datetime) -> dict:
+    """对所有工作区执行日终推进并批量发放信用事件"""
+    today = now.date().isoformat()
+    summary: dict = {"date": today}
+    records: list[dict] = []
+    for workspace in WORKSPACES:
+        advanced, wsRecords = _rolloverWorkspace(workspace)
+        summary[workspace] = advanced
+        records += wsRecords
+    summary["creditEvents"] = len(applyCreditEvents(records))
+    return summary
@@ -0,0 +1,272 @@
+"""
+按需请求采样分析 — 定位线上慢路由的耗时落在 response_model 校验、SupabaseRestClient 往返还是 Python 循环上。
+触发方式（默认都不开启，未触发的请求只多一次请求头扫描）：
+  管理员请求携带 X-Profile: 1（按 token 中的 role 声明判断，不查询用户表）；
+  或 PROFILE_SAMPLE_RATE 设置为 0~1 之间的比例，按比例随机抽取请求。
+被分析的请求执行期间，采样线程每 PROFILE_INTERVAL_MS 毫秒读取一次调用栈：
+事件循环线程的栈中包含该请求自身中间件帧时，记为该请求的协程栈；
+否则查找正在为该请求工作的线程池线程（同步路由处理函数、run_in_threadpool / asyncio.to_thread），
+这些线程执行的是请求上下文的副本，可由 currentProfile 识别，栈以 [worker] 开头；
+两者都没有时记为 [waiting]（等待 I/O 或其他请求占用事件循环）。
+结果为 collapsed stack 格式（每行 "帧;帧;帧 次数"），可直接交给 flamegraph.pl / speedscope 绘制火焰图，
+响应头 X-Profile-Id 返回分析 ID，通过 /api/admin/profiles/{id} 下载。
+分析结果只保存在当前进程内存中，保留最近 PROFILE_KEEP 份。
+"""
+
+import contextvars
+import functools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import thread as futuresThread
+from datetime import datetime
+from typing import Optional
+
+from .auth_utils import verifyToken
+from .ids import newId
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+PROFILE_HEADER = b"x-profile"
+# 单个栈最多记录的帧数，防止深递归产生超长行
+MAX_DEPTH = 128
+
+WAITING = "[waiting]"
+WORKER = "[worker]"
+
+# 正在被分析的请求；线程池执行时会复制请求的上下文，采样线程据此认出为该请求工作的线程
+currentProfile: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("currentProfile", default=None)
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _frameLabel(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_ROOT):
+        filename = os.path.relpath(filename, _ROOT)
+    elif "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    # collapsed 格式以 ; 分隔帧、以行尾最后一个空格分隔次数，帧名中的空格无需转义
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+class Profile:
+    """一次请求的采样结果"""
+
+    def __init__(self, method: str, path: str, rootFrame, threadId: int):
+        self.id = newId()
+        self.method = method
+        self.path = path
+        self.rootFrame = rootFrame
+        self.threadId = threadId
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.status: Optional[int] = None
+        self.startedAt = datetime.now().isoformat()
+        self._start = time.perf_counter()
+        self.durationMs = 0.0
+
+    def finish(self, status: Optional[int]):
+        self.durationMs = round((time.perf_counter() - self._start) * 1000, 2)
+        self.status = status
+        self.rootFrame = None
+
+    def collapsed(self) -> str:
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> dict:
+        waiting = self.stacks.get((WAITING,), 0)
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "startedAt": self.startedAt,
+            "durationMs": self.durationMs,
+            "samples": self.samples,
+            "waitingSamples": waiting,
+        }
+
+
+class Sampler:
+    """共享的采样线程：有请求正在被分析时运行，最后一个分析结束后退出"""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, keep: int = PROFILE_KEEP):
+        self.interval = interval
+        self.keep = keep
+        self._active: dict[str, Profile] = {}
+        self._results: OrderedDict[str, Profile] = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, profile: Profile):
+        with self._lock:
+            self._active[profile.id] = profile
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, profile: Profile, status: Optional[int]):
+        with self._lock:
+            self._active.pop(profile.id, None)
+            profile.finish(status)
+            self._results[profile.id] = profile
+            while len(self._results) > self.keep:
+                self._results.popitem(last=False)
+
+    def get(self, profileId: str) -> Optional[Profile]:
+        with self._lock:
+            return self._results.get(profileId)
+
+    def list(self) -> list[dict]:
+        with self._lock:
+            return [p.summary() for p in reversed(self._results.values())]
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                active = list(self._active.values())
+            frames = sys._current_frames()
+            loopThreads = {profile.threadId for profile in active}
+            workers = [
+                (profile, stack)
+                for threadId, frame in frames.items()
+                if threadId not in loopThreads and threadId != threading.get_ident()
+                for profile, stack in (_workerStack(frame),)
+                if profile is not None
+            ]
+            for profile in active:
+                self._sample(profile, frames.get(profile.threadId), [s for p, s in workers if p is profile])
+            del frames, workers
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _sample(profile: Profile, frame, workerStacks: "list[tuple]"):
+        root = profile.rootFrame
+        if root is None:
+            return
+        stack, top = [], None
+        while frame is not None and frame is not root:
+            stack.append(_frameLabel(frame.f_code))
+            top, frame = frame, frame.f_back
+        if top is not None and top.f_code in _OWN_CODES:
+            # 请求正在执行分析器自身的开始 / 结束逻辑，不计入
+            return
+        profile.samples += 1
+        if frame is not None:
+            profile.stacks[tuple(reversed(stack[-MAX_DEPTH:]))] += 1
+        elif workerStacks:
+            # 协程在等待线程池：计入为该请求工作的线程的栈
+            for workerStack in workerStacks:
+                profile.stacks[workerStack] += 1
+        else:
+            # 栈中没有本请求的中间件帧，也没有线程在为它工作：该请求此刻没有在运行
+            profile.stacks[(WAITING,)] += 1
+
+
+_OWN_CODES = (Sampler.start.__code__, Sampler.stop.__code__)
+
+
+def _anyioWorkerCode():
+    """Starlette / FastAPI 的线程池（anyio 工作线程）循环函数，anyio 版本不符时返回 None"""
+    try:
+        from anyio._backends._asyncio import WorkerThread
+        return WorkerThread.run.__code__
+    except (ImportError, AttributeError):
+        return None
+
+
+_ANYIO_WORKER = _anyioWorkerCode()
+_EXECUTOR_WORKER = futuresThread._WorkItem.run.__code__
+
+
+def _workerContext(frame) -> Optional[contextvars.Context]:
+    """线程池工作帧中正在执行的请求上下文副本"""
+    local = frame.f_locals
+    if frame.f_code is _ANYIO_WORKER:
+        context = local.get("context")
+    else:
+        # asyncio.to_thread 提交的是 functools.partial(context.run, func, ...)
+        fn = getattr(local.get("self"), "fn", None)
+        context = getattr(fn.func, "__self__", None) if isinstance(fn, functools.partial) else None
+    return context if isinstance(context, contextvars.Context) else None
+
+
+def _workerStack(frame) -> tuple[Optional[Profile], tuple]:
+    """线程正在为某个被分析的请求工作时，返回 (该请求的 Profile, 工作函数以上的栈)"""
+    stack = []
+    while frame is not None:
+        if frame.f_code is _ANYIO_WORKER or frame.f_code is _EXECUTOR_WORKER:
+            context = _workerContext(frame)
+            profile = context.get(currentProfile) if context is not None else None
+            if profile is None:
+                return None, ()
+            return profile, (WORKER, *reversed(stack[-MAX_DEPTH:]))
+        stack.append(_frameLabel(frame.f_code))
+        frame = frame.f_back
+    return None, ()
+
+# 单例实例
+sampler = Sampler()
+
+
+def _isAdminToken(value: str) -> bool:
+    """只看已验证 token 中的 role 声明，不在事件循环上查询用户表；旧 token 不含 role，需重新登录"""
+    scheme, _, token = value.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    payload = verifyToken(token)
+    return bool(payload) and payload.get("role") == "admin"
+
+
+def _wantsProfile(scope) -> bool:
+    requested, authorization = False, ""
+    for key, value in scope.get("headers", ()):
+        if key == PROFILE_HEADER:
+            requested = value.strip() in (b"1", b"true")
+        elif key == b"authorization":
+            authorization = value.decode("latin-1")
+    if requested and _isAdminToken(authorization):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class ProfilerMiddleware:
+    """ASGI 中间件：对被选中的请求采样调用栈，响应头附带 X-Profile-Id"""
+
+    def __init__(self, app, sampler: Sampler = sampler):
+        self.app = app
+        self.sampler = sampler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wantsProfile(scope):
+            return await self.app(scope, receive, send)
+
+        # 本帧是该请求协程栈的一部分，采样时据此判断请求是否正在运行
+        profile = Profile(scope["method"], scope["path"], sys._getframe(), threading.get_ident())
+        status: Optional[int] = None
+
+        async def sendWithId(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", ()), (b"x-profile-id", profile.id.encode())],
+                }
+            await send(message)
+
+        self.sampler.start(profile)
+        marker = currentProfile.set(profile)
+        try:
+            await self.app(scope, receive, sendWithId)
+        finally:
+            currentProfile.reset(marker)
+            self.sampler.stop(profile, status)
@@ -0,0 +1,113 @@
+"""
+公共池领取队列 — 每个工作区一个 FIFO 队列，领取下一个商品时从队首 O(1) 弹出。
+公共池商品即 status=Abandoned 且无运营人的商品：入池（新建、放弃、恢复）时追加到队尾，
+离池（被领取、被改为其他状态）时只从成员表移除，队列中的残留条目在弹出或列举时惰性跳过。
+队列只决定候选顺序，商品归属由存储层的条件更新（CAS）裁决，并发或多实例领取不会重复分配。
+首次使用时从存储加载，Supabase 模式下其他实例的写入无法感知，因此按 PUBLIC_POOL_REFRESH_SECONDS 定期重建。
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from .database import USE_SUPABASE, supabase_client
+from .memory_store import memory_store
+
+REFRESH_SECONDS = int(os.getenv("PUBLIC_POOL_REFRESH_SECONDS", "60"))
+
+POOL_STATUS = "Abandoned"
+# PostgREST 条件：运营人为空（NULL 或空串）
+POOL_OPERATOR_FILTER = "(operatorId.is.null,operatorId.eq.)"
+
+
+def isPoolRow(row) -> bool:
+    return row.get("status") == POOL_STATUS and not row.get("operatorId")
+
+
+class PublicPool:
+    def __init__(self):
+        # 工作区 -> 队列，条目为 (商品 id, 入池序号)
+        self._queues: dict[str, deque[tuple[str, int]]] = {}
+        # 当前在池中的商品 id -> 入池序号；队列条目的序号与此不符（已离池或重新入池）即视为失效
+        self._members: dict[str, int] = {}
+        self._tickets = 0
+        self._lock = threading.Lock()
+        self._loadedAt: Optional[float] = None
+
+    # ---- 维护 ----
+
+    def _ensureLoaded(self):
+        if self._loadedAt is not None and not (
+            (USE_SUPABASE or memory_store.shared) and time.monotonic() - self._loadedAt > REFRESH_SECONDS
+        ):
+            return
+        if USE_SUPABASE:
+            rows = supabase_client.select(
+                "products", columns="id,workspace,status,operatorId",
+                filters={"status": f"eq.{POOL_STATUS}", "or": POOL_OPERATOR_FILTER},
+                order="created_at.asc",
+            )
+        else:
+            rows = memory_store.get_all("products", {"status": POOL_STATUS})
+        with self._lock:
+            self._queues, self._members = {}, {}
+            for row in rows:
+                if isPoolRow(row):
+                    self._push(row)
+            self._loadedAt = time.monotonic()
+
+    def _push(self, row):
+        self._tickets += 1
+        self._members[row["id"]] = self._tickets
+        workspace = row.get("workspace") or "Tmall"
+        self._queues.setdefault(workspace, deque()).append((row["id"], self._tickets))
+
+    def sync(self, row):
+        """商品新增或更新后调用：进入公共池则排到队尾，离开则移出；尚未加载时忽略"""
+        with self._lock:
+            if self._loadedAt is None:
+                return
+            inPool = row["id"] in self._members
+            if isPoolRow(row) and not inPool:
+                self._push(row)
+            elif not isPoolRow(row) and inPool:
+                del self._members[row["id"]]
+
+    def discard(self, productId: str):
+        with self._lock:
+            self._members.pop(productId, None)
+
+    def invalidate(self):
+        self._loadedAt = None
+
+    # ---- 查询 ----
+
+    def pop(self, workspace: str) -> Optional[str]:
+        """弹出工作区队首的在池商品 id，池为空返回 None"""
+        self._ensureLoaded()
+        with self._lock:
+            queue = self._queues.get(workspace)
+            while queue:
+                productId, ticket = queue.popleft()
+                if self._members.get(productId) == ticket:
+                    del self._members[productId]
+                    return productId
+            return None
+
+    def ids(self, workspace: str, limit: Optional[int] = None) -> list[str]:
+        """按入池顺序列出工作区内的在池商品 id，顺带压缩失效条目"""
+        self._ensureLoaded()
+        with self._lock:
+            queue = self._queues.get(workspace)
+            if not queue:
+                return []
+            live = deque(e for e in queue if self._members.get(e[0]) == e[1])
+            self._queues[workspace] = live
+            ids = [pid for pid, _ in live]
+            return ids[:limit] if limit else ids
+
+
+# 单例实例
+publicPool = PublicPool()
@@ -0,0 +1,129 @@
+"""
+上游调用弹性工具 — 抖动退避、熔断器、延迟分位统计与隔离舱。
+供 SupabaseRestClient 在 PostgREST 抖动或故障时快速失败、重试幂等读取并对慢请求发起对冲；
+隔离舱按请求的流量类别限制并发上游调用，避免某类重请求占满连接预算。
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# 当前请求的流量类别，由准入中间件按路由设置；上游调用据此选择隔离舱
+trafficClass: ContextVar[str] = ContextVar("trafficClass", default="default")
+
+
+class UpstreamUnavailable(Exception):
+    """熔断器处于打开状态，上游请求被直接拒绝"""
+
+    def __init__(self, retryAfter: float):
+        super().__init__(f"Upstream circuit open, retry after {retryAfter:.0f}s")
+        self.retryAfter = retryAfter
+
+
+def backoffDelay(attempt: int, base: float, cap: float) -> float:
+    """指数退避 + 全抖动：在 [0, min(cap, base * 2^attempt)] 内均匀取值"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    基于滑动窗口失败率的熔断器。
+    closed: 正常放行；窗口内调用数达到 minCalls 且失败率超过阈值时转为 open。
+    open: 直接拒绝，openSeconds 后转为 half-open。
+    half-open: 只放行一个探测请求，成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, failureRatio: float = 0.5, minCalls: int = 10,
+                 window: int = 20, openSeconds: float = 30.0):
+        self.failureRatio = failureRatio
+        self.minCalls = minCalls
+        self.openSeconds = openSeconds
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._openedAt: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._openedAt is None:
+            return "closed"
+        if time.monotonic() - self._openedAt < self.openSeconds:
+            return "open"
+        return "half-open"
+
+    def allow(self):
+        """放行则返回，否则抛出 UpstreamUnavailable"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return
+            remaining = self.openSeconds - (time.monotonic() - self._openedAt)
+            raise UpstreamUnavailable(max(1.0, remaining))
+
+    def record(self, ok: bool):
+        with self._lock:
+            if self._openedAt is not None:
+                # half-open 探测结果决定关闭还是重新打开
+                self._probing = False
+                if ok:
+                    self._openedAt = None
+                    self._outcomes.clear()
+                else:
+                    self._openedAt = time.monotonic()
+                return
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if (len(self._outcomes) >= self.minCalls
+                    and failures / len(self._outcomes) > self.failureRatio):
+                self._openedAt = time.monotonic()
+
+
+class LatencyTracker:
+    """保留最近若干次成功请求的耗时，用于计算对冲阈值"""
+
+    def __init__(self, size: int = 200, minSamples: int = 20):
+        self._samples: deque[float] = deque(maxlen=size)
+        self.minSamples = minSamples
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """样本不足时返回 None"""
+        if len(self._samples) < self.minSamples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Bulkhead:
+    """
+    信号量隔离舱：限制同一流量类别同时进行的上游调用数。
+    没有空位时立即抛出 UpstreamUnavailable（由全局处理器转为 503 + Retry-After），
+    不在工作线程里等待，避免排队的请求继续占用线程池。
+    """
+
+    def __init__(self, limit: int, retryAfter: float = 1.0):
+        self.limit = limit
+        self.retryAfter = retryAfter
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise UpstreamUnavailable(self.retryAfter)
+        try:
+            yield
+        finally:
+            self._slots.release()
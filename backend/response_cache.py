@@ -0,0 +1,163 @@
+"""
+预压缩响应缓存 — 大列表接口（商品、成员、目标）的 JSON 字节与压缩结果按表版本号缓存。
+缓存键由路由与查询参数组成，版本令牌为所依赖各表的版本号：
+内存模式取 MemoryStore.version()，Supabase 模式取本实例的写入计数，并以 RESPONSE_CACHE_TTL 兜底其他实例的写入。
+数据未变时重复请求只需一次字典查找；按 Accept-Encoding 协商 br / gzip / identity，各编码结果首次使用时生成并缓存，
+同时以版本令牌生成 ETag，客户端轮询可直接得到 304。
+缓存的字节先经 response_model 校验与序列化，与未缓存时的响应一致。DEBUG=true 时关闭；
+Supabase 模式下其他实例的写入最多 RESPONSE_CACHE_TTL 秒后才可见，因此默认关闭，需显式开启。
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+from fastapi import Request, Response
+from pydantic import BaseModel, TypeAdapter
+
+from .database import USE_SUPABASE, supabase_client
+from .memory_store import memory_store
+from .serialization import DEBUG, respond
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只协商 gzip
+    brotli = None
+
+RESPONSE_CACHE = (
+    os.getenv("RESPONSE_CACHE", "false" if USE_SUPABASE else "true").lower() == "true" and not DEBUG
+)
+MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_ENTRIES", "256"))
+# Supabase 模式下感知不到其他实例的写入，缓存最长保留时间
+TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+# 小于该字节数的响应不压缩
+COMPRESS_MIN_BYTES = 1024
+
+
+def tableVersion(table: str) -> int:
+    if USE_SUPABASE:
+        return supabase_client.writeVersion(table)
+    return memory_store.version(table)
+
+
+@lru_cache(maxsize=None)
+def _listAdapter(model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])
+
+
+def _render(rows: list, model: type[BaseModel]) -> bytes:
+    """按 response_model 校验并序列化，缓存内容与路由正常返回的 JSON 一致"""
+    adapter = _listAdapter(model)
+    return adapter.dump_json(adapter.validate_python(rows))
+
+
+def negotiate(acceptEncoding: str) -> str:
+    """按 Accept-Encoding（含 q 值）选择编码，同权重时优先 br，其次 gzip"""
+    weights: dict[str, float] = {}
+    for part in acceptEncoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, bestQ = "identity", 0.0
+    for encoding in candidates:
+        q = weights.get(encoding, wildcard)
+        if q > bestQ:
+            best, bestQ = encoding, q
+    return best
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class _Entry:
+    __slots__ = ("token", "createdAt", "etag", "bodies")
+
+    def __init__(self, token: tuple, body: bytes):
+        self.token = token
+        self.createdAt = time.monotonic()
+        self.etag = '"' + hashlib.blake2b(repr(token).encode() + body, digest_size=12).hexdigest() + '"'
+        self.bodies = {"identity": body}
+
+
+class ResponseCache:
+    def __init__(self, maxEntries: int = MAX_ENTRIES):
+        self.maxEntries = maxEntries
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "notModified": 0}
+
+    def _lookup(self, key: tuple, token: tuple) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.token != token or (
+                USE_SUPABASE and time.monotonic() - entry.createdAt > TTL_SECONDS
+            ):
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key: tuple, entry: _Entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxEntries:
+                self._entries.popitem(last=False)
+
+    def serve(self, request: Request, key: tuple, tables: tuple[str, ...],
+              build: Callable[[], Any], model: type[BaseModel]) -> Any:
+        """
+        返回 key 对应的缓存响应；tables 任一版本变化或缓存缺失时调用 build 重新生成。
+        版本令牌在 build 之前读取，生成期间发生的写入会使下一次请求重新生成。
+        model 为 build 返回的行对应的模型（路由 response_model 的元素类型）。
+        """
+        if not RESPONSE_CACHE:
+            return respond(build(), model)
+
+        token = tuple(tableVersion(t) for t in tables)
+        entry = self._lookup(key, token)
+        if entry is None:
+            self.stats["misses"] += 1
+            entry = _Entry(token, _render(build(), model))
+            self._store(key, entry)
+        else:
+            self.stats["hits"] += 1
+
+        headers = {"ETag": entry.etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+        if entry.etag in (t.strip() for t in request.headers.get("if-none-match", "").split(",")):
+            self.stats["notModified"] += 1
+            return Response(status_code=304, headers=headers)
+
+        encoding = "identity"
+        if len(entry.bodies["identity"]) >= COMPRESS_MIN_BYTES:
+            encoding = negotiate(request.headers.get("accept-encoding", ""))
+        body = entry.bodies.get(encoding)
+        if body is None:
+            # 并发请求可能重复压缩同一条目，结果相同，后写者覆盖即可
+            body = entry.bodies[encoding] = _compress(entry.bodies["identity"], encoding)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 单例实例
+responseCache = ResponseCache()
@@ -4,20 +4,24 @@
 """
 
 from __future__ import annotations
-import uuid
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import Response
 from pydantic import BaseModel
 from typing import Optional
 
 from ..auth_utils import getCurrentUser, hashPassword
 from ..database import USE_SUPABASE, supabase_client
+from ..ids import newId
+from ..leaderboard import leaderboard
 from ..memory_store import memory_store
+from ..profiler import sampler
+from ..scheduler import scheduler
 from ..routers.auth import (
     _findUserByUsername,
     _findUserById,
     _toUserResponse,
-    memoryUsers,
-    useSupabaseAuth,
+    USERS_TABLE,
+    usingSupabaseAuth,
     UserResponse,
 )
 
@@ -38,7 +42,7 @@ class AdjustCreditRequest(BaseModel):
 # ============== 统计 API ==============
 
 @router.get("/stats")
-async def getStats(currentUser: dict = Depends(getCurrentUser)):
+def getStats(currentUser: dict = Depends(getCurrentUser)):
     """
     全局统计数据 — 跨工作区汇总。
     返回成员、商品、目标、信用分等核心指标。
@@ -92,11 +96,12 @@ async def getStats(currentUser: dict = Depends(getCurrentUser)):
     tmallCompletedTargets = len([t for t in tmallTargets if t.get("completedAt")])
     taoCompletedTargets = len([t for t in taoTargets if t.get("completedAt")])
 
-    # 成员排行（按积分排序）
+    # 成员排行（按积分排序，同分按 id，与排行榜一致）：由本次读取的 members 计算，
+    # 与上面的平均分、分布保持同一份数据，不使用可能尚未刷新的排行榜缓存
     memberRanking = sorted(
-        [{"id": m["id"], "name": m["name"], "role": m.get("role", ""), "creditScore": m.get("creditScore", 0)} for m in members],
-        key=lambda x: x["creditScore"],
-        reverse=True,
+        [{"id": m["id"], "name": m.get("name", ""), "role": m.get("role", ""), "creditScore": m.get("creditScore", 0)}
+         for m in members],
+        key=lambda x: (-x["creditScore"], x["id"]),
     )
 
     return {
@@ -131,17 +136,17 @@ async def getStats(currentUser: dict = Depends(getCurrentUser)):
 # ============== 用户管理 API ==============
 
 @router.get("/users", response_model=list[UserResponse])
-async def listUsers(currentUser: dict = Depends(getCurrentUser)):
+def listUsers(currentUser: dict = Depends(getCurrentUser)):
     """获取所有管理员账号列表"""
-    if useSupabaseAuth:
+    if usingSupabaseAuth():
         rows = supabase_client.select("admin_users")
         return [_toUserResponse(r) for r in rows]
     else:
-        return [_toUserResponse(u) for u in memoryUsers]
+        return [_toUserResponse(u) for u in memory_store.get_all(USERS_TABLE)]
 
 
 @router.delete("/users/{userId}")
-async def deleteUser(userId: str, currentUser: dict = Depends(getCurrentUser)):
+def deleteUser(userId: str, currentUser: dict = Depends(getCurrentUser)):
     """删除管理员账号（不能删除自己）"""
     if userId == currentUser["sub"]:
         raise HTTPException(status_code=400, detail="不能删除当前登录的账号")
@@ -150,16 +155,16 @@ async def deleteUser(userId: str, currentUser: dict = Depends(getCurrentUser)):
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
 
-    if useSupabaseAuth:
+    if usingSupabaseAuth():
         supabase_client.delete("admin_users", {"id": f"eq.{userId}"})
     else:
-        memoryUsers[:] = [u for u in memoryUsers if u["id"] != userId]
+        memory_store.delete(USERS_TABLE, userId)
 
     return {"ok": True}
 
 
 @router.put("/users/{userId}/reset-password")
-async def resetUserPassword(
+def resetUserPassword(
     userId: str,
     body: ResetPasswordRequest,
     currentUser: dict = Depends(getCurrentUser),
@@ -171,14 +176,14 @@ async def resetUserPassword(
 
     newHash = hashPassword(body.newPassword)
 
-    if useSupabaseAuth:
+    if usingSupabaseAuth():
         supabase_client.update(
             "admin_users",
             filters={"id": f"eq.{userId}"},
             data={"hashed_password": newHash},
         )
     else:
-        user["hashed_password"] = newHash
+        memory_store.update(USERS_TABLE, userId, {"hashed_password": newHash})
 
     return {"ok": True, "message": "密码已重置"}
 
@@ -186,7 +191,7 @@ async def resetUserPassword(
 # ============== 数据调整 API ==============
 
 @router.put("/members/{memberId}/credit")
-async def adjustMemberCredit(
+def adjustMemberCredit(
     memberId: str,
     body: AdjustCreditRequest,
     currentUser: dict = Depends(getCurrentUser),
@@ -207,11 +212,12 @@ async def adjustMemberCredit(
             {"id": f"eq.{memberId}"},
             {"creditScore": newScore},
         )
+        leaderboard.setScore(memberId, newScore)
 
         # 写入信用记录
         import datetime
         supabase_client.insert("credit_records", {
-            "id": str(uuid.uuid4())[:8],
+            "id": newId(),
             "userId": memberId,
             "change": body.change,
             "reason": f"[管理员调整] {body.reason}",
@@ -223,15 +229,17 @@ async def adjustMemberCredit(
 
         return {"ok": True, "newScore": newScore}
     else:
-        member = memory_store.get_by_id("members", memberId)
+        member = memory_store.modify(
+            "members", memberId,
+            lambda m: {"creditScore": max(0, m.get("creditScore", 0) + body.change)},
+        )
         if not member:
             raise HTTPException(status_code=404, detail="成员不存在")
-
-        member["creditScore"] = max(0, member.get("creditScore", 0) + body.change)
+        leaderboard.setScore(memberId, member["creditScore"])
 
         import datetime
         memory_store.insert("credit_records", {
-            "id": str(uuid.uuid4())[:8],
+            "id": newId(),
             "userId": memberId,
             "change": body.change,
             "reason": f"[管理员调整] {body.reason}",
@@ -242,3 +250,44 @@ async def adjustMemberCredit(
         })
 
         return {"ok": True, "newScore": member["creditScore"]}
+
+
+# ============== 定时任务 API ==============
+
+@router.get("/jobs")
+def listJobs(currentUser: dict = Depends(getCurrentUser)):
+    """查看定时任务状态"""
+    return scheduler.statuses()
+
+
+@router.post("/jobs/{jobName}/run")
+async def runJob(jobName: str, currentUser: dict = Depends(getCurrentUser)):
+    """立即执行指定定时任务"""
+    if jobName not in scheduler.jobs:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    try:
+        result = await scheduler.runJob(jobName)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"ok": True, "result": result}
+
+
+# ============== 请求采样分析 API ==============
+
+@router.get("/profiles")
+def listProfiles(currentUser: dict = Depends(getCurrentUser)):
+    """列出本进程最近的请求采样结果（新的在前）"""
+    return sampler.list()
+
+
+@router.get("/profiles/{profileId}")
+def downloadProfile(profileId: str, currentUser: dict = Depends(getCurrentUser)):
+    """下载 collapsed stack 格式的采样结果，可用 flamegraph.pl / speedscope 生成火焰图"""
+    profile = sampler.get(profileId)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="采样结果不存在或已过期")
+    return Response(
+        content=profile.collapsed(),
+        media_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="profile-{profileId}.folded"'},
+    )
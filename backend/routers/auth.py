@@ -3,7 +3,9 @@
 使用 Supabase admin_users 表存储账号，支持内存模式回退。
 """
 
+import threading
 import uuid
+import httpx
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Optional
@@ -15,6 +17,8 @@ from ..auth_utils import (
     getCurrentUser,
 )
 from ..database import supabase_client, USE_SUPABASE
+from ..memory_store import memory_store
+from ..resilience import UpstreamUnavailable
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -53,11 +57,50 @@ class LoginResponse(BaseModel):
 
 # ============== 内存模式兜底存储 ==============
 
-memoryUsers: list[dict] = []
+# 内存模式下账号存放在 memory_store 的同名表中，多 worker 共享内存存储时各进程看到同一份账号
+USERS_TABLE = "admin_users"
 
 # 当 Supabase 已配置但 admin_users 表不存在时，自动回退到内存模式
 useSupabaseAuth = USE_SUPABASE
 
+# PostgREST 表示表不存在的错误码（旧版为 PostgreSQL 的 42P01）
+MISSING_TABLE_CODES = ("PGRST205", "42P01")
+# 上游暂时不可用时，认证请求返回 503 后建议的重试间隔
+AUTH_RETRY_AFTER = 5.0
+
+# 默认管理员在首次查找用户时创建（应用启动后也会在后台预先执行），
+# bcrypt 哈希与 admin_users 查询不再计入模块导入耗时
+_authReady = False
+_authLock = threading.Lock()
+
+
+def ensureDefaultAdmin():
+    """
+    确保默认管理员账号存在；成功后不再执行，并发调用时等待首次执行完成。
+    上游暂时不可用时抛出 UpstreamUnavailable 且不标记完成，下次调用重试。
+    """
+    global _authReady
+    if _authReady:
+        return
+    with _authLock:
+        if not _authReady:
+            _ensureDefaultAdmin()
+            _authReady = True
+
+
+def usingSupabaseAuth() -> bool:
+    """认证数据是否存放在 Supabase（首次调用时可能因 admin_users 不可用而回退到内存模式）"""
+    ensureDefaultAdmin()
+    return useSupabaseAuth
+
+
+def _isMissingTable(error: httpx.HTTPStatusError) -> bool:
+    try:
+        code = error.response.json().get("code")
+    except ValueError:
+        code = None
+    return code in MISSING_TABLE_CODES or (code is None and error.response.status_code == 404)
+
 
 def _ensureDefaultAdmin():
     """确保默认管理员账号存在（首次启动自动创建）"""
@@ -78,51 +121,58 @@ def _ensureDefaultAdmin():
                     "role": "admin",
                 })
                 print("[OK] 已创建默认管理员账号: admin / admin123")
-        except Exception as e:
-            # admin_users 表不存在时回退到内存模式
-            print(f"[WARN] Supabase admin_users 表访问失败: {e}")
+        except httpx.HTTPStatusError as e:
+            if not _isMissingTable(e):
+                # 鉴权失败、5xx 等不是配置缺失，不能回退到带默认密码的内存账号
+                print(f"[WARN] Supabase admin_users 表访问失败，稍后重试: {e}")
+                raise UpstreamUnavailable(AUTH_RETRY_AFTER) from e
+            # 只有 admin_users 表不存在（尚未执行 init_db.sql）时回退到内存模式
+            print(f"[WARN] Supabase admin_users 表不存在: {e}")
             print("[INFO] 认证模块回退到内存模式")
             useSupabaseAuth = False
+        except httpx.TransportError as e:
+            print(f"[WARN] Supabase 连接失败，稍后重试: {e}")
+            raise UpstreamUnavailable(AUTH_RETRY_AFTER) from e
 
     # 内存模式兜底：确保始终有默认管理员
     if not useSupabaseAuth:
-        if not any(u["username"] == "admin" for u in memoryUsers):
-            memoryUsers.append({
+        if not memory_store.get_all(USERS_TABLE, {"username": "admin"}):
+            # 按用户名幂等插入，多个 worker 同时启动也只会创建一个
+            created = memory_store.insert_unique(USERS_TABLE, [{
                 "id": str(uuid.uuid4()),
                 "username": "admin",
                 "hashed_password": hashPassword("admin123"),
                 "display_name": "管理员",
                 "role": "admin",
-            })
-            print("[OK] 内存模式：已创建默认管理员账号 admin / admin123")
-
+            }], ("username",))
+            if created:
+                print("[OK] 内存模式：已创建默认管理员账号 admin / admin123")
 
-# 模块加载时自动初始化
-_ensureDefaultAdmin()
 
 
 def _findUserByUsername(username: str) -> Optional[dict]:
     """根据用户名查找用户"""
-    if useSupabaseAuth:
+    if usingSupabaseAuth():
         rows = supabase_client.select(
             "admin_users",
             filters={"username": f"eq.{username}"},
         )
         return rows[0] if rows else None
     else:
-        return next((u for u in memoryUsers if u["username"] == username), None)
+        rows = memory_store.get_all(USERS_TABLE, {"username": username})
+        return rows[0] if rows else None
 
 
 def _findUserById(userId: str) -> Optional[dict]:
     """根据 ID 查找用户"""
-    if useSupabaseAuth:
+    if usingSupabaseAuth():
         rows = supabase_client.select(
             "admin_users",
             filters={"id": f"eq.{userId}"},
         )
         return rows[0] if rows else None
     else:
-        return next((u for u in memoryUsers if u["id"] == userId), None)
+        return memory_store.get_by_id(USERS_TABLE, userId)
 
 
 def _toUserResponse(user: dict) -> UserResponse:
@@ -138,7 +188,7 @@ def _toUserResponse(user: dict) -> UserResponse:
 # ============== 路由端点 ==============
 
 @router.post("/login", response_model=LoginResponse)
-async def login(body: LoginRequest):
+def login(body: LoginRequest):
     """
     用户登录 — 验证用户名密码后返回 JWT token。
     默认账号: admin / admin123
@@ -147,7 +197,8 @@ async def login(body: LoginRequest):
     if not user or not verifyPassword(body.password, user["hashed_password"]):
         raise HTTPException(status_code=401, detail="用户名或密码错误")
 
-    token = createAccessToken({"sub": user["id"], "username": user["username"]})
+    # role 声明供性能剖析等只需粗粒度判断的场景使用，免去每次查询用户表；权限接口仍以用户表为准
+    token = createAccessToken({"sub": user["id"], "username": user["username"], "role": user.get("role", "admin")})
 
     return LoginResponse(
         accessToken=token,
@@ -155,15 +206,20 @@ async def login(body: LoginRequest):
     )
 
 
-@router.get("/me", response_model=UserResponse)
-async def getMe(currentUser: dict = Depends(getCurrentUser)):
-    """获取当前登录用户信息"""
-    user = _findUserById(currentUser["sub"])
+def loadUserInfo(userId: str) -> UserResponse:
+    """按 ID 读取用户信息，不存在时抛出 404"""
+    user = _findUserById(userId)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     return _toUserResponse(user)
 
 
+@router.get("/me", response_model=UserResponse)
+def getMe(currentUser: dict = Depends(getCurrentUser)):
+    """获取当前登录用户信息"""
+    return loadUserInfo(currentUser["sub"])
+
+
 def registerUserInternal(
     username: str,
     password: str,
@@ -189,13 +245,13 @@ def registerUserInternal(
     if useSupabaseAuth:
         supabase_client.insert("admin_users", newUser)
     else:
-        memoryUsers.append(newUser)
+        memory_store.insert(USERS_TABLE, newUser)
 
     return newUser
 
 
 @router.post("/register", response_model=UserResponse)
-async def register(body: RegisterRequest, currentUser: dict = Depends(getCurrentUser)):
+def register(body: RegisterRequest, currentUser: dict = Depends(getCurrentUser)):
     """
     创建新账号 — 需要已登录管理员权限。
     防止未授权用户注册。
@@ -210,7 +266,7 @@ async def register(body: RegisterRequest, currentUser: dict = Depends(getCurrent
 
 
 @router.put("/password")
-async def changePassword(
+def changePassword(
     body: ChangePasswordRequest,
     currentUser: dict = Depends(getCurrentUser),
 ):
@@ -231,6 +287,6 @@ async def changePassword(
             data={"hashed_password": newHash},
         )
     else:
-        user["hashed_password"] = newHash
+        memory_store.update(USERS_TABLE, user["id"], {"hashed_password": newHash})
 
     return {"ok": True, "message": "密码修改成功"}
@@ -0,0 +1,157 @@
+"""
+图片存储 API。
+上传原始字节（仅限 PNG/JPEG/WebP/GIF，需登录）得到内容哈希与短引用；
+读取时支持 ETag 条件请求与 Range 分段下载，并禁止浏览器对内容做类型嗅探。
+"""
+
+from __future__ import annotations
+import asyncio
+import os
+import re
+from typing import Iterator, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from ..auth_utils import getCurrentUser
+from ..blob_store import (
+    ALLOWED_TYPES, MAX_BLOB_BYTES, THUMBNAIL_SIZES,
+    BlobTooLarge, UnsupportedBlobType, blobStore, isBlobHash, normalizeType,
+)
+
+router = APIRouter(prefix="/api/blobs", tags=["blobs"])
+
+CHUNK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+# 内容寻址：同一 URL 的内容永不改变
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _parseRange(header: str, size: int) -> Optional[tuple[int, int]]:
+    """解析单段 Range 头，返回闭区间 (start, end)；不支持的多段请求返回 None 按整体返回"""
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":
+        length = int(last)
+        if length == 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def _readRange(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@router.post("")
+async def uploadBlob(request: Request, currentUser: dict = Depends(getCurrentUser)):
+    """
+    上传图片：请求体为原始字节，Content-Type 为 PNG/JPEG/WebP/GIF 之一且须与文件头一致。
+    请求体边读边计数，超过上限立即返回 413，不会先把整个请求体读入内存。
+    返回 {hash, ref, size, contentType}，行内保存 ref 即可。
+    """
+    declared = request.headers.get("content-length")
+    try:
+        declaredSize = int(declared) if declared else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    if declaredSize is not None and declaredSize < 0:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    if declaredSize is not None and declaredSize > MAX_BLOB_BYTES:
+        raise HTTPException(status_code=413, detail=f"文件超过 {MAX_BLOB_BYTES} 字节上限")
+    contentType = normalizeType(request.headers.get("content-type", ""))
+    if contentType not in ALLOWED_TYPES:
+        raise HTTPException(status_code=415, detail=f"仅支持 {', '.join(sorted(ALLOWED_TYPES))} 图片")
+
+    data = bytearray()
+    async for chunk in request.stream():
+        data += chunk
+        if len(data) > MAX_BLOB_BYTES:
+            raise HTTPException(status_code=413, detail=f"文件超过 {MAX_BLOB_BYTES} 字节上限")
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty body")
+    try:
+        return await asyncio.to_thread(blobStore.put, bytes(data), contentType)
+    except BlobTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedBlobType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+
+def _blobResponse(digest: str, request: Request, variant: Optional[str], withBody: bool) -> Response:
+    """
+    读取图片。variant 指定缩略图规格，尚未生成时回退到原图（不缓存）。
+    支持 If-None-Match 返回 304，以及单段 Range 返回 206；withBody 为 False 时只返回响应头。
+    """
+    if not isBlobHash(digest):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    meta = blobStore.meta(digest)
+    if meta is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+
+    path, contentType, etag = blobStore.path(digest), meta["contentType"], f'"{digest}"'
+    cacheControl = IMMUTABLE
+    if variant:
+        thumb = blobStore.variantPath(digest, variant)
+        if thumb is not None:
+            path, contentType, etag = thumb, "image/jpeg", f'"{digest}.{variant}"'
+        else:
+            cacheControl = "no-cache"
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cacheControl,
+        "Accept-Ranges": "bytes",
+        # 按声明的图片类型渲染，不允许浏览器把内容嗅探成 HTML/脚本
+        "X-Content-Type-Options": "nosniff",
+    }
+    if etag in (t.strip() for t in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+
+    size = os.path.getsize(path)
+    span = None
+    rangeHeader = request.headers.get("range")
+    # If-Range 与 ETag 不符时忽略 Range，返回完整内容
+    if rangeHeader and request.headers.get("if-range", etag) == etag:
+        span = _parseRange(rangeHeader, size)
+    start, end = span if span else (0, size - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    status = 200
+    if span:
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    if not withBody:
+        return Response(status_code=status, headers=headers, media_type=contentType)
+    return StreamingResponse(
+        _readRange(path, start, end), status_code=status, headers=headers, media_type=contentType
+    )
+
+
+VARIANT_QUERY = Query(None, description="缩略图规格：" + " / ".join(THUMBNAIL_SIZES))
+
+
+@router.get("/{digest}")
+def getBlob(digest: str, request: Request, variant: Optional[str] = VARIANT_QUERY):
+    """读取图片内容"""
+    return _blobResponse(digest, request, variant, withBody=True)
+
+
+@router.head("/{digest}")
+def headBlob(digest: str, request: Request, variant: Optional[str] = VARIANT_QUERY):
+    """只返回图片的响应头（大小、ETag、类型）"""
+    return _blobResponse(digest, request, variant, withBody=False)
@@ -0,0 +1,91 @@
+"""
+首屏数据聚合 API。
+登录后前端原本分别请求 /auth/me、/members、/products、/targets，
+这里并发读取各数据集、按列表视图裁剪字段，并以一个（可压缩的）响应返回。
+"""
+
+from __future__ import annotations
+import asyncio
+import gzip
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import Response
+from ..auth_utils import getCurrentUser
+from ..database import USE_SUPABASE, supabase_client
+from ..memory_store import memory_store
+from ..models import Product
+from ..serialization import dumps
+from .auth import loadUserInfo
+
+router = APIRouter(prefix="/api/bootstrap", tags=["bootstrap"])
+
+# 列表视图用不到的重字段，详情页通过 GET /api/products/{id} 按需读取
+PRODUCT_OMIT = ("analysisRecords",)
+PRODUCT_COLUMNS = ",".join(f for f in Product.model_fields if f not in PRODUCT_OMIT)
+
+# 小于该字节数的响应不压缩
+GZIP_MIN_BYTES = 1024
+
+
+def _loadMembers() -> list[dict]:
+    """成员及其信用流水：流水一次查询后按成员分组，避免逐个成员请求"""
+    if USE_SUPABASE:
+        members = supabase_client.select("members")
+        records = supabase_client.select("credit_records", order="createdAt.desc")
+    else:
+        members = memory_store.get_all("members")
+        records = sorted(
+            memory_store.get_all("credit_records"), key=lambda r: r["createdAt"], reverse=True
+        )
+    byUser: dict[str, list] = {}
+    for r in records:
+        byUser.setdefault(r["userId"], []).append(r)
+    return [{**m, "creditHistory": byUser.get(m["id"], [])} for m in members]
+
+
+def _loadProducts(workspace: str) -> list:
+    if USE_SUPABASE:
+        return supabase_client.select(
+            "products", columns=PRODUCT_COLUMNS, filters={"workspace": f"eq.{workspace}"}
+        )
+    return [
+        {k: v for k, v in p.items() if k not in PRODUCT_OMIT}
+        for p in memory_store.get_all("products", {"workspace": workspace})
+    ]
+
+
+def _loadTargets(workspace: str) -> list:
+    if USE_SUPABASE:
+        return supabase_client.select("targets", filters={"workspace": f"eq.{workspace}"})
+    return memory_store.get_all("targets", {"workspace": workspace})
+
+
+@router.get("")
+async def bootstrap(
+    request: Request,
+    workspace: str = Query("Tmall"),
+    currentUser: dict = Depends(getCurrentUser),
+):
+    """
+    一次返回首屏所需的当前用户、成员、商品、目标。
+    各数据集在线程池中并发读取，总耗时取决于最慢的一次上游请求；
+    客户端声明支持 gzip 时压缩响应体。
+    """
+    user, members, products, targets = await asyncio.gather(
+        asyncio.to_thread(loadUserInfo, currentUser["sub"]),
+        asyncio.to_thread(_loadMembers),
+        asyncio.to_thread(_loadProducts, workspace),
+        asyncio.to_thread(_loadTargets, workspace),
+    )
+    body = dumps({
+        "user": user,
+        "workspace": workspace,
+        "members": members,
+        "products": products,
+        "targets": targets,
+    })
+
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+        body = await asyncio.to_thread(gzip.compress, body, 6)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
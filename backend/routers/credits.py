@@ -4,10 +4,12 @@
 """
 
 from __future__ import annotations
-import uuid
 from datetime import datetime
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter
 from ..database import USE_SUPABASE, supabase_client
+from ..ids import newId
+from ..leaderboard import leaderboard
 from ..memory_store import memory_store
 from ..models import CreditRecordCreate, CreditRecord
 
@@ -15,6 +17,8 @@ router = APIRouter(prefix="/api/credits", tags=["credits"])
 
 MEMBERS_TABLE = "members"
 CREDITS_TABLE = "credit_records"
+ARCHIVE_TABLE = "credit_records_archive"
+CHECKPOINTS_TABLE = "credit_checkpoints"
 
 # 事件类型 -> 积分变动与描述映射
 EVENT_CONFIG = {
@@ -36,82 +40,126 @@ EVENT_CONFIG = {
 }
 
 
-@router.post("/trigger", response_model=CreditRecord | dict)
-async def triggerCreditEvent(body: CreditRecordCreate):
-    """触发信用事件：去重 -> 计算积分 -> 更新成员分数 -> 写入记录"""
-    config = EVENT_CONFIG.get(body.eventType)
-    if not config:
-        return {"skipped": True, "reason": f"Unknown event type: {body.eventType}"}
+CREDIT_EVENT_KEY = ("userId", "eventType", "relatedId", "cycleKey")
 
-    relatedId = body.relatedId or ""
-    cycleKey = body.cycleKey or "default"
 
-    # ---- 去重检查 ----
-    if USE_SUPABASE:
-        dup = supabase_client.select(
-            CREDITS_TABLE,
-            columns="id",
-            filters={
-                "userId": f"eq.{body.userId}",
-                "eventType": f"eq.{body.eventType}",
-                "relatedId": f"eq.{relatedId}",
-                "cycleKey": f"eq.{cycleKey}",
-            }
-        )
-        if dup:
-            return {"skipped": True, "reason": "Duplicate event"}
-    else:
-        existing = memory_store.get_all(CREDITS_TABLE)
-        isDuplicate = any(
-            r.get("userId") == body.userId
-            and r.get("eventType") == body.eventType
-            and r.get("relatedId") == relatedId
-            and r.get("cycleKey") == cycleKey
-            for r in existing
-        )
-        if isDuplicate:
-            return {"skipped": True, "reason": "Duplicate event"}
+def buildCreditRecord(
+    userId: str,
+    eventType: str,
+    relatedId: str = "",
+    cycleKey: str = "default",
+    data: Optional[dict] = None,
+) -> Optional[dict]:
+    """按事件配置计算积分变动并构造信用记录，未知事件返回 None"""
+    config = EVENT_CONFIG.get(eventType)
+    if not config:
+        return None
 
-    # ---- 计算积分变动 ----
-    change = config["change"]
     if "reasonTemplate" in config:
-        dayNum = (body.data or {}).get("day", "?")
+        dayNum = (data or {}).get("day", "?")
         reason = config["reasonTemplate"].format(day=dayNum)
     else:
         reason = config["reason"]
 
-    # ---- 写入信用记录 ----
-    recordId = str(uuid.uuid4())[:8]
-    record = {
-        "id": recordId,
-        "userId": body.userId,
-        "change": change,
+    return {
+        "id": newId(),
+        "userId": userId,
+        "change": config["change"],
         "reason": reason,
-        "eventType": body.eventType,
+        "eventType": eventType,
         "relatedId": relatedId,
         "cycleKey": cycleKey,
         "createdAt": datetime.now().isoformat(),
     }
 
+
+def replayCredit(balance: int, records: list[dict]) -> int:
+    """按时间顺序逐条累加积分变动，每一步与写入路径一样截断到 0"""
+    for r in sorted(records, key=lambda r: r["createdAt"]):
+        balance = max(0, balance + r["change"])
+    return balance
+
+
+def applyCreditEvents(records: list[dict]) -> list[dict]:
+    """
+    幂等批量写入信用记录并更新成员积分，返回实际写入的记录。
+    以 (userId, eventType, relatedId, cycleKey) 去重：已存在、已归档或同批重复的记录被跳过，
+    因此同一周期内重复执行不会重复扣分；Supabase 模式下由唯一索引与归档去重触发器保证，并发写入同样安全。
+    """
+    if not records:
+        return []
+
     if USE_SUPABASE:
-        supabase_client.insert(CREDITS_TABLE, record)
-        # 更新成员积分
-        memberRows = supabase_client.select(
-            MEMBERS_TABLE, columns="creditScore",
-            filters={"id": f"eq.{body.userId}"}
+        # 唯一索引 uq_credit_event 在数据库内去重，多个 worker / 实例并发写入同一事件也只会插入一次
+        batch: dict[tuple, dict] = {}
+        for r in records:
+            batch.setdefault(tuple(r[k] for k in CREDIT_EVENT_KEY), r)
+        fresh = supabase_client.insert(
+            CREDITS_TABLE, list(batch.values()), ignoreConflicts=",".join(CREDIT_EVENT_KEY)
         )
-        if memberRows:
-            currentScore = memberRows[0]["creditScore"]
-            newScore = max(0, currentScore + change)
-            supabase_client.update(
-                MEMBERS_TABLE,
-                {"id": f"eq.{body.userId}"},
-                {"creditScore": newScore}
+        if not fresh:
+            return []
+    else:
+        # 归档的流水已移出热表，同键事件先按归档表剔除（与 Supabase 的 trg_credit_skip_archived 一致）
+        records = [
+            r for r in records
+            if not memory_store.get_all(ARCHIVE_TABLE, {k: r[k] for k in CREDIT_EVENT_KEY})
+        ]
+        fresh = memory_store.insert_unique(CREDITS_TABLE, records, CREDIT_EVENT_KEY)
+
+    # 按成员汇总积分变动，每个成员只更新一次；逐条截断到 0，与对账时的重放规则一致
+    totals: dict[str, list] = {}
+    for r in fresh:
+        totals.setdefault(r["userId"], []).append(r)
+
+    if USE_SUPABASE:
+        # 整批变动通过一次 RPC 在数据库行锁内累加，不再逐成员读取后 PATCH
+        updated = supabase_client.rpc("apply_credit_deltas", {"changes": [
+            {"id": userId, "deltas": [r["change"] for r in sorted(rows, key=lambda r: r["createdAt"])]}
+            for userId, rows in totals.items()
+        ]})
+        for m in updated:
+            leaderboard.setScore(m["id"], m["creditScore"])
+    else:
+        for userId, rows in totals.items():
+            member = memory_store.modify(
+                MEMBERS_TABLE, userId,
+                lambda m, rows=rows: {"creditScore": replayCredit(m.get("creditScore", 0), rows)},
             )
+            if member:
+                leaderboard.setScore(userId, member["creditScore"])
+
+    return fresh
+
+
+def latestCheckpoints(userId: Optional[str] = None) -> dict[str, dict]:
+    """每个成员（或指定成员）最新的积分检查点"""
+    if USE_SUPABASE:
+        filters = {"userId": f"eq.{userId}"} if userId else None
+        rows = supabase_client.select(CHECKPOINTS_TABLE, filters=filters, order="cutoff.desc")
     else:
-        memory_store.insert(CREDITS_TABLE, record)
-        member = memory_store.get_by_id(MEMBERS_TABLE, body.userId)
-        if member:
-            member["creditScore"] = max(0, member.get("creditScore", 0) + change)
+        rows = memory_store.get_all(CHECKPOINTS_TABLE, {"userId": userId} if userId else None)
+        rows = sorted(rows, key=lambda r: r["cutoff"], reverse=True)
+    latest: dict[str, dict] = {}
+    for r in rows:
+        latest.setdefault(r["userId"], r)
+    return latest
+
+
+@router.post("/trigger", response_model=CreditRecord | dict)
+def triggerCreditEvent(body: CreditRecordCreate):
+    """触发信用事件：去重 -> 计算积分 -> 更新成员分数 -> 写入记录"""
+    record = buildCreditRecord(
+        body.userId,
+        body.eventType,
+        relatedId=body.relatedId or "",
+        cycleKey=body.cycleKey or "default",
+        data=body.data,
+    )
+    if record is None:
+        return {"skipped": True, "reason": f"Unknown event type: {body.eventType}"}
 
-    return record
+    inserted = applyCreditEvents([record])
+    if not inserted:
+        return {"skipped": True, "reason": "Duplicate event"}
+    return inserted[0]
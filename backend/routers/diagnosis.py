@@ -0,0 +1,77 @@
+"""
+AI 诊断 API 路由。
+前端录入分析记录后提交诊断任务，随后轮询任务状态；诊断结果由后端直接写回商品的 analysisRecords。
+全量补诊断通过定时任务 diagnosisSweep（或 POST /api/admin/jobs/diagnosisSweep/run）完成。
+"""
+
+from __future__ import annotations
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from ..auth_utils import getCurrentUser
+from ..database import USE_SUPABASE, supabase_client
+from ..diagnosis import diagnosisQueue, undiagnosedRecords
+from ..memory_store import memory_store
+
+router = APIRouter(prefix="/api/diagnosis", tags=["diagnosis"])
+
+TABLE = "products"
+
+
+class DiagnosisRequest(BaseModel):
+    # 为空时诊断该商品所有尚无诊断的记录
+    recordIds: Optional[list[str]] = None
+    # 为 true 时即使已有诊断也重新生成（指标未变时命中缓存）
+    force: bool = False
+
+
+def _loadProduct(productId: str) -> Optional[dict]:
+    if USE_SUPABASE:
+        rows = supabase_client.select(
+            TABLE, columns="id,name,lifecycleStage,analysisRecords", filters={"id": f"eq.{productId}"}
+        )
+        return rows[0] if rows else None
+    return memory_store.get_by_id(TABLE, productId)
+
+
+@router.post("/products/{productId}")
+def diagnoseProduct(
+    productId: str,
+    body: DiagnosisRequest = DiagnosisRequest(),
+    currentUser: dict = Depends(getCurrentUser),
+):
+    """
+    为商品的分析记录排队诊断，返回任务列表。
+    读取商品与命中缓存时的写回都是阻塞调用，处理函数为普通 def，由 FastAPI 在线程池中执行。
+    """
+    product = _loadProduct(productId)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if body.force:
+        records = [r for r in product.get("analysisRecords") or [] if r.get("id")]
+    else:
+        records = undiagnosedRecords(product)
+    if body.recordIds is not None:
+        wanted = set(body.recordIds)
+        records = [r for r in records if r["id"] in wanted]
+    jobs = diagnosisQueue.submit(product, records)
+    return {"jobs": [job.toDict() for job in jobs]}
+
+
+@router.get("/jobs/{jobId}")
+async def getJob(jobId: str, currentUser: dict = Depends(getCurrentUser)):
+    """查询诊断任务状态"""
+    job = diagnosisQueue.job(jobId)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return job.toDict()
+
+
+@router.get("/stats")
+async def getStats(currentUser: dict = Depends(getCurrentUser)):
+    """诊断队列统计：提交数、缓存命中、模型批次与待处理数"""
+    return {
+        **diagnosisQueue.stats,
+        "client": diagnosisQueue.client.name,
+        "pending": diagnosisQueue.pendingCount(),
+    }
@@ -0,0 +1,118 @@
+"""
+数据导出 API — 按表流式导出 NDJSON / CSV。
+按 id 键集分页逐页读取存储并边读边写，内存占用与表大小无关，首个字节立即返回。
+所有端点需要管理员认证。
+"""
+
+from __future__ import annotations
+import csv
+import io
+import zlib
+from typing import Iterator, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+
+from ..auth_utils import getCurrentUser
+from ..database import USE_SUPABASE, supabase_client
+from ..memory_store import memory_store
+from ..models import CreditRecord, Product, Target
+from ..serialization import dumps
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+# 可导出的表 -> (CSV 列定义来源模型, 是否按工作区过滤)
+EXPORT_TABLES = {
+    "products": (Product, True),
+    "targets": (Target, True),
+    "credit_records": (CreditRecord, False),
+}
+
+PAGE_SIZE = 500
+
+
+def _iterPages(table: str, filters: dict) -> Iterator[list]:
+    """按 id 升序逐页读取，游标为上一页最后一行的 id"""
+    cursor: Optional[str] = None
+    while True:
+        if USE_SUPABASE:
+            pgFilters = {k: f"eq.{v}" for k, v in filters.items()}
+            if cursor is not None:
+                pgFilters["id"] = f"gt.{cursor}"
+            rows = supabase_client.select(table, filters=pgFilters, order="id.asc", limit=PAGE_SIZE)
+        else:
+            rows = memory_store.page(table, after=cursor, limit=PAGE_SIZE, filters=filters)
+        if not rows:
+            return
+        yield rows
+        if len(rows) < PAGE_SIZE:
+            return
+        cursor = rows[-1]["id"]
+
+
+def _ndjsonChunks(pages: Iterator[list]) -> Iterator[bytes]:
+    for rows in pages:
+        yield b"".join(dumps(r) + b"\n" for r in rows)
+
+
+def _csvChunks(pages: Iterator[list], columns: list[str]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for rows in pages:
+        for r in rows:
+            # JSONB 等复杂字段以 JSON 字符串写入单元格
+            writer.writerow([
+                dumps(v).decode("utf-8") if isinstance(v, (dict, list)) else ("" if v is None else v)
+                for v in (r.get(c) for c in columns)
+            ])
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def _gzipChunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """流式 gzip：每页同步刷新，客户端可以边下载边解压"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+@router.get("/{table}")
+def exportTable(
+    table: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    workspace: Optional[str] = Query(None),
+    gzip: bool = Query(False),
+    currentUser: dict = Depends(getCurrentUser),
+):
+    """
+    流式导出整表。
+    format: ndjson（默认）或 csv；workspace 仅对商品、目标生效；gzip=true 输出 .gz 文件。
+    """
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail=f"不支持导出的表: {table}")
+    model, byWorkspace = EXPORT_TABLES[table]
+
+    filters = {"workspace": workspace} if byWorkspace and workspace else {}
+    pages = _iterPages(table, filters)
+    if format == "csv":
+        chunks = _csvChunks(pages, list(model.model_fields))
+        mediaType = "text/csv; charset=utf-8"
+    else:
+        chunks = _ndjsonChunks(pages)
+        mediaType = "application/x-ndjson"
+
+    filename = f"{table}{'-' + workspace if filters else ''}.{format}"
+    if gzip:
+        chunks = _gzipChunks(chunks)
+        mediaType = "application/gzip"
+        filename += ".gz"
+
+    return StreamingResponse(
+        chunks,
+        media_type=mediaType,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,10 +1,14 @@
 from __future__ import annotations
-import uuid
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
 from ..database import USE_SUPABASE, supabase_client
+from ..ids import newId
+from ..leaderboard import leaderboard
 from ..memory_store import memory_store
-from ..models import Member, MemberCreate, MemberUpdate
+from ..models import CreditHistory, Member, MemberCreate, MemberUpdate
+from ..response_cache import responseCache
 from .auth import registerUserInternal
+from .credits import latestCheckpoints
 
 router = APIRouter(prefix="/api/members", tags=["members"])
 
@@ -12,35 +16,79 @@ TABLE = "members"
 CREDIT_TABLE = "credit_records"
 
 
-@router.get("", response_model=list[Member])
-async def getMembers():
-    """获取全部成员（含信用记录）"""
+def _listMembers() -> list[dict]:
     if USE_SUPABASE:
-        members = supabase_client.select(TABLE)
-        for m in members:
+        # select 结果可能与并发请求共享（见 SupabaseRestClient 合并读），不可原地修改
+        members = []
+        for m in supabase_client.select(TABLE):
             cr = supabase_client.select(
                 CREDIT_TABLE,
                 filters={"userId": f"eq.{m['id']}"},
                 order="createdAt.desc"
             )
-            m["creditHistory"] = cr
+            members.append({**m, "creditHistory": cr})
         return members
     else:
-        members = memory_store.get_all(TABLE)
-        for m in members:
-            m["creditHistory"] = memory_store.get_all(
-                CREDIT_TABLE, {"userId": m["id"]}
-            )
-        return members
+        # 存储行是只读快照，拼装响应时构造新 dict，避免把历史写回存储
+        return [
+            {**m, "creditHistory": memory_store.get_all(CREDIT_TABLE, {"userId": m["id"]})}
+            for m in memory_store.get_all(TABLE)
+        ]
+
+
+@router.get("", response_model=list[Member])
+def getMembers(request: Request):
+    """获取全部成员（含信用记录）；按成员表与信用流水表的版本缓存"""
+    return responseCache.serve(request, ("members",), (TABLE, CREDIT_TABLE), _listMembers, Member)
+
+
+@router.get("/leaderboard")
+def getLeaderboard(
+    top: int = Query(10, ge=0, le=500),
+    memberId: Optional[str] = Query(None),
+    radius: int = Query(2, ge=0, le=50),
+):
+    """
+    积分排行榜：前 top 名；传入 memberId 时附带该成员名次及前后 radius 名的窗口。
+    """
+    result = {"total": leaderboard.size(), "top": leaderboard.top(top)}
+    if memberId:
+        me = leaderboard.rankOf(memberId)
+        if me is None:
+            raise HTTPException(status_code=404, detail="Member not found")
+        result["member"] = me
+        result["around"] = leaderboard.around(memberId, radius)
+    return result
+
+
+@router.get("/{memberId}/credit-history", response_model=CreditHistory)
+def getCreditHistory(memberId: str):
+    """
+    成员积分历史：最新检查点 + 检查点之后的近期流水。
+    更早的流水已归档到 credit_records_archive，读取量不随年份增长。
+    """
+    checkpoint = latestCheckpoints(memberId).get(memberId)
+    if USE_SUPABASE:
+        records = supabase_client.select(
+            CREDIT_TABLE,
+            filters={"userId": f"eq.{memberId}"},
+            order="createdAt.desc"
+        )
+    else:
+        records = sorted(
+            memory_store.get_all(CREDIT_TABLE, {"userId": memberId}),
+            key=lambda r: r["createdAt"], reverse=True,
+        )
+    return {"checkpoint": checkpoint, "records": records}
 
 
 @router.post("", response_model=Member)
-async def createMember(body: MemberCreate):
+def createMember(body: MemberCreate):
     """
     新增成员。
     如果请求中包含 username + password，自动创建登录账号。
     """
-    memberId = str(uuid.uuid4())[:8]
+    memberId = newId()
     data = {
         "id": memberId,
         "name": body.name,
@@ -55,8 +103,8 @@ async def createMember(body: MemberCreate):
         created = rows[0] if rows else data
         created["creditHistory"] = []
     else:
-        created = memory_store.insert(TABLE, data)
-        created["creditHistory"] = []
+        created = {**memory_store.insert(TABLE, data), "creditHistory": []}
+    leaderboard.setScore(created["id"], created["creditScore"], created["name"], created["role"])
 
     # 同步创建登录账号（如果提供了用户名和密码）
     if body.username and body.password:
@@ -75,7 +123,7 @@ async def createMember(body: MemberCreate):
 
 
 @router.put("/{memberId}", response_model=Member)
-async def updateMember(memberId: str, body: MemberUpdate):
+def updateMember(memberId: str, body: MemberUpdate):
     """更新成员信息"""
     updateData = body.model_dump(exclude_none=True)
     if not updateData:
@@ -86,6 +134,7 @@ async def updateMember(memberId: str, body: MemberUpdate):
         if not rows:
             raise HTTPException(status_code=404, detail="Member not found")
         member = rows[0]
+        leaderboard.setScore(memberId, member["creditScore"], member["name"], member["role"])
         cr = supabase_client.select(
             CREDIT_TABLE,
             filters={"userId": f"eq.{memberId}"},
@@ -97,17 +146,19 @@ async def updateMember(memberId: str, body: MemberUpdate):
         updated = memory_store.update(TABLE, memberId, updateData)
         if not updated:
             raise HTTPException(status_code=404, detail="Member not found")
-        updated["creditHistory"] = memory_store.get_all(
-            CREDIT_TABLE, {"userId": memberId}
-        )
-        return updated
+        leaderboard.setScore(memberId, updated["creditScore"], updated["name"], updated["role"])
+        return {
+            **updated,
+            "creditHistory": memory_store.get_all(CREDIT_TABLE, {"userId": memberId}),
+        }
 
 
 @router.delete("/{memberId}")
-async def deleteMember(memberId: str):
+def deleteMember(memberId: str):
     """删除成员"""
     if USE_SUPABASE:
         supabase_client.delete(TABLE, {"id": f"eq.{memberId}"})
     else:
         memory_store.delete(TABLE, memberId)
+    leaderboard.remove(memberId)
     return {"ok": True}
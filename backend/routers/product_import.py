@@ -0,0 +1,277 @@
+"""
+商品批量导入 API — 流式接收 CSV / NDJSON 上传。
+请求体按块增量解码、分批校验，以 (workspace, productId) 去重后批量写入，
+写入并发受信号量限制，整个文件不会一次性驻留内存。
+"""
+
+from __future__ import annotations
+import asyncio
+import codecs
+import csv
+import json
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+
+from ..blob_store import blobStore
+from ..database import USE_SUPABASE, supabase_client
+from ..memory_store import memory_store
+from ..models import ProductCreate
+from ..public_pool import publicPool
+from ..search_index import productSearch
+from .products import IMAGE_FIELDS, TABLE, buildProductRow
+
+router = APIRouter(prefix="/api/products", tags=["products"])
+
+BATCH_SIZE = 500
+WRITE_CONCURRENCY = 4
+MAX_REPORTED_ERRORS = 100
+# 单条 CSV 记录（含引号内换行）允许的最大行数与字符数，超出视为引号未闭合；字符数同时是单行（含 NDJSON）的上限
+MAX_RECORD_LINES = 200
+MAX_RECORD_CHARS = 64 * 1024
+# 保留最近多少个导入任务的进度供查询，超出时淘汰最早结束的任务
+JOB_HISTORY = 200
+
+# importId -> 导入进度，供 GET /api/products/import/{importId} 轮询
+importJobs: OrderedDict[str, dict] = OrderedDict()
+
+
+def _registerJob(job: dict):
+    importJobs[job["importId"]] = job
+    importJobs.move_to_end(job["importId"])
+    finished = [k for k, j in importJobs.items() if j["status"] != "running"]
+    for importId in finished[:max(0, len(importJobs) - JOB_HISTORY)]:
+        del importJobs[importId]
+
+
+class _OverlongLine:
+    """_iterLines 丢弃的超长行，只保留其中的引号数，供 CSV 解析维持引号奇偶"""
+    __slots__ = ("quotes",)
+
+    def __init__(self, quotes: int = 0):
+        self.quotes = quotes
+
+
+async def _iterLines(request: Request) -> AsyncIterator[str | _OverlongLine]:
+    """
+    增量解码请求体并按行切分。未切分的缓冲超过 MAX_RECORD_CHARS（如没有换行的超长单行）时丢弃已缓冲内容，
+    直到下一个换行为止的内容也一并丢弃，该行以 _OverlongLine 产出，由调用方报告错误。
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending, dropped = "", None
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if dropped is None and len(line) <= MAX_RECORD_CHARS:
+                yield line
+                continue
+            dropped = dropped or _OverlongLine()
+            dropped.quotes += line.count('"')
+            yield dropped
+            dropped = None
+        if len(pending) > MAX_RECORD_CHARS:
+            dropped = dropped or _OverlongLine()
+            dropped.quotes += pending.count('"')
+            pending = ""
+    pending += decoder.decode(b"", final=True)
+    if dropped is not None or len(pending) > MAX_RECORD_CHARS:
+        dropped = dropped or _OverlongLine()
+        dropped.quotes += pending.count('"')
+        yield dropped
+    elif pending:
+        yield pending
+
+
+async def _iterRecords(request: Request, fmt: str) -> AsyncIterator[tuple[int, dict | str]]:
+    """
+    逐条产出 (行号, 原始记录)。无法解析的行产出错误字符串，行号为记录的起始行。
+    CSV 引号内的换行会被拼接回同一条记录（按引号奇偶判断记录是否结束，"" 转义计两次不影响奇偶），
+    完整的记录交给 csv.reader 解析。单条记录超过 MAX_RECORD_LINES 行或 MAX_RECORD_CHARS 字符、
+    单行超过 MAX_RECORD_CHARS 字符、或文件结束时引号仍未闭合，报告该记录的错误并丢弃已缓冲的内容，
+    不会把剩余文件全部读入内存。
+    """
+    header: Optional[list[str]] = None
+    parts: list[str] = []
+    startLine, size, quotes = 0, 0, 0
+    # 当前 CSV 记录中第一个超长行的行号，记录结束时整条报告为错误
+    overlongLine = 0
+    lineNo = 0
+    async for line in _iterLines(request):
+        lineNo += 1
+        if isinstance(line, _OverlongLine):
+            if fmt == "ndjson":
+                yield lineNo, f"第 {lineNo} 行超过 {MAX_RECORD_CHARS} 字符，已跳过"
+                continue
+            # 超长行内容已丢弃，只累计引号数以判断所在记录何时结束
+            overlongLine = overlongLine or lineNo
+            quotes += line.quotes
+            line = ""
+        elif fmt == "ndjson":
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield lineNo, f"JSON 解析失败: {e.msg}"
+                continue
+            yield lineNo, record if isinstance(record, dict) else "每行必须是 JSON 对象"
+            continue
+
+        if not parts:
+            startLine = lineNo
+        parts.append(line)
+        size += len(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            if len(parts) >= MAX_RECORD_LINES or size >= MAX_RECORD_CHARS:
+                yield startLine, f"记录过长或引号未闭合（第 {startLine}-{lineNo} 行），已跳过"
+                parts, size, quotes, overlongLine = [], 0, 0, 0
+            continue
+        text = "\n".join(parts).rstrip("\r")
+        parts, size, quotes = [], 0, 0
+        if overlongLine:
+            yield startLine, f"第 {overlongLine} 行超过 {MAX_RECORD_CHARS} 字符，所在记录已跳过"
+            overlongLine = 0
+            continue
+        if not text.strip():
+            continue
+        try:
+            fields = next(csv.reader([text]))
+        except csv.Error as e:
+            yield startLine, f"CSV 解析失败: {e}"
+            continue
+        if header is None:
+            header = [h.strip() for h in fields]
+            continue
+        # 空单元格视为未填写，交给模型默认值
+        yield startLine, {k: v for k, v in zip(header, fields) if v != ""}
+
+    if parts:
+        yield startLine, f"文件结束时引号未闭合（自第 {startLine} 行起），该记录已跳过"
+
+
+def _existingKeys(workspace: str) -> set[str]:
+    """读取工作区内已存在的 productId，用于去重"""
+    if USE_SUPABASE:
+        rows = supabase_client.select(
+            TABLE, columns="productId", filters={"workspace": f"eq.{workspace}"}
+        )
+    else:
+        rows = memory_store.get_all(TABLE, {"workspace": workspace})
+    return {r["productId"] for r in rows}
+
+
+def _writeBatch(rows: list[dict]):
+    # 与单条创建一致，导入数据里的图片 data URL 也外置到 blob 存储
+    rows = [blobStore.externalizeFields(row, IMAGE_FIELDS) for row in rows]
+    if USE_SUPABASE:
+        supabase_client.insert(TABLE, rows)
+    else:
+        memory_store.insert_many(TABLE, rows)
+    for row in rows:
+        productSearch.upsert(row)
+        publicPool.sync(row)
+
+
+@router.post("/import")
+async def importProducts(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    workspace: Optional[str] = Query(None),
+    importId: Optional[str] = Query(None),
+):
+    """
+    流式批量导入商品。
+    format 缺省时根据 Content-Type 推断（text/csv 为 CSV，其余按 NDJSON）；
+    workspace 为未指定工作区的行提供默认值；importId 可由客户端指定以便轮询进度。
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    importId = importId or uuid.uuid4().hex[:12]
+    if importJobs.get(importId, {}).get("status") == "running":
+        raise HTTPException(status_code=409, detail="该导入任务正在进行中")
+
+    job = {
+        "importId": importId,
+        "status": "running",
+        "processed": 0,
+        "inserted": 0,
+        "duplicates": 0,
+        "failed": 0,
+        "errors": [],
+    }
+    _registerJob(job)
+
+    def recordError(lineNo: int, message: str):
+        job["failed"] += 1
+        if len(job["errors"]) < MAX_REPORTED_ERRORS:
+            job["errors"].append({"line": lineNo, "error": message})
+
+    seenKeys: dict[str, set[str]] = {}
+    semaphore = asyncio.Semaphore(WRITE_CONCURRENCY)
+    writes: list[asyncio.Task] = []
+
+    async def flush(batch: list[tuple[int, dict]]):
+        try:
+            await run_in_threadpool(_writeBatch, [row for _, row in batch])
+            job["inserted"] += len(batch)
+        except Exception as e:
+            for lineNo, _ in batch:
+                recordError(lineNo, f"写入失败: {e}")
+        finally:
+            semaphore.release()
+
+    async def submit(batch: list[tuple[int, dict]]):
+        # 在途批次达到上限时暂停读取请求体，形成背压
+        await semaphore.acquire()
+        writes.append(asyncio.create_task(flush(batch)))
+
+    batch: list[tuple[int, dict]] = []
+    try:
+        async for lineNo, raw in _iterRecords(request, format):
+            job["processed"] += 1
+            if isinstance(raw, str):
+                recordError(lineNo, raw)
+                continue
+            if workspace and not raw.get("workspace"):
+                raw["workspace"] = workspace
+            try:
+                body = ProductCreate.model_validate(raw)
+            except ValidationError as e:
+                first = e.errors()[0]
+                recordError(lineNo, f"{'.'.join(str(p) for p in first['loc'])}: {first['msg']}")
+                continue
+
+            ws = body.workspace
+            if ws not in seenKeys:
+                seenKeys[ws] = await run_in_threadpool(_existingKeys, ws)
+            if body.productId in seenKeys[ws]:
+                job["duplicates"] += 1
+                continue
+            seenKeys[ws].add(body.productId)
+
+            batch.append((lineNo, buildProductRow(body)))
+            if len(batch) >= BATCH_SIZE:
+                await submit(batch)
+                batch = []
+        if batch:
+            await submit(batch)
+        await asyncio.gather(*writes)
+    except Exception:
+        job["status"] = "failed"
+        raise
+    job["status"] = "done"
+    return job
+
+
+@router.get("/import/{importId}")
+def getImportProgress(importId: str):
+    """查询导入进度"""
+    job = importJobs.get(importId)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
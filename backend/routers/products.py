@@ -4,47 +4,287 @@
 """
 
 from __future__ import annotations
-import uuid
-from fastapi import APIRouter, HTTPException, Query
-from ..database import USE_SUPABASE, supabase_client
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from ..alert_scan import scanWorkspace
+from ..blob_store import blobStore
+from ..concurrency import parseIfMatch
+from ..database import USE_SUPABASE, pgList, supabase_client
+from ..ids import newId
 from ..memory_store import memory_store
-from ..models import Product, ProductCreate, ProductUpdate
+from ..models import PoolClaimRequest, Product, ProductCreate, ProductUpdate
+from ..product_jobs import ROLLOVER_COLUMNS, creditRecords, planDayComplete
+from ..public_pool import POOL_OPERATOR_FILTER, POOL_STATUS, isPoolRow, publicPool
+from ..response_cache import responseCache
+from ..search_index import productSearch
+from ..serialization import respond
+from .credits import applyCreditEvents, buildCreditRecord
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
 TABLE = "products"
+MEMBERS_TABLE = "members"
+
+# 可能内联图片 data URL 的字段（主图、运营日志、每日任务截图），写入前外置到 blob 存储
+IMAGE_FIELDS = ("image", "history", "taskProgress")
+
+# 信用分低于该值的成员禁止从公共池领取商品
+CLAIM_MIN_CREDIT = 60
+
+
+def _splitValues(value: Optional[str]) -> list[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def _listProducts(workspace: str, operatorId: Optional[str], statuses: list[str],
+                  excluded: set[str], lifecycleStage: Optional[str]) -> list:
+    if USE_SUPABASE:
+        filters = {"workspace": f"eq.{workspace}"}
+        if operatorId is not None:
+            filters["operatorId"] = f"eq.{operatorId}"
+        if lifecycleStage:
+            filters["lifecycleStage"] = f"eq.{lifecycleStage}"
+        if statuses:
+            filters["status"] = f"in.{pgList(statuses)}"
+        elif excluded:
+            filters["status"] = f"not.in.{pgList(excluded)}"
+        if statuses and excluded:
+            filters["status"] = f"in.{pgList(set(statuses) - excluded)}"
+        return supabase_client.select(TABLE, filters=filters)
+
+    filters = {"workspace": workspace}
+    if operatorId is not None:
+        filters["operatorId"] = operatorId
+    if lifecycleStage:
+        filters["lifecycleStage"] = lifecycleStage
+    if len(statuses) == 1:
+        filters["status"] = statuses[0]
+    rows = memory_store.get_all(TABLE, filters)
+    if len(statuses) > 1:
+        wanted = set(statuses)
+        rows = [r for r in rows if r.get("status") in wanted]
+    if excluded:
+        rows = [r for r in rows if r.get("status") not in excluded]
+    return rows
 
 
 @router.get("", response_model=list[Product])
-async def getProducts(workspace: str = Query("Tmall")):
-    """按工作区获取商品列表"""
+def getProducts(
+    request: Request,
+    workspace: str = Query("Tmall"),
+    operatorId: Optional[str] = Query(None),
+    status: Optional[str] = Query(None, description="逗号分隔的状态列表"),
+    excludeStatus: Optional[str] = Query(None, description="逗号分隔的排除状态，如 Trashed"),
+    lifecycleStage: Optional[str] = Query(None),
+):
+    """
+    按工作区获取商品列表。
+    可选按运营人、状态（含排除状态）、生命周期阶段在服务端过滤，
+    Supabase 模式下下推为 PostgREST 过滤条件，内存模式下命中组合索引。
+    结果按 products 表版本缓存（含压缩结果），数据未变时直接返回缓存。
+    """
+    statuses = _splitValues(status)
+    excluded = set(_splitValues(excludeStatus))
+    key = ("products", workspace, operatorId, tuple(statuses), tuple(sorted(excluded)), lifecycleStage)
+    return responseCache.serve(
+        request, key, (TABLE,),
+        lambda: _listProducts(workspace, operatorId, statuses, excluded, lifecycleStage),
+        Product,
+    )
+
+
+@router.get("/search")
+def searchProducts(
+    q: str = Query(..., min_length=1, max_length=100),
+    workspace: str = Query("Tmall"),
+    limit: int = Query(20, ge=1, le=100),
+    includeTrashed: bool = Query(False),
+):
+    """按商品名 / 商品 ID / 店铺名模糊检索，返回按相关度排序的精简结果"""
+    return productSearch.search(q, workspace, limit=limit, includeTrashed=includeTrashed)
+
+
+def _fetchByIds(ids: list[str]) -> list:
+    """按 id 批量读取商品并保持 ids 的顺序"""
+    if not ids:
+        return []
     if USE_SUPABASE:
-        return supabase_client.select(TABLE, filters={"workspace": f"eq.{workspace}"})
+        rows = supabase_client.select(TABLE, filters={"id": f"in.{pgList(ids)}"})
+        byId = {r["id"]: r for r in rows}
     else:
-        return memory_store.get_all(TABLE, {"workspace": workspace})
+        byId = {pid: memory_store.get_by_id(TABLE, pid) for pid in ids}
+    return [byId[pid] for pid in ids if byId.get(pid)]
+
+
+def _claimant(memberId: str):
+    """读取领取人并校验信用分"""
+    if USE_SUPABASE:
+        rows = supabase_client.select(
+            MEMBERS_TABLE, columns="id,name,creditScore", filters={"id": f"eq.{memberId}"}
+        )
+        member = rows[0] if rows else None
+    else:
+        member = memory_store.get_by_id(MEMBERS_TABLE, memberId)
+    if not member:
+        raise HTTPException(status_code=404, detail="Member not found")
+    if member.get("creditScore", 0) < CLAIM_MIN_CREDIT:
+        raise HTTPException(
+            status_code=403,
+            detail=f"成员 {member.get('name', memberId)} 信用分过低 ({member.get('creditScore', 0)})，禁止领用新资产",
+        )
+    return member
+
+
+def _claimProduct(productId: str, member) -> Optional[dict]:
+    """
+    以条件更新（CAS）领取公共池商品：仅当商品仍为 Abandoned 且无运营人时写入新运营人。
+    商品已被他人领取或不在池中返回 None；两个并发领取只有一个能成功。
+    """
+    if USE_SUPABASE:
+        rows = supabase_client.select(TABLE, columns="id,status,operatorId,history",
+                                      filters={"id": f"eq.{productId}"})
+        current = rows[0] if rows else None
+    else:
+        current = memory_store.get_by_id(TABLE, productId)
+    if current is None or not isPoolRow(current):
+        return None
+
+    history = list(current.get("history") or [])
+    changes = {
+        "status": "Active",
+        "operatorId": member["id"],
+        "dayCount": 1,
+        "history": history + [{
+            "id": newId(),
+            "date": datetime.now().isoformat(),
+            "dayIndex": 1,
+            "content": f"[系统记录] 该资产由 {member.get('name', member['id'])} 成功认领，正式开启运营。",
+            "images": [],
+            "operatorName": "系统",
+        }],
+    }
+    if USE_SUPABASE:
+        rows = supabase_client.update(
+            TABLE,
+            {"id": f"eq.{productId}", "status": f"eq.{POOL_STATUS}", "or": POOL_OPERATOR_FILTER},
+            changes,
+        )
+        return rows[0] if rows else None
+    return memory_store.compare_and_set(
+        TABLE, productId,
+        {"status": POOL_STATUS, "operatorId": current.get("operatorId"), "history": current.get("history")},
+        changes,
+    )
+
+
+def _afterClaim(claimed, memberId: str):
+    publicPool.discard(claimed["id"])
+    productSearch.upsert(claimed)
+    applyCreditEvents([buildCreditRecord(memberId, "PUBLIC_POOL_TAKEN", relatedId=claimed["id"])])
+    return respond(claimed, Product)
+
+
+@router.post("/alerts/scan")
+def scanAlerts(workspace: str = Query("Tmall")):
+    """
+    立即对工作区的 Active 商品执行预警扫描（每天早上也由定时任务 alertScan 执行），
+    只写回 alertLevel 发生变化的商品，返回各级别计数与预警商品列表。
+    """
+    return scanWorkspace(workspace)
+
+
+@router.get("/pool", response_model=list[Product])
+def getPoolProducts(
+    workspace: str = Query("Tmall"),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+):
+    """按入池顺序列出公共池商品（先入池者在前）"""
+    return respond(_fetchByIds(publicPool.ids(workspace, limit)), Product)
+
+
+@router.post("/pool/claim", response_model=Product)
+def claimNextPoolProduct(body: PoolClaimRequest):
+    """领取工作区公共池中排在最前的商品，队首已被他人领走时自动顺延"""
+    member = _claimant(body.memberId)
+    while True:
+        productId = publicPool.pop(body.workspace)
+        if productId is None:
+            raise HTTPException(status_code=404, detail="公共池暂无可领取的商品")
+        claimed = _claimProduct(productId, member)
+        if claimed:
+            return _afterClaim(claimed, member["id"])
+
+
+@router.post("/{productId}/claim", response_model=Product)
+def claimProduct(productId: str, body: PoolClaimRequest):
+    """领取指定的公共池商品；已被他人领取时返回 409"""
+    member = _claimant(body.memberId)
+    claimed = _claimProduct(productId, member)
+    if claimed is None:
+        publicPool.discard(productId)
+        raise HTTPException(status_code=409, detail="该商品已被领取或不在公共池中")
+    return _afterClaim(claimed, member["id"])
+
+
+@router.post("/{productId}/complete-day", response_model=Product)
+def completeDay(productId: str):
+    """
+    完成商品当天的运营任务并推进到下一天，规则与日终任务相同（见 product_jobs.py）。
+    当天任务未全部上传截图返回 400；读取后天数已被他人推进返回 409。
+    """
+    if USE_SUPABASE:
+        rows = supabase_client.select(TABLE, columns=ROLLOVER_COLUMNS, filters={"id": f"eq.{productId}"})
+        product = rows[0] if rows else None
+    else:
+        product = memory_store.get_by_id(TABLE, productId)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    plan = planDayComplete(product)
+    if plan is None:
+        raise HTTPException(status_code=400, detail="请先上传今日所有任务的截图证明")
+
+    changes, events = plan
+    day = product.get("dayCount") or 0
+    if USE_SUPABASE:
+        rows = supabase_client.update(
+            TABLE,
+            {"id": f"eq.{productId}", "dayCount": f"eq.{day}", "status": f"eq.{product['status']}"},
+            changes,
+        )
+        updated = rows[0] if rows else None
+    else:
+        updated = memory_store.compare_and_set(
+            TABLE, productId, {"dayCount": product.get("dayCount"), "status": product["status"]}, changes,
+        )
+    if updated is None:
+        raise HTTPException(status_code=409, detail="该商品的运营天数已被更新，请刷新后重试")
+
+    applyCreditEvents(creditRecords(product, events))
+    productSearch.upsert(updated)
+    publicPool.sync(updated)
+    return updated
 
 
 @router.get("/{productId}", response_model=Product)
-async def getProduct(productId: str):
+def getProduct(productId: str):
     """获取单个商品详情"""
     if USE_SUPABASE:
         rows = supabase_client.select(TABLE, filters={"id": f"eq.{productId}"})
         if not rows:
             raise HTTPException(status_code=404, detail="Product not found")
-        return rows[0]
+        return respond(rows[0], Product)
     else:
         product = memory_store.get_by_id(TABLE, productId)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
-        return product
+        return respond(product, Product)
 
 
-@router.post("", response_model=Product)
-async def createProduct(body: ProductCreate):
-    """新增商品"""
-    newId = str(uuid.uuid4())[:8]
-    data = {
-        "id": newId,
+def buildProductRow(body: ProductCreate) -> dict:
+    """由创建请求构造完整的商品行"""
+    return {
+        "id": newId(),
         "name": body.name,
         "productId": body.productId,
         "image": body.image or "",
@@ -64,16 +304,33 @@ async def createProduct(body: ProductCreate):
         "analysisRecords": [],
     }
 
+
+@router.post("", response_model=Product)
+def createProduct(body: ProductCreate):
+    """新增商品"""
+    data = blobStore.externalizeFields(buildProductRow(body), IMAGE_FIELDS)
+
     if USE_SUPABASE:
         rows = supabase_client.insert(TABLE, data)
-        return rows[0] if rows else data
+        created = rows[0] if rows else data
     else:
-        return memory_store.insert(TABLE, data)
+        created = memory_store.insert(TABLE, data)
+    productSearch.upsert(created)
+    publicPool.sync(created)
+    return created
 
 
 @router.put("/{productId}", response_model=Product)
-async def updateProduct(productId: str, body: ProductUpdate):
-    """更新商品（支持部分更新）"""
+def updateProduct(
+    productId: str,
+    body: ProductUpdate,
+    ifMatch: Optional[str] = Header(None, alias="If-Match"),
+):
+    """
+    更新商品（支持部分更新）。
+    携带 If-Match: "<version>" 时为条件更新，版本已被他人修改则返回 409。
+    """
+    expectedVersion = parseIfMatch(ifMatch)
     updateData = body.model_dump(exclude_none=True)
     if "status" in updateData and updateData["status"]:
         updateData["status"] = (
@@ -84,24 +341,31 @@ async def updateProduct(productId: str, body: ProductUpdate):
 
     if not updateData:
         raise HTTPException(status_code=400, detail="No update data")
+    updateData = blobStore.externalizeFields(updateData, IMAGE_FIELDS)
 
     if USE_SUPABASE:
-        rows = supabase_client.update(TABLE, {"id": f"eq.{productId}"}, updateData)
+        rows = supabase_client.update(TABLE, {"id": f"eq.{productId}"}, updateData, expectedVersion)
         if not rows:
             raise HTTPException(status_code=404, detail="Product not found")
-        return rows[0]
+        updated = rows[0]
     else:
-        updated = memory_store.update(TABLE, productId, updateData)
+        updated = memory_store.update(TABLE, productId, updateData, expectedVersion)
         if not updated:
             raise HTTPException(status_code=404, detail="Product not found")
-        return updated
+    productSearch.upsert(updated)
+    publicPool.sync(updated)
+    return updated
 
 
 @router.delete("/{productId}")
-async def deleteProduct(productId: str):
+def deleteProduct(productId: str):
     """软删除商品"""
     if USE_SUPABASE:
-        supabase_client.update(TABLE, {"id": f"eq.{productId}"}, {"status": "Trashed"})
+        rows = supabase_client.update(TABLE, {"id": f"eq.{productId}"}, {"status": "Trashed"})
+        trashed = rows[0] if rows else None
     else:
-        memory_store.update(TABLE, productId, {"status": "Trashed"})
+        trashed = memory_store.update(TABLE, productId, {"status": "Trashed"})
+    if trashed:
+        productSearch.upsert(trashed)
+        publicPool.sync(trashed)
     return {"ok": True}
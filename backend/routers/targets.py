@@ -4,32 +4,39 @@
 """
 
 from __future__ import annotations
-import uuid
-from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from ..blob_store import blobStore
+from ..concurrency import parseIfMatch
 from ..database import USE_SUPABASE, supabase_client
+from ..ids import newId
 from ..memory_store import memory_store
 from ..models import Target, TargetCreate, TargetUpdate
+from ..response_cache import responseCache
 
 router = APIRouter(prefix="/api/targets", tags=["targets"])
 
 TABLE = "targets"
 
 
-@router.get("", response_model=list[Target])
-async def getTargets(workspace: str = Query("Tmall")):
-    """按工作区获取目标列表"""
+def _listTargets(workspace: str) -> list:
     if USE_SUPABASE:
         return supabase_client.select(TABLE, filters={"workspace": f"eq.{workspace}"})
     else:
         return memory_store.get_all(TABLE, {"workspace": workspace})
 
 
+@router.get("", response_model=list[Target])
+def getTargets(request: Request, workspace: str = Query("Tmall")):
+    """按工作区获取目标列表；按目标表版本缓存"""
+    return responseCache.serve(request, ("targets", workspace), (TABLE,), lambda: _listTargets(workspace), Target)
+
+
 @router.post("", response_model=Target)
-async def createTarget(body: TargetCreate):
+def createTarget(body: TargetCreate):
     """新增目标"""
-    newId = str(uuid.uuid4())[:8]
     data = {
-        "id": newId,
+        "id": newId(),
         "title": body.title,
         "type": body.type,
         "priority": body.priority,
@@ -49,26 +56,33 @@ async def createTarget(body: TargetCreate):
 
 
 @router.put("/{targetId}", response_model=Target)
-async def updateTarget(targetId: str, body: TargetUpdate):
-    """更新目标"""
+def updateTarget(
+    targetId: str,
+    body: TargetUpdate,
+    ifMatch: Optional[str] = Header(None, alias="If-Match"),
+):
+    """更新目标；携带 If-Match: "<version>" 时为条件更新，版本不符返回 409"""
+    expectedVersion = parseIfMatch(ifMatch)
     updateData = body.model_dump(exclude_none=True)
     if not updateData:
         raise HTTPException(status_code=400, detail="No update data")
+    # 完成凭证图片外置到 blob 存储，行内只保留短引用
+    updateData = blobStore.externalizeFields(updateData, ("completionImages",))
 
     if USE_SUPABASE:
-        rows = supabase_client.update(TABLE, {"id": f"eq.{targetId}"}, updateData)
+        rows = supabase_client.update(TABLE, {"id": f"eq.{targetId}"}, updateData, expectedVersion)
         if not rows:
             raise HTTPException(status_code=404, detail="Target not found")
         return rows[0]
     else:
-        updated = memory_store.update(TABLE, targetId, updateData)
+        updated = memory_store.update(TABLE, targetId, updateData, expectedVersion)
         if not updated:
             raise HTTPException(status_code=404, detail="Target not found")
         return updated
 
 
 @router.delete("/{targetId}")
-async def deleteTarget(targetId: str):
+def deleteTarget(targetId: str):
     """删除目标"""
     if USE_SUPABASE:
         supabase_client.delete(TABLE, {"id": f"eq.{targetId}"})
@@ -0,0 +1,185 @@
+"""
+进程内定时任务调度器 — 在应用生命周期内按计划执行批处理任务。
+任务函数为同步函数，接收计划执行时间，在线程池中运行，不阻塞事件循环。
+设置 SCHEDULER_ENABLED=false 可关闭（Supabase 模式多 worker / 多实例部署时只需在一个进程中开启）。
+共享内存存储模式（MEMORY_STORE_SOCKET）下调度循环只在属主进程中运行，任务的运行标记与最近结果
+保存在共享存储的 scheduler_jobs 表中：worker 上的手动触发与属主的定时执行互斥，任一 worker 查询到的状态一致。
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from .database import USE_SUPABASE
+from .memory_store import memory_store
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+JOBS_TABLE = "scheduler_jobs"
+# 运行标记超过该时长仍未清除，视为执行它的进程已退出，允许其他进程接管
+STALE_RUNNING_SECONDS = int(os.getenv("SCHEDULER_STALE_SECONDS", "3600"))
+
+
+# 当前进程是否为共享内存存储的属主（由 shared_store.serve 设置）
+_storeOwner = False
+
+
+def markStoreOwner():
+    global _storeOwner
+    _storeOwner = True
+
+
+def sharedJobState() -> bool:
+    """任务状态是否保存在多进程共享的内存存储中"""
+    return not USE_SUPABASE and (memory_store.shared or _storeOwner)
+
+Schedule = Callable[[datetime], datetime]
+
+
+def daily(hour: int, minute: int = 0) -> Schedule:
+    """每天 hour:minute 执行"""
+    def nextRun(now: datetime) -> datetime:
+        run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return run if run > now else run + timedelta(days=1)
+    return nextRun
+
+
+def weekly(weekday: int, hour: int, minute: int = 0) -> Schedule:
+    """每周 weekday（周一为 0）的 hour:minute 执行"""
+    def nextRun(now: datetime) -> datetime:
+        run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        run += timedelta(days=(weekday - now.weekday()) % 7)
+        return run if run > now else run + timedelta(days=7)
+    return nextRun
+
+
+class ScheduledJob:
+    def __init__(self, name: str, func: Callable[[datetime], Any], schedule: Schedule):
+        self.name = name
+        self.func = func
+        self.schedule = schedule
+        self.nextRun = schedule(datetime.now())
+        self.lastRun: Optional[datetime] = None
+        self.lastResult: Any = None
+        self.lastError: Optional[str] = None
+        self.running = False
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "nextRun": self.nextRun.isoformat(),
+            "lastRun": self.lastRun.isoformat() if self.lastRun else None,
+            "lastResult": self.lastResult,
+            "lastError": self.lastError,
+            "running": self.running,
+        }
+
+
+class Scheduler:
+    def __init__(self):
+        self.jobs: dict[str, ScheduledJob] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, func: Callable[[datetime], Any], schedule: Schedule):
+        self.jobs[name] = ScheduledJob(name, func, schedule)
+
+    def statuses(self) -> list[dict]:
+        """全部任务的状态；共享存储模式下以存储中的运行标记与最近结果为准"""
+        result = []
+        for job in self.jobs.values():
+            status = job.status()
+            if sharedJobState():
+                row = memory_store.get_by_id(JOBS_TABLE, job.name)
+                if row is not None:
+                    status.update({
+                        "lastRun": row.get("lastRun"),
+                        "lastResult": row.get("lastResult"),
+                        "lastError": row.get("lastError"),
+                        "running": row.get("running", False),
+                    })
+            result.append(status)
+        return result
+
+    @staticmethod
+    def _claim(name: str, runAt: datetime) -> bool:
+        """在共享存储中占用任务的运行标记，其他进程正在执行时返回 False"""
+        now = time.time()
+        fields = {"running": True, "startedAt": now, "lastRun": runAt.isoformat()}
+        row = memory_store.get_by_id(JOBS_TABLE, name)
+        if row is None:
+            if memory_store.insert_unique(JOBS_TABLE, [{"id": name, **fields}], ("id",)):
+                return True
+            row = memory_store.get_by_id(JOBS_TABLE, name)
+        if row.get("running") and now - row.get("startedAt", 0) < STALE_RUNNING_SECONDS:
+            return False
+        expected = {"running": row.get("running"), "startedAt": row.get("startedAt")}
+        return memory_store.compare_and_set(JOBS_TABLE, name, expected, fields) is not None
+
+    @staticmethod
+    def _release(job: ScheduledJob):
+        # update() 会忽略 None 值，成功后需要清除 lastError，因此用 modify 写入整组字段
+        memory_store.modify(JOBS_TABLE, job.name, lambda row: {
+            "running": False,
+            "lastResult": job.lastResult,
+            "lastError": job.lastError,
+        })
+
+    async def runJob(self, name: str, now: Optional[datetime] = None) -> Any:
+        """立即执行一个任务（供调度循环和管理端手动触发使用）"""
+        job = self.jobs[name]
+        runAt = now or datetime.now()
+        shared = sharedJobState()
+        if job.running or (shared and not await run_in_threadpool(self._claim, name, runAt)):
+            raise RuntimeError(f"任务 {name} 正在执行中")
+        job.running = True
+        job.lastRun = runAt
+        try:
+            job.lastResult = await run_in_threadpool(job.func, job.lastRun)
+            job.lastError = None
+            return job.lastResult
+        except Exception as e:
+            job.lastError = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            job.running = False
+            if shared:
+                await run_in_threadpool(self._release, job)
+
+    async def _loop(self):
+        while True:
+            if not self.jobs:
+                await asyncio.sleep(60)
+                continue
+            job = min(self.jobs.values(), key=lambda j: j.nextRun)
+            delay = (job.nextRun - datetime.now()).total_seconds()
+            if delay > 0:
+                # 分段休眠，系统时钟跳变或新注册任务时也能及时重新计算
+                await asyncio.sleep(min(delay, 60))
+                continue
+            runAt = job.nextRun
+            job.nextRun = job.schedule(max(runAt, datetime.now()))
+            try:
+                result = await self.runJob(job.name, runAt)
+                print(f"[OK] 定时任务 {job.name} 完成: {result}")
+            except Exception as e:
+                print(f"[WARN] 定时任务 {job.name} 失败: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# 单例实例
+scheduler = Scheduler()
@@ -0,0 +1,176 @@
+"""
+商品全文/前缀检索 — 增量维护的内存倒排索引。
+商品名、商品 ID、店铺名统一小写后切分为字符 bigram（单字查询使用 unigram），
+对中文标题无需分词即可做子串匹配；查询时按倒排表由短到长求交，再校验子串并打分排序。
+索引由商品增删改路径实时更新，首次查询时从存储构建；
+Supabase 模式下其他实例的写入无法感知，因此按 SEARCH_INDEX_REFRESH_SECONDS 定期重建。
+"""
+
+import heapq
+import os
+import threading
+import time
+from typing import Optional
+
+from .database import USE_SUPABASE, supabase_client
+from .memory_store import memory_store
+
+REFRESH_SECONDS = int(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "600"))
+
+SEARCH_FIELDS = ("name", "productId", "storeName")
+INDEX_COLUMNS = "id,workspace,status,name,productId,storeName"
+
+
+def _normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def _grams(text: str) -> set[str]:
+    """字符 unigram + bigram；空白不参与 bigram"""
+    grams = {c for c in text if not c.isspace()}
+    grams.update(text[i:i + 2] for i in range(len(text) - 1) if " " not in text[i:i + 2])
+    return grams
+
+
+def _queryGrams(query: str) -> set[str]:
+    """查询使用 bigram 求交；不足两个字符的片段退化为 unigram"""
+    grams = set()
+    for part in query.split():
+        grams.update(part[i:i + 2] for i in range(len(part) - 1) if len(part) > 1)
+        if len(part) == 1:
+            grams.add(part)
+    return grams
+
+
+class _Doc:
+    __slots__ = ("id", "status", "name", "productId", "storeName", "grams", "display")
+
+    def __init__(self, row):
+        self.id = row["id"]
+        self.status = row.get("status")
+        # 原始字段用于返回结果，小写归一化字段用于匹配
+        self.display = tuple(row.get(f) or "" for f in SEARCH_FIELDS)
+        self.name = _normalize(row.get("name"))
+        self.productId = _normalize(row.get("productId"))
+        self.storeName = _normalize(row.get("storeName"))
+        self.grams = set().union(*(_grams(getattr(self, f)) for f in SEARCH_FIELDS))
+
+
+def _score(doc: _Doc, query: str) -> float:
+    """商品 ID 精确/前缀匹配优先，其次标题前缀，再次子串；同分时短标题靠前"""
+    score = 0.0
+    for part in query.split():
+        if doc.productId == part:
+            score += 100
+        elif doc.productId.startswith(part):
+            score += 50
+        elif part in doc.productId:
+            score += 20
+        if doc.name.startswith(part):
+            score += 30
+        elif part in doc.name:
+            score += 10
+        if part in doc.storeName:
+            score += 5
+    return score + 1 / (1 + len(doc.name))
+
+
+class ProductSearchIndex:
+    def __init__(self):
+        # workspace -> gram -> {productId}
+        self._postings: dict[str, dict[str, set[str]]] = {}
+        self._docs: dict[str, tuple[str, _Doc]] = {}
+        self._lock = threading.RLock()
+        self._loadedAt: Optional[float] = None
+
+    # ---- 维护 ----
+
+    def _ensureLoaded(self):
+        if self._loadedAt is not None and not (
+            (USE_SUPABASE or memory_store.shared) and time.monotonic() - self._loadedAt > REFRESH_SECONDS
+        ):
+            return
+        if USE_SUPABASE:
+            rows = supabase_client.select("products", columns=INDEX_COLUMNS)
+        else:
+            rows = memory_store.get_all("products")
+        with self._lock:
+            self._postings, self._docs = {}, {}
+            for row in rows:
+                self._add(row)
+            self._loadedAt = time.monotonic()
+
+    def _add(self, row):
+        doc = _Doc(row)
+        workspace = row.get("workspace") or "Tmall"
+        postings = self._postings.setdefault(workspace, {})
+        for gram in doc.grams:
+            postings.setdefault(gram, set()).add(doc.id)
+        self._docs[doc.id] = (workspace, doc)
+
+    def _remove(self, productId: str):
+        entry = self._docs.pop(productId, None)
+        if entry is None:
+            return
+        workspace, doc = entry
+        postings = self._postings.get(workspace, {})
+        for gram in doc.grams:
+            ids = postings.get(gram)
+            if ids is not None:
+                ids.discard(productId)
+                if not ids:
+                    del postings[gram]
+
+    def upsert(self, row):
+        """商品新增或更新后调用；尚未加载时忽略，加载时会读到最新数据"""
+        with self._lock:
+            if self._loadedAt is None:
+                return
+            self._remove(row["id"])
+            self._add(row)
+
+    def remove(self, productId: str):
+        with self._lock:
+            self._remove(productId)
+
+    def invalidate(self):
+        self._loadedAt = None
+
+    # ---- 查询 ----
+
+    def search(self, query: str, workspace: str, limit: int = 20,
+               includeTrashed: bool = False) -> list[dict]:
+        query = _normalize(query)
+        grams = _queryGrams(query)
+        if not grams:
+            return []
+        self._ensureLoaded()
+        with self._lock:
+            postings = self._postings.get(workspace, {})
+            lists = sorted((postings.get(g, set()) for g in grams), key=len)
+            if not lists[0]:
+                return []
+            candidates = set(lists[0])
+            for ids in lists[1:]:
+                candidates &= ids
+                if not candidates:
+                    return []
+            hits = []
+            for pid in candidates:
+                doc = self._docs[pid][1]
+                if not includeTrashed and doc.status == "Trashed":
+                    continue
+                # bigram 求交只保证字符对出现，需再校验每个词确为子串
+                text = f"{doc.name}\n{doc.productId}\n{doc.storeName}"
+                if all(part in text for part in query.split()):
+                    hits.append((_score(doc, query), doc))
+            top = heapq.nlargest(limit, hits, key=lambda h: h[0])
+        return [
+            {"id": doc.id, **dict(zip(SEARCH_FIELDS, doc.display)),
+             "status": doc.status, "score": round(score, 3)}
+            for score, doc in top
+        ]
+
+
+# 单例实例
+productSearch = ProductSearchIndex()
@@ -0,0 +1,127 @@
+"""
+响应序列化 — 可选的快速 JSON 输出路径。
+FAST_RESPONSE=true 时，存储层的可信行直接编码为 JSON 字节返回，
+跳过 response_model 的二次校验与再序列化；行按模型字段投影并补齐缺省值，输出的键与校验路径一致。
+DEBUG=true 时始终保留校验，便于开发和测试发现结构问题。
+安装了 orjson 时使用 orjson 编码，否则回退到标准库 json。
+"""
+
+import json
+import os
+import typing
+from collections.abc import Mapping
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Optional
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+FAST_RESPONSE = os.getenv("FAST_RESPONSE", "false").lower() == "true" and not DEBUG
+
+
+def _default(obj: Any) -> Any:
+    """编码器无法直接处理的类型：存储层 Record、枚举、Pydantic 模型"""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """将内容编码为 UTF-8 JSON 字节"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    """解析 JSON 字节"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(Response):
+    """直接输出 JSON 字节的响应，不经过 response_model 校验"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+_REQUIRED = object()
+
+
+def _nestedModel(annotation: Any) -> tuple[Optional[type[BaseModel]], bool]:
+    """字段类型为 Model / Optional[Model] / list[Model] 时返回 (Model, 是否列表)"""
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    if typing.get_origin(annotation) is list and args:
+        model, _ = _nestedModel(args[0])
+        return model, model is not None
+    if len(args) == 1:
+        return _nestedModel(args[0])
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    return None, False
+
+
+@lru_cache(maxsize=None)
+def _modelShape(model: type[BaseModel]) -> tuple:
+    """模型各字段的 (名称, 缺省值或 _REQUIRED, 嵌套模型, 是否列表)，每个模型只计算一次"""
+    shape = []
+    for name, field in model.model_fields.items():
+        if field.is_required():
+            default = _REQUIRED
+        else:
+            default = field.get_default(call_default_factory=True)
+            if isinstance(default, Enum):
+                default = default.value
+        shape.append((name, default, *_nestedModel(field.annotation)))
+    return tuple(shape)
+
+
+def shapeRow(row: Mapping, model: type[BaseModel]) -> dict:
+    """
+    按模型投影一行：只保留模型字段，缺失字段补缺省值（必填字段缺失时省略），
+    嵌套模型字段递归处理，与 response_model 校验后输出的键保持一致。
+    """
+    out = {}
+    for name, default, nested, many in _modelShape(model):
+        value = row.get(name, _REQUIRED)
+        if value is _REQUIRED:
+            if default is _REQUIRED:
+                continue
+            value = default
+        elif nested is not None and value is not None:
+            value = [shapeRow(v, nested) for v in value] if many else shapeRow(value, nested)
+        out[name] = value
+    return out
+
+
+def respond(content: Any, model: Optional[type[BaseModel]] = None) -> Any:
+    """
+    路由返回存储行时使用：快速模式下按 model 投影后直接返回 JSON 字节，
+    否则原样返回，由 FastAPI 按 response_model 校验并序列化。
+    model 为路由 response_model 中的行模型（列表接口传元素模型）。
+    """
+    if FAST_RESPONSE:
+        if model is not None:
+            if isinstance(content, Mapping):
+                content = shapeRow(content, model)
+            else:
+                content = [shapeRow(r, model) for r in content]
+        return FastJSONResponse(content)
+    return content
@@ -0,0 +1,287 @@
+"""
+多 worker 共享的内存存储 — 内存模式下以多个 uvicorn worker 运行时，各进程原本各自持有一份 memory_store，数据互相分叉。
+设置 MEMORY_STORE_SOCKET 后，由一个独立的属主进程持有全部表，worker 通过本机 Unix socket 访问：
+  MEMORY_STORE_SOCKET=/tmp/bossops-store.sock python -m backend.shared_store
+  MEMORY_STORE_SOCKET=/tmp/bossops-store.sock uvicorn backend.main:app --workers 4
+所有写入在属主进程内串行经过 MemoryStore 的表锁，保持与单进程相同的一致性；
+请求解析、校验与序列化分摊到各 worker，读取可随 worker 数扩展。
+协议为长度前缀的 pickle 帧 (方法, 参数) -> ("ok", 结果) / ("err", 异常)，socket 文件权限为 0600，仅限同一用户访问。
+modify / modify_many 的回调函数无法跨进程传递，在 worker 内以“读取 → 计算 → 按整行比较后写入”的乐观方式执行，
+行在此期间被其他进程修改时重读重试，因此回调可能被调用多次，不应在回调中产生副作用。
+定时批处理任务（SCHEDULER_ENABLED）在属主进程中运行，worker 不再各自执行；任务运行标记保存在共享存储中。
+仍为进程内状态、不跨 worker 共享的有：商品导入任务进度、诊断任务状态、性能剖析结果（轮询需落到同一 worker），
+以及排行榜 / 搜索 / 号池缓存（其他 worker 的写入要等 TTL 过期后才可见）。
+"""
+
+import os
+import pickle
+import socket
+import socketserver
+import sys
+import threading
+from typing import Any, Callable, Optional
+
+HEADER_BYTES = 8
+# 乐观读-改-写的最大重试次数
+MAX_CAS_RETRIES = 50
+
+# 可直接转发给属主进程 MemoryStore 的方法
+REMOTE_METHODS = frozenset({
+    "version", "create_index", "get_all", "get_by_id", "page",
+    "insert", "insert_many", "insert_unique", "update", "compare_and_set",
+    "delete", "delete_many",
+})
+# 只读方法：连接断开时可以安全地重连重试
+READ_METHODS = frozenset({"version", "get_all", "get_by_id", "get_many", "page"})
+
+
+class StoreUnavailable(RuntimeError):
+    pass
+
+
+def _sendFrame(sock: socket.socket, obj: Any):
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(len(data).to_bytes(HEADER_BYTES, "big") + data)
+
+
+def _recvExact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(min(size - len(buf), 1 << 20))
+        if not chunk:
+            raise ConnectionError("连接已关闭")
+        buf += chunk
+    return bytes(buf)
+
+
+def _recvFrame(sock: socket.socket) -> Any:
+    size = int.from_bytes(_recvExact(sock, HEADER_BYTES), "big")
+    return pickle.loads(_recvExact(sock, size))
+
+
+# ============== 属主进程 ==============
+
+def _casMany(store, table: str, items: dict[str, tuple[dict, dict]]) -> tuple[list, list[str]]:
+    """
+    批量条件写入：在一次写锁内，对当前值仍与 expected 整行相等的行合并 changes。
+    返回 (修改后的行, 因行已变化而跳过的 id)；已被删除的行既不修改也不报告冲突。
+    """
+    conflicts: list[str] = []
+
+    def apply(row):
+        expected, changes = items[row["id"]]
+        if dict(row) != expected:
+            conflicts.append(row["id"])
+            return None
+        return changes
+
+    changed = store.modify_many(table, list(items), apply)
+    return changed, conflicts
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        store = self.server.store
+        while True:
+            try:
+                method, args, kwargs = _recvFrame(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                if method == "cas_many":
+                    result = ("ok", _casMany(store, *args))
+                elif method == "get_many":
+                    table, rowIds = args
+                    result = ("ok", [store.get_by_id(table, i) for i in rowIds])
+                elif method in REMOTE_METHODS:
+                    result = ("ok", getattr(store, method)(*args, **kwargs))
+                else:
+                    raise AttributeError(f"不支持的存储方法: {method}")
+            except Exception as e:
+                result = ("err", e)
+            try:
+                _sendFrame(self.request, result)
+            except (ConnectionError, OSError):
+                return
+
+
+class MemoryStoreServer(socketserver.ThreadingUnixStreamServer):
+    """属主进程：持有一个 MemoryStore，每个 worker 连接由一个线程服务"""
+
+    daemon_threads = True
+
+    def __init__(self, path: str, store):
+        if os.path.exists(path):
+            # 上次运行遗留的 socket 文件；若仍有进程在监听则拒绝启动
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except OSError:
+                os.unlink(path)
+            else:
+                probe.close()
+                raise RuntimeError(f"{path} 已有存储进程在运行")
+        self.store = store
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o600)
+
+
+def _runScheduler():
+    import asyncio
+    from . import jobs  # noqa: F401  注册定时批处理任务
+    from .scheduler import scheduler
+
+    async def main():
+        scheduler.start()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def serve(path: str):
+    # 属主进程自身直接使用本地 MemoryStore，定时任务也在这里对同一份数据执行
+    os.environ.pop("MEMORY_STORE_SOCKET", None)
+    from .memory_store import memory_store
+    from .scheduler import SCHEDULER_ENABLED, markStoreOwner
+    markStoreOwner()
+    server = MemoryStoreServer(path, memory_store)
+    if SCHEDULER_ENABLED:
+        threading.Thread(target=_runScheduler, name="scheduler", daemon=True).start()
+    print(f"[OK] 共享内存存储已启动: {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
+
+
+# ============== worker 端 ==============
+
+class RemoteMemoryStore:
+    """
+    MemoryStore 的跨进程代理，接口与 MemoryStore 的公开方法一致。
+    每个线程持有一条到属主进程的连接，线程池中的并发请求互不阻塞。
+    """
+
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except OSError as e:
+                sock.close()
+                raise StoreUnavailable(
+                    f"无法连接共享内存存储 {self.path}（请先运行 python -m backend.shared_store）: {e}"
+                ) from e
+            self._local.sock = sock
+        return sock
+
+    def _drop(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        attempts = 2 if method in READ_METHODS else 1
+        for attempt in range(attempts):
+            sock = self._connection()
+            try:
+                _sendFrame(sock, (method, args, kwargs))
+                status, value = _recvFrame(sock)
+                break
+            except (ConnectionError, OSError) as e:
+                self._drop()
+                # 写入可能已被属主执行，不能盲目重试
+                if attempt + 1 == attempts:
+                    raise StoreUnavailable(f"共享内存存储连接中断: {e}") from e
+        if status == "err":
+            raise value
+        return value
+
+    # ---- 直接转发 ----
+
+    def version(self, table: str) -> int:
+        return self._call("version", table)
+
+    def create_index(self, table: str, fields: tuple[str, ...]):
+        return self._call("create_index", table, fields)
+
+    def get_all(self, table: str, filters: Optional[dict] = None) -> list:
+        return self._call("get_all", table, filters)
+
+    def get_by_id(self, table: str, row_id: str):
+        return self._call("get_by_id", table, row_id)
+
+    def page(self, table: str, after: Optional[str] = None, limit: int = 500,
+             filters: Optional[dict] = None) -> list:
+        return self._call("page", table, after, limit, filters)
+
+    def insert(self, table: str, data: dict):
+        return self._call("insert", table, data)
+
+    def insert_many(self, table: str, items: list[dict]) -> list:
+        return self._call("insert_many", table, items)
+
+    def insert_unique(self, table: str, items: list[dict], key: tuple[str, ...]) -> list:
+        return self._call("insert_unique", table, items, key)
+
+    def update(self, table: str, row_id: str, data: dict, expected_version: Optional[int] = None):
+        return self._call("update", table, row_id, data, expected_version)
+
+    def compare_and_set(self, table: str, row_id: str, expected: dict, data: dict):
+        return self._call("compare_and_set", table, row_id, expected, data)
+
+    def delete(self, table: str, row_id: str) -> bool:
+        return self._call("delete", table, row_id)
+
+    def delete_many(self, table: str, row_ids: list[str]) -> int:
+        return self._call("delete_many", table, row_ids)
+
+    # ---- 乐观读-改-写 ----
+
+    def modify(self, table: str, row_id: str, fn: Callable[[Any], dict]):
+        changed = self.modify_many(table, [row_id], fn, skipNone=False)
+        return changed[0] if changed else None
+
+    def modify_many(self, table: str, row_ids: list[str], fn: Callable[[Any], Optional[dict]],
+                    skipNone: bool = True) -> list:
+        """
+        与 MemoryStore.modify_many 语义相同，但每行各自原子（不保证整批在同一把写锁内）。
+        读到的行在写入前被其他进程修改时，只对这些行重读并重新调用 fn。
+        """
+        pending = list(dict.fromkeys(row_ids))
+        changed = []
+        for _ in range(MAX_CAS_RETRIES):
+            if not pending:
+                return changed
+            rows = [r for r in self._call("get_many", table, pending) if r is not None]
+            items = {}
+            for row in rows:
+                changes = fn(row)
+                if changes is None:
+                    if skipNone:
+                        continue
+                    changes = {}
+                items[row["id"]] = (dict(row), changes)
+            if not items:
+                return changed
+            done, pending = self._call("cas_many", table, items)
+            changed += done
+        raise StoreUnavailable(f"{table} 写入冲突重试次数过多: {pending}")
+
+
+if __name__ == "__main__":
+    socketPath = sys.argv[1] if len(sys.argv) > 1 else os.getenv("MEMORY_STORE_SOCKET", "")
+    if not socketPath:
+        sys.exit("用法: python -m backend.shared_store <socket 路径>（或设置 MEMORY_STORE_SOCKET）")
+    serve(socketPath)
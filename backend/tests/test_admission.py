@@ -0,0 +1,51 @@
+"""
+准入控制测试：路由分类，以及令牌桶耗尽后返回 429 与 Retry-After。
+"""
+
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from backend import admission
+from backend.admission import TRAFFIC_CLASSES, AdmissionController, AdmissionMiddleware, classify
+
+
+def test_core_reads_use_the_default_class():
+    assert classify("GET", "/api/members") is TRAFFIC_CLASSES["default"]
+    assert classify("GET", "/api/members/m1/credit-history") is TRAFFIC_CLASSES["default"]
+    assert classify("POST", "/api/credits/trigger") is TRAFFIC_CLASSES["critical"]
+    assert classify("GET", "/api/export/products") is TRAFFIC_CLASSES["heavy"]
+    assert classify("GET", "/api/health") is None
+
+
+def test_members_list_survives_ordinary_refreshes(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", True)
+    responses = _get(AdmissionController(), "/api/members", 20)
+    assert [r.status_code for r in responses] == [200] * 20
+
+
+def test_exhausted_bucket_returns_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", True)
+    controller = AdmissionController()
+    burst = TRAFFIC_CLASSES["heavy"].burst
+
+    responses = _get(controller, "/api/export/products", burst + 1)
+
+    assert [r.status_code for r in responses] == [200] * burst + [429]
+    assert int(responses[-1].headers["retry-after"]) >= 1
+    assert responses[-1].json()["detail"]
+    assert controller.stats["rateLimited"] == 1
+    assert TRAFFIC_CLASSES["heavy"].inflight == 0
+
+
+def _get(controller: AdmissionController, path: str, n: int) -> list[httpx.Response]:
+    inner = FastAPI()
+    inner.add_api_route(path, lambda: {"ok": True})
+    app = AdmissionMiddleware(inner, controller)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as http:
+            return [await http.get(path) for _ in range(n)]
+
+    return asyncio.run(run())
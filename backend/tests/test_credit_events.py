@@ -0,0 +1,47 @@
+"""
+信用事件批量写入测试：Supabase 模式下一批事件只产生一次插入与一次积分 RPC，不逐成员 PATCH。
+"""
+
+import json
+
+import httpx
+
+from backend.database import SupabaseRestClient
+from backend.routers import credits
+from backend.routers.credits import applyCreditEvents, buildCreditRecord
+
+
+def test_batch_applies_score_deltas_in_one_rpc(monkeypatch):
+    calls = []
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content or b"null")
+        calls.append((request.method, request.url.path, body))
+        if request.url.path.endswith("/credit_records"):
+            return httpx.Response(201, json=body)
+        changes = body["changes"]
+        return httpx.Response(200, json=[
+            {"id": c["id"], "creditScore": max(0, 10 + sum(c["deltas"]))} for c in changes
+        ])
+
+    client = SupabaseRestClient("http://upstream.test", "key", transport=httpx.MockTransport(upstream))
+    monkeypatch.setattr(credits, "USE_SUPABASE", True)
+    monkeypatch.setattr(credits, "supabase_client", client)
+    scores = {}
+    monkeypatch.setattr(credits.leaderboard, "setScore", lambda memberId, score: scores.update({memberId: score}))
+
+    records = [
+        buildCreditRecord("m1", "GOAL_OVERDUE_PENALTY", relatedId="t1", cycleKey="cycle-0"),
+        buildCreditRecord("m1", "GOAL_OVERDUE_PENALTY", relatedId="t2", cycleKey="cycle-0"),
+        buildCreditRecord("m2", "WEEKLY_GOAL_COUNT_INSUFFICIENT", cycleKey="W2026-42"),
+    ]
+    fresh = applyCreditEvents(records)
+
+    assert len(fresh) == 3
+    assert [(method, path) for method, path, _ in calls] == [
+        ("POST", "/rest/v1/credit_records"),
+        ("POST", "/rest/v1/rpc/apply_credit_deltas"),
+    ]
+    changes = {c["id"]: c["deltas"] for c in calls[1][2]["changes"]}
+    assert changes == {"m1": [-3, -3], "m2": [-2]}
+    assert scores == {"m1": 4, "m2": 8}
@@ -0,0 +1,67 @@
+"""
+定时信用任务测试：同一周期内重复执行不会重复扣分，周期键跨月唯一。
+"""
+
+from datetime import datetime
+
+import pytest
+
+from backend.credit_jobs import runOverduePenalties, runWeeklyGoalCheck
+from backend.memory_store import memory_store
+
+
+@pytest.fixture
+def member():
+    row = memory_store.insert("members", {"name": "任务测试", "role": "运营", "creditScore": 100})
+    targets = []
+
+    def addTarget(deadline: str, completedAt=None):
+        targets.append(memory_store.insert("targets", {
+            "title": "目标", "type": "sales", "deadline": deadline, "workspace": "JobTest",
+            "operatorId": row["id"], "completedAt": completedAt,
+        })["id"])
+
+    yield row["id"], addTarget
+    memory_store.delete_many("targets", targets)
+    memory_store.delete_many("credit_records", [r["id"] for r in memory_store.get_all("credit_records", {"userId": row["id"]})])
+    memory_store.delete("members", row["id"])
+
+
+def score(memberId: str) -> int:
+    return memory_store.get_by_id("members", memberId)["creditScore"]
+
+
+def test_overdue_penalty_rerun_in_same_cycle_is_a_noop(member):
+    memberId, addTarget = member
+    addTarget("2026-10-10T00:00:00")
+    addTarget("2026-10-10T00:00:00", completedAt="2026-10-09T00:00:00")
+
+    runOverduePenalties(datetime(2026, 10, 12, 0, 5))
+    runOverduePenalties(datetime(2026, 10, 12, 12, 0))
+    assert score(memberId) == 97
+
+    # 进入下一个 3 天周期再扣一次
+    runOverduePenalties(datetime(2026, 10, 13, 0, 5))
+    assert score(memberId) == 94
+
+
+def test_weekly_goal_check_rerun_is_a_noop(member):
+    memberId, _ = member
+    now = datetime(2026, 10, 24, 23, 30)
+
+    first = runWeeklyGoalCheck(now)
+    second = runWeeklyGoalCheck(now)
+
+    assert first["applied"] >= 1
+    assert second["applied"] == 0
+    assert score(memberId) == 98
+
+
+def test_weekly_cycle_keys_differ_across_months(member):
+    memberId, _ = member
+    # 两个日期都在所在月份的第 4 周
+    october = runWeeklyGoalCheck(datetime(2026, 10, 24, 23, 30))
+    november = runWeeklyGoalCheck(datetime(2026, 11, 28, 23, 30))
+
+    assert october["cycleKey"] != november["cycleKey"]
+    assert score(memberId) == 96
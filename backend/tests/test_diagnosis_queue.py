@@ -0,0 +1,153 @@
+"""
+诊断任务队列测试：使用 LocalDiagnosisClient 核对批量合并、指标缓存与并发上限。
+写回替换为记录调用，不依赖存储中的商品。
+"""
+
+import math
+import threading
+import time
+
+import pytest
+
+from backend import diagnosis
+from backend.diagnosis import DiagnosisQueue, LocalDiagnosisClient
+
+
+class CountingClient(LocalDiagnosisClient):
+    """记录模型调用次数与同时进行的最大调用数"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls: list[int] = []
+        self.active = 0
+        self.maxActive = 0
+        self._lock = threading.Lock()
+
+    def diagnose(self, items):
+        with self._lock:
+            self.calls.append(len(items))
+            self.active += 1
+            self.maxActive = max(self.maxActive, self.active)
+        try:
+            time.sleep(self.delay)
+            return super().diagnose(items)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    written = []
+    monkeypatch.setattr(diagnosis, "_writeBack", lambda productId, diagnoses: written.append((productId, diagnoses)))
+    return written
+
+
+@pytest.fixture
+def makeQueue():
+    queues = []
+
+    def make(client):
+        q = DiagnosisQueue(client)
+        queues.append(q)
+        return q
+
+    yield make
+    for q in queues:
+        q.stop()
+
+
+def records(n: int, start: int = 0) -> list[dict]:
+    return [{"id": f"r{i}", "date": "2026-01-01", "roi": i, "cvr": 2, "uv": 100, "adCost": 10} for i in range(start, start + n)]
+
+
+def waitDone(jobs, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while any(job.status not in ("done", "failed") for job in jobs):
+        assert time.monotonic() < deadline, [job.status for job in jobs]
+        time.sleep(0.01)
+
+
+def test_records_are_batched_into_few_model_calls(monkeypatch, writes, makeQueue):
+    monkeypatch.setattr(diagnosis, "BATCH_SIZE", 4)
+    monkeypatch.setattr(diagnosis, "BATCH_WAIT", 0.2)
+    client = CountingClient()
+    q = makeQueue(client)
+
+    jobs = q.submit({"id": "p1", "name": "商品"}, records(10))
+    waitDone(jobs)
+
+    assert all(job.status == "done" for job in jobs)
+    assert len(client.calls) <= math.ceil(10 / 4)
+    assert sum(client.calls) == 10
+    assert q.stats["batches"] == len(client.calls)
+    assert q.stats["modelItems"] == 10
+    diagnosed = {recordId for _, diagnoses in writes for recordId in diagnoses}
+    assert diagnosed == {f"r{i}" for i in range(10)}
+
+
+def test_identical_metrics_hit_the_cache(monkeypatch, writes, makeQueue):
+    monkeypatch.setattr(diagnosis, "BATCH_WAIT", 0.05)
+    client = CountingClient()
+    q = makeQueue(client)
+
+    first = q.submit({"id": "p1", "name": "商品"}, records(3))
+    waitDone(first)
+    calls = len(client.calls)
+
+    # 另一个商品的记录 id 不同但指标相同，直接命中缓存，不再调用模型
+    again = [{**r, "id": "x" + r["id"]} for r in records(3)]
+    second = q.submit({"id": "p2", "name": "商品"}, again)
+    waitDone(second)
+
+    assert len(client.calls) == calls
+    assert q.stats["cacheHits"] == 3
+    assert [job.diagnosis for job in second] == [job.diagnosis for job in first]
+
+
+def test_identical_metrics_in_one_batch_are_sent_once(monkeypatch, writes, makeQueue):
+    monkeypatch.setattr(diagnosis, "BATCH_WAIT", 0.2)
+    client = CountingClient()
+    q = makeQueue(client)
+
+    same = [{**records(1)[0], "id": f"r{i}"} for i in range(5)]
+    jobs = q.submit({"id": "p1", "name": "商品"}, same)
+    waitDone(jobs)
+
+    assert client.calls == [1]
+    assert len({str(job.diagnosis) for job in jobs}) == 1
+
+
+def test_model_calls_respect_concurrency_limit(monkeypatch, writes, makeQueue):
+    monkeypatch.setattr(diagnosis, "BATCH_SIZE", 1)
+    monkeypatch.setattr(diagnosis, "BATCH_WAIT", 0.0)
+    monkeypatch.setattr(diagnosis, "CONCURRENCY", 2)
+    client = CountingClient(delay=0.05)
+    q = makeQueue(client)
+
+    jobs = q.submit({"id": "p1", "name": "商品"}, records(8))
+    waitDone(jobs)
+
+    assert len(client.calls) == 8
+    assert client.maxActive <= 2
+    assert q.stats["submitted"] == 8 and q.stats["failed"] == 0
+
+
+class ShortClient(LocalDiagnosisClient):
+    """模拟响应被截断：少返回一条结果"""
+
+    def diagnose(self, items):
+        return super().diagnose(items)[:-1]
+
+
+def test_short_model_response_fails_the_batch(monkeypatch, writes, makeQueue):
+    monkeypatch.setattr(diagnosis, "BATCH_WAIT", 0.2)
+    q = makeQueue(ShortClient())
+
+    jobs = q.submit({"id": "p1", "name": "商品"}, records(3))
+    waitDone(jobs)
+
+    assert [job.status for job in jobs] == ["failed"] * 3
+    assert all("预期 3 条" in job.error for job in jobs)
+    assert q.stats["failed"] == 3
+    assert writes == []
@@ -0,0 +1,110 @@
+"""
+MemoryStore 测试：紧凑行记录的只读语义、条件更新、唯一插入，以及多线程并发写入下的锁。
+每个测试使用独立的 MemoryStore 实例。
+"""
+
+import threading
+
+import pytest
+
+from backend.memory_store import MemoryStore, ProductRow
+
+THREADS = 8
+
+
+@pytest.fixture
+def store():
+    return MemoryStore()
+
+
+def runThreads(target, n: int = THREADS) -> list:
+    results = [None] * n
+    start = threading.Barrier(n)
+
+    def run(i):
+        start.wait()
+        results[i] = target(i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_rows_are_compact_read_only_mappings(store):
+    row = store.insert("products", {"name": "商品", "workspace": "Tmall", "history": [{"content": "a"}], "note": "x"})
+
+    assert isinstance(row, ProductRow)
+    assert not hasattr(row, "__dict__")
+    assert row["name"] == "商品" and row.get("missing", 1) == 1
+    assert {**row}["note"] == "x"
+    with pytest.raises(TypeError):
+        row.name = "改名"
+    with pytest.raises(TypeError):
+        row["history"].append({})
+    assert row["version"] == 1
+
+
+def test_compare_and_set_applies_only_on_match(store):
+    row = store.insert("products", {"name": "商品", "workspace": "Tmall", "status": "Abandoned"})
+
+    assert store.compare_and_set("products", row["id"], {"status": "Active"}, {"operatorId": "m1"}) is None
+    updated = store.compare_and_set("products", row["id"], {"status": "Abandoned"}, {"status": "Active", "operatorId": "m1"})
+    assert updated["operatorId"] == "m1" and updated["version"] == 2
+    assert store.compare_and_set("products", "missing", {"status": "Active"}, {"operatorId": "m2"}) is None
+    # 索引随更新调整
+    assert [p["id"] for p in store.get_all("products", {"workspace": "Tmall", "status": "Active"})] == [row["id"]]
+    assert store.get_all("products", {"workspace": "Tmall", "status": "Abandoned"}) == []
+
+
+def test_concurrent_compare_and_set_has_one_winner(store):
+    row = store.insert("products", {"name": "商品", "workspace": "Tmall", "status": "Abandoned"})
+
+    results = runThreads(lambda i: store.compare_and_set(
+        "products", row["id"], {"status": "Abandoned"}, {"status": "Active", "operatorId": f"m{i}"},
+    ))
+
+    winners = [r for r in results if r is not None]
+    assert len(winners) == 1
+    assert store.get_by_id("products", row["id"])["operatorId"] == winners[0]["operatorId"]
+
+
+def test_insert_unique_skips_existing_and_in_batch_duplicates(store):
+    key = ("userId", "cycleKey")
+    first = store.insert_unique("credit_records", [{"userId": "m1", "cycleKey": "W1", "change": -2}], key)
+    again = store.insert_unique("credit_records", [
+        {"userId": "m1", "cycleKey": "W1", "change": -2},
+        {"userId": "m1", "cycleKey": "W2", "change": -2},
+        {"userId": "m1", "cycleKey": "W2", "change": -2},
+    ], key)
+
+    assert len(first) == 1
+    assert [r["cycleKey"] for r in again] == ["W2"]
+    assert len(store.get_all("credit_records", {"userId": "m1"})) == 2
+
+
+def test_concurrent_insert_unique_inserts_once(store):
+    key = ("userId", "eventType", "relatedId", "cycleKey")
+    record = {"userId": "m1", "eventType": "GOAL_OVERDUE_PENALTY", "relatedId": "t1", "cycleKey": "cycle-0", "change": -3}
+
+    results = runThreads(lambda i: store.insert_unique("credit_records", [dict(record)], key))
+
+    assert sum(len(r) for r in results) == 1
+    assert len(store.get_all("credit_records", {"userId": "m1"})) == 1
+
+
+def test_concurrent_modify_loses_no_updates(store):
+    member = store.insert("members", {"name": "测试", "creditScore": 0})
+    perThread = 200
+
+    def bump(i):
+        for _ in range(perThread):
+            store.modify("members", member["id"], lambda m: {"creditScore": m["creditScore"] + 1})
+
+    versionBefore = store.version("members")
+    runThreads(bump)
+
+    assert store.get_by_id("members", member["id"])["creditScore"] == THREADS * perThread
+    assert store.version("members") == versionBefore + THREADS * perThread
@@ -0,0 +1,89 @@
+"""
+公共池领取测试：经完整应用调用领取接口，核对条件更新（CAS）的裁决——
+指定商品被抢先领取返回 409，池为空返回 404，并发领取下一个商品时每个商品只分配一次。
+使用独立的工作区名，避免与其他数据混在一起。
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from backend import admission
+from backend.main import app
+from backend.memory_store import memory_store
+from backend.public_pool import publicPool
+
+WORKSPACE = "ClaimTest"
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", False)
+    created = []
+
+    def add(n: int) -> list[str]:
+        for i in range(n):
+            created.append(memory_store.insert("products", {
+                "name": f"池商品{i}", "productId": f"pool-{len(created)}", "workspace": WORKSPACE,
+                "status": "Abandoned", "operatorId": None, "dayCount": 0, "history": [],
+            })["id"])
+        publicPool.invalidate()
+        return created[-n:]
+
+    yield add
+    memory_store.delete_many("products", created)
+    publicPool.invalidate()
+
+
+def send(*requests: tuple[str, str, dict]) -> list[httpx.Response]:
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as http:
+            return await asyncio.gather(*(http.request(m, url, json=body) for m, url, body in requests))
+
+    return asyncio.run(run())
+
+
+def test_claiming_a_taken_product_returns_409(pool):
+    [productId] = pool(1)
+
+    [first] = send(("POST", f"/api/products/{productId}/claim", {"memberId": "m1", "workspace": WORKSPACE}))
+    [second] = send(("POST", f"/api/products/{productId}/claim", {"memberId": "m2", "workspace": WORKSPACE}))
+
+    assert first.status_code == 200
+    assert first.json()["operatorId"] == "m1" and first.json()["status"] == "Active"
+    assert second.status_code == 409
+    assert memory_store.get_by_id("products", productId)["operatorId"] == "m1"
+
+
+def test_concurrent_claims_of_one_product_have_one_winner(pool):
+    [productId] = pool(1)
+
+    responses = send(*[
+        ("POST", f"/api/products/{productId}/claim", {"memberId": member, "workspace": WORKSPACE})
+        for member in ("m1", "m2") * 4
+    ])
+
+    assert sorted(r.status_code for r in responses) == [200] + [409] * 7
+    winner = next(r.json()["operatorId"] for r in responses if r.status_code == 200)
+    assert memory_store.get_by_id("products", productId)["operatorId"] == winner
+
+
+def test_claim_next_on_an_empty_pool_returns_404(pool):
+    pool(0)
+    [response] = send(("POST", "/api/products/pool/claim", {"memberId": "m1", "workspace": WORKSPACE}))
+    assert response.status_code == 404
+
+
+def test_concurrent_claim_next_assigns_each_product_once(pool):
+    productIds = pool(3)
+
+    responses = send(*[
+        ("POST", "/api/products/pool/claim", {"memberId": "m1", "workspace": WORKSPACE}) for _ in range(6)
+    ])
+
+    statuses = sorted(r.status_code for r in responses)
+    assert statuses == [200, 200, 200, 404, 404, 404]
+    claimed = [r.json()["id"] for r in responses if r.status_code == 200]
+    assert sorted(claimed) == sorted(productIds)
+    assert all(memory_store.get_by_id("products", pid)["operatorId"] == "m1" for pid in productIds)
@@ -0,0 +1,98 @@
+"""
+导入解析测试：以分块的请求体驱动 _iterRecords，核对 CSV 引号内换行的拼接、超长行与超长记录的丢弃，
+以及丢弃后的行号与续读。
+"""
+
+import asyncio
+import json
+
+from backend.routers import product_import
+from backend.routers.product_import import _iterRecords
+
+
+class ChunkedRequest:
+    """只提供 stream() 的请求替身，按给定分块产出请求体"""
+
+    def __init__(self, chunks: list[bytes]):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def parse(chunks: list[bytes], fmt: str) -> list[tuple[int, object]]:
+    async def run():
+        return [item async for item in _iterRecords(ChunkedRequest(chunks), fmt)]
+
+    return asyncio.run(run())
+
+
+def test_overlong_line_without_newline_is_dropped(monkeypatch):
+    monkeypatch.setattr(product_import, "MAX_RECORD_CHARS", 100)
+    chunks = [b'{"name": "' + b"x" * 60 for _ in range(10)]
+
+    records = parse(chunks, "ndjson")
+
+    assert len(records) == 1
+    lineNo, error = records[0]
+    assert lineNo == 1 and "超过 100 字符" in error
+
+
+def test_parsing_resumes_after_an_overlong_line(monkeypatch):
+    monkeypatch.setattr(product_import, "MAX_RECORD_CHARS", 100)
+    good = json.dumps({"name": "商品", "productId": "p1"}).encode()
+    chunks = [b'{"name": "' + b"x" * 80, b"x" * 80, b'"}\n' + good + b"\n", good]
+
+    records = parse(chunks, "ndjson")
+
+    assert records[0][0] == 1 and isinstance(records[0][1], str)
+    assert records[1:] == [(2, {"name": "商品", "productId": "p1"}), (3, {"name": "商品", "productId": "p1"})]
+
+
+def test_overlong_line_inside_a_quoted_csv_record(monkeypatch):
+    monkeypatch.setattr(product_import, "MAX_RECORD_CHARS", 100)
+    body = 'name,productId\n"start\n' + "y" * 300 + '\nend",p1\nok,p2\n'
+
+    records = parse([body.encode()[i:i + 32] for i in range(0, len(body.encode()), 32)], "csv")
+
+    assert records == [(2, "第 3 行超过 100 字符，所在记录已跳过"), (5, {"name": "ok", "productId": "p2"})]
+
+
+def test_quoted_multiline_csv_record_is_rejoined():
+    body = (
+        'name,productId,link\n'
+        '"多行\n名称, 含逗号",p1,https://a\n'
+        '"带 ""引号"" 的名称",p2,\n'
+        'plain,p3,https://c\r\n'
+    ).encode()
+
+    records = parse([body[i:i + 7] for i in range(0, len(body), 7)], "csv")
+
+    assert records == [
+        (2, {"name": "多行\n名称, 含逗号", "productId": "p1", "link": "https://a"}),
+        (4, {"name": '带 "引号" 的名称', "productId": "p2"}),
+        (5, {"name": "plain", "productId": "p3", "link": "https://c"}),
+    ]
+
+
+def test_unclosed_quote_is_cut_off_after_max_record_lines(monkeypatch):
+    monkeypatch.setattr(product_import, "MAX_RECORD_LINES", 3)
+    body = 'name,productId\n"unclosed,p1\nx,p2\ny,p3\nok,p4\n'
+
+    records = parse([body.encode()], "csv")
+
+    # 引号未闭合的记录缓冲到上限后被丢弃，之后的行照常解析，不会把剩余文件当作同一条记录读入
+    assert records == [
+        (2, "记录过长或引号未闭合（第 2-4 行），已跳过"),
+        (5, {"name": "ok", "productId": "p4"}),
+    ]
+
+
+def test_unclosed_quote_at_end_of_file_is_reported():
+    records = parse(['name,productId\nok,p1\n"broken,p2\n'.encode()], "csv")
+
+    assert records == [
+        (2, {"name": "ok", "productId": "p1"}),
+        (3, "文件结束时引号未闭合（自第 3 行起），该记录已跳过"),
+    ]
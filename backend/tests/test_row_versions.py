@@ -0,0 +1,73 @@
+"""
+乐观并发测试：带 If-Match 的条件更新，版本不符时返回 409 与当前版本的 ETag。
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from backend import admission
+from backend.concurrency import parseIfMatch
+from backend.main import app
+from backend.memory_store import memory_store
+
+
+@pytest.fixture
+def rows(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", False)
+    product = memory_store.insert("products", {
+        "name": "版本商品", "productId": "ver-1", "workspace": "VersionTest", "operatorId": "m1",
+    })
+    target = memory_store.insert("targets", {
+        "title": "版本目标", "type": "sales", "deadline": "2026-12-31", "workspace": "VersionTest", "operatorId": "m1",
+    })
+    yield product["id"], target["id"]
+    memory_store.delete("products", product["id"])
+    memory_store.delete("targets", target["id"])
+
+
+def put(url: str, body: dict, ifMatch: str | None = None) -> httpx.Response:
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as http:
+            return await http.put(url, json=body, headers={"If-Match": ifMatch} if ifMatch else None)
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("table,field", [("products", "name"), ("targets", "title")])
+def test_stale_if_match_returns_409_with_current_etag(rows, table, field):
+    rowId = rows[0] if table == "products" else rows[1]
+    url = f"/api/{table}/{rowId}"
+
+    ok = put(url, {field: "第一次"}, '"1"')
+    assert ok.status_code == 200 and ok.json()["version"] == 2
+
+    stale = put(url, {field: "基于旧版本"}, '"1"')
+    assert stale.status_code == 409
+    assert stale.headers["etag"] == '"2"'
+    assert stale.json()["currentVersion"] == 2
+    assert memory_store.get_by_id(table, rowId)[field] == "第一次"
+
+    retried = put(url, {field: "重新读取后"}, stale.headers["etag"])
+    assert retried.status_code == 200 and retried.json()["version"] == 3
+
+
+def test_update_without_if_match_is_unconditional(rows):
+    productId, _ = rows
+    put(f"/api/products/{productId}", {"name": "改一次"})
+    response = put(f"/api/products/{productId}", {"name": "再改一次"})
+    assert response.status_code == 200 and response.json()["version"] == 3
+
+
+def test_parse_if_match_forms():
+    assert parseIfMatch('"3"') == 3
+    assert parseIfMatch('W/"3"') == 3
+    assert parseIfMatch("3") == 3
+    assert parseIfMatch("*") is None
+    assert parseIfMatch(None) is None
+
+
+def test_malformed_if_match_is_rejected(rows):
+    productId, _ = rows
+    assert put(f"/api/products/{productId}", {"name": "x"}, '"abc"').status_code == 400
@@ -0,0 +1,46 @@
+"""
+调度器测试：共享任务状态的写回，以当前进程的 MemoryStore 模拟属主进程。
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from backend import scheduler as schedulerModule
+from backend.memory_store import memory_store
+from backend.scheduler import JOBS_TABLE, Scheduler, daily
+
+
+@pytest.fixture
+def sharedScheduler(monkeypatch):
+    monkeypatch.setattr(schedulerModule, "USE_SUPABASE", False)
+    monkeypatch.setattr(schedulerModule, "_storeOwner", True)
+    yield Scheduler()
+    memory_store.delete(JOBS_TABLE, "flaky")
+
+
+def _status(scheduler: Scheduler, name: str) -> dict:
+    return next(s for s in scheduler.statuses() if s["name"] == name)
+
+
+def test_success_after_failure_clears_shared_error(sharedScheduler):
+    outcomes = [RuntimeError("boom"), None]
+
+    def flaky(now: datetime):
+        outcome = outcomes.pop(0)
+        if outcome is not None:
+            raise outcome
+        return outcome
+
+    sharedScheduler.register("flaky", flaky, daily(1, 0))
+    with pytest.raises(RuntimeError):
+        asyncio.run(sharedScheduler.runJob("flaky"))
+    assert _status(sharedScheduler, "flaky")["lastError"] == "RuntimeError: boom"
+
+    assert asyncio.run(sharedScheduler.runJob("flaky")) is None
+    status = _status(sharedScheduler, "flaky")
+    assert status["lastError"] is None
+    assert status["lastResult"] is None
+    assert status["running"] is False
+    assert memory_store.get_by_id(JOBS_TABLE, "flaky")["lastError"] is None
@@ -0,0 +1,51 @@
+"""
+合并读（singleflight）端到端测试：并发的相同 GET 请求经由路由处理函数后只产生一次上游调用。
+处理函数在线程池中执行，首个请求阻塞在上游时其余请求仍能进入并合并。
+"""
+
+import asyncio
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from backend.database import SupabaseRestClient
+from backend.routers import members
+
+CONCURRENCY = 8
+
+
+def test_concurrent_identical_gets_hit_upstream_once(monkeypatch):
+    calls = []
+    callsLock = threading.Lock()
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        with callsLock:
+            calls.append(request.url.path)
+        # 首个请求停在上游，直到其余请求都已合并到它上面（或超时）
+        deadline = time.monotonic() + 5
+        while client.stats["coalescedReads"] < CONCURRENCY - 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return httpx.Response(200, json=[])
+
+    client = SupabaseRestClient("http://upstream.test", "key", transport=httpx.MockTransport(upstream))
+    monkeypatch.setattr(members, "USE_SUPABASE", True)
+    monkeypatch.setattr(members, "supabase_client", client)
+
+    app = FastAPI()
+    app.include_router(members.router)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as http:
+            return await asyncio.gather(*(
+                http.get("/api/members/m1/credit-history") for _ in range(CONCURRENCY)
+            ))
+
+    responses = asyncio.run(run())
+
+    assert [r.status_code for r in responses] == [200] * CONCURRENCY
+    assert calls == ["/rest/v1/credit_records"]
+    assert client.stats["upstreamReads"] == 1
+    assert client.stats["coalescedReads"] == CONCURRENCY - 1
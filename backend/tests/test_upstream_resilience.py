@@ -0,0 +1,170 @@
+"""
+SupabaseRestClient 弹性行为测试：通过 httpx.MockTransport 注入 5xx、超时与连接重置，
+核对重试次数、熔断器打开与对冲请求。
+"""
+
+import threading
+import time
+
+import httpx
+import pytest
+
+from backend import database
+from backend.database import SupabaseRestClient
+from backend.resilience import CircuitBreaker, UpstreamUnavailable
+
+
+@pytest.fixture(autouse=True)
+def noBackoff(monkeypatch):
+    monkeypatch.setattr(database, "SUPABASE_RETRY_BASE", 0.0)
+
+
+def makeClient(handler, **kwargs) -> SupabaseRestClient:
+    return SupabaseRestClient("http://upstream.test", "key", transport=httpx.MockTransport(handler), **kwargs)
+
+
+def failingThenOk(failure, failures: int):
+    """前 failures 次调用以 failure 失败，之后返回一行数据"""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.method)
+        if len(calls) <= failures:
+            return failure(request)
+        return httpx.Response(200, json=[{"id": "m1"}])
+
+    return handler, calls
+
+
+def serverError(request):
+    return httpx.Response(503, json={"message": "unavailable"})
+
+
+def timeout(request):
+    raise httpx.ReadTimeout("read timed out", request=request)
+
+
+def connectionReset(request):
+    raise httpx.ReadError("[Errno 104] Connection reset by peer", request=request)
+
+
+@pytest.mark.parametrize("failure", [serverError, timeout, connectionReset])
+def test_read_retries_until_success(failure):
+    handler, calls = failingThenOk(failure, 2)
+    client = makeClient(handler)
+
+    assert client.select("members") == [{"id": "m1"}]
+    assert len(calls) == 3
+    assert client.stats["retries"] == 2
+
+
+@pytest.mark.parametrize("failure", [serverError, timeout, connectionReset])
+def test_read_gives_up_after_retry_budget(failure):
+    handler, calls = failingThenOk(failure, 10)
+    client = makeClient(handler)
+
+    with pytest.raises((httpx.HTTPStatusError, httpx.TransportError)):
+        client.select("members")
+    assert len(calls) == 1 + client.readRetries
+    assert client.stats["retries"] == client.readRetries
+
+
+def test_writes_are_not_retried():
+    handler, calls = failingThenOk(serverError, 1)
+    client = makeClient(handler)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        client.insert("members", {"id": "m1"})
+    assert calls == ["POST"]
+    assert client.stats["retries"] == 0
+
+
+def test_breaker_opens_and_rejects_without_upstream_call():
+    handler, calls = failingThenOk(connectionReset, 100)
+    client = makeClient(handler, breaker=CircuitBreaker(minCalls=4, window=4, openSeconds=60))
+    client.readRetries = 0
+
+    for _ in range(4):
+        with pytest.raises(httpx.TransportError):
+            client.select("members")
+    assert client.breaker.state == "open"
+
+    with pytest.raises(UpstreamUnavailable):
+        client.select("members")
+    assert len(calls) == 4
+    assert client.stats["rejected"] == 1
+
+
+def test_breaker_recovers_through_half_open_probe():
+    handler, calls = failingThenOk(serverError, 4)
+    breaker = CircuitBreaker(minCalls=4, window=4, openSeconds=0.05)
+    client = makeClient(handler, breaker=breaker)
+    client.readRetries = 0
+
+    for _ in range(4):
+        with pytest.raises(httpx.HTTPStatusError):
+            client.select("members")
+    assert breaker.state == "open"
+    time.sleep(0.06)
+
+    assert client.select("members") == [{"id": "m1"}]
+    assert breaker.state == "closed"
+
+
+def primeLatency(client: SupabaseRestClient, seconds: float = 0.01):
+    for _ in range(client.latency.minSamples):
+        client.latency.record(seconds)
+
+
+def test_slow_read_is_hedged_and_faster_response_wins():
+    calls = []
+    release = threading.Event()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if len(calls) == 1:
+            release.wait(2)  # 首个请求卡住，直到对冲请求返回
+            return httpx.Response(200, json=[{"id": "slow"}])
+        return httpx.Response(200, json=[{"id": "hedge"}])
+
+    client = makeClient(handler)
+    client.hedgePercentile = 50
+    primeLatency(client)
+    try:
+        assert client.select("members") == [{"id": "hedge"}]
+    finally:
+        release.set()
+    assert len(calls) == 2
+    assert client.stats["hedgedReads"] == 1
+
+
+def test_fast_read_is_not_hedged():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(200, json=[{"id": "m1"}])
+
+    client = makeClient(handler)
+    client.hedgePercentile = 50
+    primeLatency(client, seconds=1.0)
+
+    assert client.select("members") == [{"id": "m1"}]
+    assert len(calls) == 1
+    assert client.stats["hedgedReads"] == 0
+
+
+def test_hedging_disabled_without_latency_samples():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        time.sleep(0.05)
+        return httpx.Response(200, json=[])
+
+    client = makeClient(handler)
+    client.hedgePercentile = 50
+
+    assert client.select("members") == []
+    assert len(calls) == 1
+    assert client.stats["hedgedReads"] == 0
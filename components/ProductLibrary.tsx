@@ -1,6 +1,7 @@
 
 import React, { useState, useRef } from 'react';
 import { Product, ProductStatus, Member } from '../types';
+import { ApiError, productsApi, resolveAssetUrl } from '../services/api';
 import { 
   Database, Search, Filter, Archive, Users, History, BookOpen, 
   ClipboardCheck, Plus, Globe, AlertCircle, Ship, X, ExternalLink, 
@@ -14,9 +15,10 @@ interface ProductLibraryProps {
   setProducts: React.Dispatch<React.SetStateAction<Product[]>>;
   members: Member[];
   triggerCreditEvent: (userId: string, eventType: string, data?: any) => void;
+  refreshMembers?: () => void;
 }
 
-const ProductLibrary: React.FC<ProductLibraryProps> = ({ products, setProducts, members, triggerCreditEvent }) => {
+const ProductLibrary: React.FC<ProductLibraryProps> = ({ products, setProducts, members, triggerCreditEvent, refreshMembers }) => {
   const [statusFilter, setStatusFilter] = useState<'All' | 'Active' | 'Abandoned' | 'Trashed'>('All');
   const [selectedMemberId, setSelectedMemberId] = useState<string>('all');
   const [selectedProduct, setSelectedProduct] = useState<Product | null>(null);
@@ -78,7 +80,7 @@ const ProductLibrary: React.FC<ProductLibraryProps> = ({ products, setProducts,
     setShowAddModal(true);
   };
 
-  const executeClaim = (targetId: string, memberId: string) => {
+  const executeClaim = async (targetId: string, memberId: string) => {
     const member = members.find(m => m.id === memberId);
     if (!member) return;
 
@@ -87,27 +89,20 @@ const ProductLibrary: React.FC<ProductLibraryProps> = ({ products, setProducts,
       return;
     }
 
-    setProducts(prev => prev.map(p => 
-      p.id === targetId ? {
-        ...p,
-        status: ProductStatus.ACTIVE,
-        operatorId: memberId,
-        dayCount: 1,
-        history: [
-          ...(p.history || []),
-          {
-            id: Math.random().toString(36).substr(2, 9),
-            date: new Date().toISOString(),
-            dayIndex: 1,
-            content: `[系统记录] 该资产由 ${member.name} 成功认领，正式开启运营。`,
-            images: [],
-            operatorName: '系统'
-          }
-        ]
-      } : p
-    ));
-
-    triggerCreditEvent(memberId, 'PUBLIC_POOL_TAKEN', { relatedId: targetId });
+    // 领取由后端以条件更新完成并发放 PUBLIC_POOL_TAKEN，两人同时领取同一商品只有一人成功
+    try {
+      const claimed = await productsApi.claim(targetId, memberId);
+      setProducts(prev => prev.map(p => p.id === claimed.id ? claimed : p));
+      refreshMembers?.();
+    } catch (err) {
+      if (err instanceof ApiError && err.status === 409) {
+        window.alert('该资产已被其他成员抢先认领，列表已刷新。');
+        const latest = await productsApi.getById(targetId).catch(() => null);
+        if (latest) setProducts(prev => prev.map(p => p.id === latest.id ? latest : p));
+      } else {
+        window.alert(err instanceof Error ? err.message : '认领失败，请稍后重试');
+      }
+    }
     setClaimingProductId(null);
     setSelectedProduct(null);
   };
@@ -290,7 +285,7 @@ const ProductLibrary: React.FC<ProductLibraryProps> = ({ products, setProducts,
               return (
                 <div key={product.id} className={`bg-white rounded-3xl border transition-all flex flex-col overflow-hidden group ${isAbandoned ? 'border-indigo-100 hover:shadow-indigo-900/5' : isTrashed ? 'border-red-100' : 'border-slate-100'} hover:shadow-2xl hover:-translate-y-1`}>
                   <div className="relative aspect-square overflow-hidden bg-slate-50">
-                    <img src={product.image} className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-700" />
+                    <img src={resolveAssetUrl(product.image)} className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-700" />
                     {isAbandoned && <div className="absolute inset-0 bg-indigo-900/10 backdrop-blur-[2px] flex items-center justify-center"><Ship size={32} className="text-white drop-shadow-lg"/></div>}
                     {isTrashed && <div className="absolute inset-0 bg-red-900/20 backdrop-blur-[2px] flex items-center justify-center"><Trash2 size={32} className="text-white drop-shadow-lg"/></div>}
                     <div className={`absolute top-4 left-4 px-3 py-1 rounded-xl text-[9px] font-black uppercase num-font shadow-sm ${isAbandoned ? 'bg-indigo-600 text-white' : isTrashed ? 'bg-red-600 text-white' : 'bg-slate-900 text-white'}`}>
@@ -402,7 +397,7 @@ const ProductLibrary: React.FC<ProductLibraryProps> = ({ products, setProducts,
         <div className="fixed inset-0 bg-slate-900/80 backdrop-blur-md z-[150] flex items-center justify-center p-6" onClick={() => setSelectedProduct(null)}>
            <div className="bg-white w-full max-w-4xl rounded-[3rem] p-8 shadow-2xl relative flex flex-col max-h-[90vh]" onClick={e => e.stopPropagation()}>
               <div className="flex gap-6 mb-8 items-center border-b border-slate-50 pb-8">
-                 <img src={selectedProduct.image} className="w-24 h-24 rounded-3xl object-cover shadow-xl border-4 border-white" />
+                 <img src={resolveAssetUrl(selectedProduct.image)} className="w-24 h-24 rounded-3xl object-cover shadow-xl border-4 border-white" />
                  <div className="flex-1">
                     <h2 className="text-3xl font-black text-slate-800 tracking-tighter">{selectedProduct.name}</h2>
                     <p className="text-slate-400 font-bold uppercase tracking-widest text-[10px] mt-1">{selectedProduct.storeName} | ID: {selectedProduct.productId}</p>
@@ -462,7 +457,7 @@ const ProductLibrary: React.FC<ProductLibraryProps> = ({ products, setProducts,
                     }} />
                     {productForm.image ? (
                       <>
-                        <img src={productForm.image} className="w-full h-full object-cover" />
+                        <img src={resolveAssetUrl(productForm.image)} className="w-full h-full object-cover" />
                         <div className="absolute inset-0 bg-black/40 opacity-0 group-hover:opacity-100 flex flex-col items-center justify-center text-white transition-opacity">
                            <Camera size={32} />
                            <span className="text-xs font-black mt-2 uppercase tracking-widest">更换图片</span>
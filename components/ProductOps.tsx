@@ -7,6 +7,7 @@ import {
   TAO_7DAY_STRATEGY, 
   getCreditColor 
 } from '../constants';
+import { productsApi, resolveAssetUrl } from '../services/api';
 import { 
   Plus, Search, ExternalLink, Calendar, CheckCircle2, ChevronRight, 
   ArrowLeft, Camera, Send, FileText, Trash2, ShoppingBag, User, 
@@ -25,6 +26,7 @@ interface ProductOpsProps {
   setProducts: React.Dispatch<React.SetStateAction<Product[]>>;
   workspace?: WorkspaceType;
   triggerCreditEvent: (userId: string, eventType: string, data?: any) => void;
+  refreshMembers?: () => void;
 }
 
 // iOS 风格自定义下拉组件
@@ -87,7 +89,7 @@ const CustomSelect: React.FC<CustomSelectProps> = ({ label, value, options, onCh
   );
 };
 
-const ProductOps: React.FC<ProductOpsProps> = ({ members, products, setProducts, workspace, triggerCreditEvent }) => {
+const ProductOps: React.FC<ProductOpsProps> = ({ members, products, setProducts, workspace, triggerCreditEvent, refreshMembers }) => {
   const [selectedOperatorId, setSelectedOperatorId] = useState<string | null>(null);
   const [activeProduct, setActiveProduct] = useState<Product | null>(null);
   const [showAddModal, setShowAddModal] = useState(false);
@@ -248,7 +250,7 @@ const ProductOps: React.FC<ProductOpsProps> = ({ members, products, setProducts,
     setActiveProduct(updatedProduct);
   };
 
-  const handleDayComplete = () => {
+  const handleDayComplete = async () => {
     if (!activeProduct) return;
     
     let lifecycle = OPERATION_LIFECYCLE;
@@ -275,22 +277,19 @@ const ProductOps: React.FC<ProductOpsProps> = ({ members, products, setProducts,
       return;
     }
 
-    triggerCreditEvent(activeProduct.operatorId, 'DAY_COMPLETE', { 
-      day: activeProduct.dayCount, 
-      relatedId: activeProduct.id,
-      onTime: true 
-    });
-
-    const nextDay = activeProduct.dayCount + 1;
-    let status = activeProduct.status;
-    if (nextDay > maxDays) {
-      status = ProductStatus.MAINTENANCE;
-      triggerCreditEvent(activeProduct.operatorId, 'ASSET_COMPLETE', { relatedId: activeProduct.id });
-      window.alert(`${maxDays}天周期已圆满完成，现已转入“日常维护”阶段。`);
+    // 天数只由后端推进：先保存当天的任务截图，再由后端按同样的规则校验、推进并发放信用事件
+    try {
+      await productsApi.update(activeProduct.id, { taskProgress: activeProduct.taskProgress });
+      const updatedProduct = await productsApi.completeDay(activeProduct.id);
+      setProducts(prev => prev.map(p => p.id === updatedProduct.id ? updatedProduct : p));
+      setActiveProduct(updatedProduct);
+      refreshMembers?.();
+      if (updatedProduct.status === ProductStatus.MAINTENANCE) {
+        window.alert(`${maxDays}天周期已圆满完成，现已转入“日常维护”阶段。`);
+      }
+    } catch (err) {
+      window.alert(err instanceof Error ? err.message : '完成今日任务失败，请稍后重试');
     }
-    const updatedProduct = { ...activeProduct, dayCount: nextDay, status };
-    setProducts(prev => prev.map(p => p.id === activeProduct.id ? updatedProduct : p));
-    setActiveProduct(updatedProduct);
   };
 
   const handleEarlyTransition = () => {
@@ -526,7 +525,7 @@ const ProductOps: React.FC<ProductOpsProps> = ({ members, products, setProducts,
                              <div className="flex flex-wrap gap-3 pl-12 mt-2">
                                {images.map((img, imgIdx) => (
                                  <div key={imgIdx} className="relative group w-20 h-20 bg-white rounded-2xl overflow-hidden border border-slate-100">
-                                   <img src={img} className="w-full h-full object-cover cursor-zoom-in" onClick={() => setPreviewImage(img)} />
+                                   <img src={resolveAssetUrl(img)} className="w-full h-full object-cover cursor-zoom-in" onClick={() => setPreviewImage(img)} />
                                    <button onClick={() => handleDeleteImage(activeProduct.dayCount, idx, imgIdx)} className="absolute top-1 right-1 p-1 bg-red-500 text-white rounded-lg opacity-0 group-hover:opacity-100 transition-opacity"><Trash size={10} /></button>
                                  </div>
                                ))}
@@ -636,7 +635,7 @@ const ProductOps: React.FC<ProductOpsProps> = ({ members, products, setProducts,
                                                                {tImages.map((img, imgIdx) => (
                                                                  <img 
                                                                    key={imgIdx} 
-                                                                   src={img} 
+                                                                   src={resolveAssetUrl(img)} 
                                                                    className="w-12 h-12 object-cover rounded-lg border border-white cursor-zoom-in hover:scale-110 transition-transform shadow-sm" 
                                                                    onClick={() => setPreviewImage(img)}
                                                                  />
@@ -747,7 +746,7 @@ const ProductOps: React.FC<ProductOpsProps> = ({ members, products, setProducts,
           <div className="lg:col-span-1 space-y-8 relative z-10">
              <div className="bg-white p-8 rounded-[2.5rem] border border-slate-100 shadow-sm sticky top-8 z-20">
                 <div className="h-64 -mx-8 -mt-8 mb-8 overflow-hidden group">
-                  <img src={activeProduct.image} className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-700" />
+                  <img src={resolveAssetUrl(activeProduct.image)} className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-700" />
                   <div className="absolute inset-0 bg-gradient-to-t from-black/40 to-transparent opacity-0 group-hover:opacity-100 transition-opacity"></div>
                 </div>
                 <h2 className="font-black text-2xl text-slate-800 mb-6 flex items-center gap-2 leading-tight">
@@ -823,7 +822,7 @@ const ProductOps: React.FC<ProductOpsProps> = ({ members, products, setProducts,
         
         {previewImage && (
           <div className="fixed inset-0 bg-slate-900/95 z-[200] flex items-center justify-center p-10 cursor-zoom-out" onClick={() => setPreviewImage(null)}>
-            <img src={previewImage} className="max-w-full max-h-full rounded-3xl shadow-2xl" />
+            <img src={resolveAssetUrl(previewImage)} className="max-w-full max-h-full rounded-3xl shadow-2xl" />
           </div>
         )}
         
@@ -913,7 +912,7 @@ const ProductOps: React.FC<ProductOpsProps> = ({ members, products, setProducts,
         {filteredProducts.map(product => (
           <div key={product.id} onClick={() => setActiveProduct(product)} className="bg-white rounded-[2.5rem] border border-gray-100 shadow-sm overflow-hidden hover:shadow-2xl transition-all cursor-pointer group">
             <div className="relative h-56 overflow-hidden">
-              <img src={product.image} className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-700" />
+              <img src={resolveAssetUrl(product.image)} className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-700" />
               <div className="absolute top-5 left-5 px-4 py-2 bg-black/60 backdrop-blur-md rounded-2xl text-white text-[10px] font-black uppercase tracking-widest">
                 {product.status === ProductStatus.MAINTENANCE ? '🔥 爆款维护中' : `🏃 D${product.dayCount} 快速起航`}
               </div>
@@ -946,7 +945,7 @@ const ProductOps: React.FC<ProductOpsProps> = ({ members, products, setProducts,
             <div className="grid grid-cols-1 md:grid-cols-2 gap-10">
               <div className="space-y-6">
                 <div onClick={() => mainImageInputRef.current?.click()} className="group relative flex flex-col items-center p-8 border-4 border-dashed border-slate-100 rounded-[2.5rem] bg-slate-50 hover:border-blue-400 transition-all cursor-pointer overflow-hidden">
-                   <img src={newProduct.image} className="w-40 h-40 object-cover rounded-[2rem] shadow-2xl mb-6" />
+                   <img src={resolveAssetUrl(newProduct.image)} className="w-40 h-40 object-cover rounded-[2rem] shadow-2xl mb-6" />
                    <div className="flex items-center gap-2 text-blue-600 font-black text-sm uppercase"><Upload size={16} /> 点击上传产品主图</div>
                 </div>
                 {/* 替换为 iOS 风格下拉框 */}
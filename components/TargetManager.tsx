@@ -1,6 +1,7 @@
 
-import React, { useState, useMemo, useRef, useEffect } from 'react';
+import React, { useState, useMemo, useRef } from 'react';
 import { Target, Member, TargetType, WorkspaceType } from '../types';
+import { resolveAssetUrl } from '../services/api';
 import { 
   Target as TargetIcon, 
   CheckCircle2, 
@@ -281,42 +282,6 @@ const TargetManager: React.FC<TargetManagerProps> = ({ targets, setTargets, memb
     }
   }, [timeGrain, timeOffset]);
 
-  useEffect(() => {
-    const now = new Date();
-    const currentWeekKey = `W${activeRange.start.getFullYear()}-${Math.ceil((activeRange.start.getDate() + 6) / 7)}`;
-
-    members.forEach(member => {
-      const weeklyTargets = targets.filter(t => 
-        t.operatorId === member.id && 
-        new Date(t.deadline) >= activeRange.start && 
-        new Date(t.deadline) <= activeRange.end
-      );
-      
-      if (weeklyTargets.length < 5 && timeGrain === 'week' && timeOffset === 0) {
-        triggerCreditEvent(member.id, 'WEEKLY_GOAL_COUNT_INSUFFICIENT', { 
-          count: weeklyTargets.length,
-          cycleKey: currentWeekKey 
-        });
-      }
-
-      targets.forEach(target => {
-        if (target.operatorId === member.id && !target.completedAt) {
-          const deadline = new Date(target.deadline);
-          if (now > deadline) {
-            const diffDays = Math.floor((now.getTime() - deadline.getTime()) / (1000 * 60 * 60 * 24));
-            const cycleId = Math.floor(diffDays / 3);
-            if (cycleId >= 0) {
-              triggerCreditEvent(member.id, 'GOAL_OVERDUE_PENALTY', {
-                relatedId: target.id,
-                cycleKey: `cycle-${cycleId}`
-              });
-            }
-          }
-        }
-      });
-    });
-  }, [targets, members, activeRange, timeGrain, timeOffset, triggerCreditEvent]);
-
   const filteredTargets = useMemo(() => {
     return targets.filter(t => {
       const memberMatch = selectedMemberId === 'all' || t.operatorId === selectedMemberId;
@@ -594,7 +559,7 @@ const TargetManager: React.FC<TargetManagerProps> = ({ targets, setTargets, memb
                              <div className="mt-3 flex flex-wrap gap-1.5">
                                {target.completionImages.slice(0, 3).map((img, idx) => (
                                  <div key={idx} className="w-8 h-8 rounded-md overflow-hidden border border-white shadow-sm">
-                                   <img src={img} className="w-full h-full object-cover" alt="" />
+                                   <img src={resolveAssetUrl(img)} className="w-full h-full object-cover" alt="" />
                                  </div>
                                ))}
                                {target.completionImages.length > 3 && (
@@ -692,7 +657,7 @@ const TargetManager: React.FC<TargetManagerProps> = ({ targets, setTargets, memb
                <div className="flex flex-wrap gap-3">
                   {completionImages.map((img, idx) => (
                     <div key={idx} className="relative group w-20 h-20 bg-slate-50 rounded-2xl overflow-hidden border border-slate-100 shadow-sm">
-                       <img src={img} className="w-full h-full object-cover" alt="" />
+                       <img src={resolveAssetUrl(img)} className="w-full h-full object-cover" alt="" />
                        <button onClick={() => removeCompletionImage(idx)} className="absolute top-1 right-1 p-1 bg-red-500 text-white rounded-lg opacity-0 group-hover:opacity-100 transition-opacity"><Trash2 size={10} /></button>
                     </div>
                   ))}
@@ -746,7 +711,7 @@ const TargetManager: React.FC<TargetManagerProps> = ({ targets, setTargets, memb
                       <div className="grid grid-cols-2 md:grid-cols-3 lg:grid-cols-4 gap-6">
                          {detailTarget.completionImages.map((img, idx) => (
                            <div key={idx} className="group relative aspect-[4/3] rounded-3xl overflow-hidden shadow-sm hover:shadow-2xl transition-all cursor-zoom-in bg-slate-50 border border-slate-100" onClick={() => setPreviewImage(img)}>
-                              <img src={img} className="w-full h-full object-cover group-hover:scale-105 transition-transform duration-500" alt="" />
+                              <img src={resolveAssetUrl(img)} className="w-full h-full object-cover group-hover:scale-105 transition-transform duration-500" alt="" />
                               <div className="absolute inset-0 bg-black/0 group-hover:bg-black/20 transition-all flex items-center justify-center"><Maximize2 className="text-white opacity-0 group-hover:opacity-100 scale-50 group-hover:scale-100 transition-all" size={32} /></div>
                            </div>
                          ))}
@@ -763,7 +728,7 @@ const TargetManager: React.FC<TargetManagerProps> = ({ targets, setTargets, memb
 
       {previewImage && (
         <div className="fixed inset-0 bg-slate-900/98 z-[300] flex items-center justify-center p-10 cursor-zoom-out animate-in fade-in duration-300" onClick={() => setPreviewImage(null)}>
-           <img src={previewImage} className="max-w-full max-h-full rounded-2xl shadow-2xl border-4 border-white/10" alt="Preview" />
+           <img src={resolveAssetUrl(previewImage)} className="max-w-full max-h-full rounded-2xl shadow-2xl border-4 border-white/10" alt="Preview" />
            <button className="absolute top-10 right-10 text-white/50 hover:text-white transition-colors bg-white/10 p-4 rounded-full backdrop-blur-md"><X size={40} /></button>
         </div>
       )}
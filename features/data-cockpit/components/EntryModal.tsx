@@ -1,9 +1,9 @@
 
 import React, { useState, useMemo } from 'react';
-import { Product, Member, AIDiagnosis } from '../../../types.ts';
+import { Product, Member, AIDiagnosis, DailyAnalysisRecord } from '../../../types.ts';
 import { DetailedAnalysisRecord, AIReport } from '../types.ts';
+import { DiagnosisJob, diagnosisApi, productsApi, resolveAssetUrl } from '../../../services/api.ts';
 import { X, Calendar, Target, BarChart3, Users, SearchCode, Zap, ChevronRight, Activity, Info, BrainCircuit, Loader2, Percent, Wallet, MousePointerClick, TrendingUp, TrendingDown, History, ShieldAlert, Sparkles, Layout, BarChart2, CheckCircle2, LineChart as LucideLineChart, Layers } from 'lucide-react';
-import { GoogleGenAI, Type } from "@google/genai";
 import TrendCharts from './TrendCharts.tsx';
 import { LineChart, Line, ResponsiveContainer } from 'recharts';
 
@@ -62,10 +62,22 @@ const EntryModal: React.FC<EntryModalProps> = ({ product, onClose, setProducts,
     return Math.abs((current - prev) / prev) > 0.3;
   };
 
+  // 后端诊断任务的轮询间隔与最长等待次数
+  const POLL_INTERVAL_MS = 1000;
+  const POLL_MAX_ATTEMPTS = 60;
+
+  const waitForDiagnosis = async (jobId: string): Promise<DiagnosisJob> => {
+    for (let i = 0; i < POLL_MAX_ATTEMPTS; i++) {
+      const job = await diagnosisApi.getJob(jobId);
+      if (job.status === 'done' || job.status === 'failed') return job;
+      await new Promise(resolve => setTimeout(resolve, POLL_INTERVAL_MS));
+    }
+    throw new Error('诊断超时，请稍后在数据记录中查看结果');
+  };
+
   const saveAndAnalyze = async () => {
     setIsAiLoading(true);
-    const ai = new GoogleGenAI({ apiKey: process.env.API_KEY });
-    
+
     const record: DetailedAnalysisRecord = {
       id: Math.random().toString(36).substr(2, 9),
       productId: product.id,
@@ -74,35 +86,42 @@ const EntryModal: React.FC<EntryModalProps> = ({ product, onClose, setProducts,
       ...form,
       ...indicators
     };
+    // 诊断由后端任务队列批量生成：先把当日核心指标写入 analysisRecords，再提交任务并轮询结果
+    const daily: DailyAnalysisRecord = {
+      id: record.id,
+      productId: product.id,
+      date: todayStr,
+      uv: form.site.visitors,
+      payUsers: form.site.buyers,
+      gmv: form.site.amount,
+      adCost: form.site.spend,
+      cvr: indicators.siteCVR,
+      roi: indicators.siteROI,
+    };
 
     try {
-      const response = await ai.models.generateContent({
-        model: 'gemini-3-pro-preview',
-        contents: `分析商品数据：全站CVR ${indicators.siteCVR}%, ROI ${indicators.siteROI}。`,
-        config: {
-          responseMimeType: "application/json",
-          responseSchema: {
-            type: Type.OBJECT,
-            properties: {
-              score: { type: Type.NUMBER },
-              summary: { type: Type.STRING },
-              suggestion: { type: Type.STRING },
-              alertLevel: { type: Type.STRING },
-              actionPriority: { type: Type.STRING }
-            }
-          }
-        }
-      });
-      
-      const diagnosis = JSON.parse(response.text);
-      const report: AIReport = { ...diagnosis, timestamp: new Date().toISOString() };
+      // 首屏列表（/api/bootstrap）不含 analysisRecords，追加前先读取完整商品，避免覆盖已有记录
+      const current = product.analysisRecords ? product : await productsApi.getById(product.id);
+      await productsApi.update(product.id, { analysisRecords: [...(current.analysisRecords || []), daily] }, current.version);
+      const { jobs } = await diagnosisApi.submit(product.id, [daily.id]);
+      const job = await waitForDiagnosis(jobs[0].jobId);
+      if (job.status === 'failed' || !job.diagnosis) throw new Error(job.error || '诊断失败');
+
+      const priority = { critical: 'emergency', warning: 'adjust', normal: 'observe' } as const;
+      const report: AIReport = {
+        ...job.diagnosis,
+        actionPriority: priority[job.diagnosis.alertLevel],
+        timestamp: job.finishedAt || new Date().toISOString(),
+      };
       setAiResult(report);
       record.aiDiagnosis = report;
 
+      // 重新读取商品，取得后端写回诊断后的 analysisRecords 与最新版本号
+      const saved = await productsApi.getById(product.id);
       setProducts(prev => prev.map(p => {
         if (p.id === product.id) {
           const updatedRecords = [...((p as any).detailedRecords || []), record];
-          return { ...p, lastUpdateDate: todayStr, detailedRecords: updatedRecords } as any;
+          return { ...p, ...saved, lastUpdateDate: todayStr, detailedRecords: updatedRecords } as any;
         }
         return p;
       }));
@@ -163,7 +182,7 @@ const EntryModal: React.FC<EntryModalProps> = ({ product, onClose, setProducts,
         <header className="flex justify-between items-center px-12 py-8 border-b border-white/10 bg-white/5 shrink-0">
           <div className="flex items-center gap-8">
             <div className="relative">
-              <img src={product.image} className="w-20 h-20 rounded-[2rem] object-cover shadow-2xl border-2 border-white/20" />
+              <img src={resolveAssetUrl(product.image)} className="w-20 h-20 rounded-[2rem] object-cover shadow-2xl border-2 border-white/20" />
               <div className="absolute -bottom-2 -right-2 bg-blue-600 text-white p-2 rounded-xl border border-white/10 shadow-lg">
                 <Activity size={16} className="animate-pulse" />
               </div>
@@ -1,6 +1,7 @@
 
 import React, { useState, useMemo } from 'react';
 import { Product, Member, ProductStatus } from '../../types.ts';
+import { resolveAssetUrl } from '../../services/api.ts';
 import { Search, Activity, LayoutGrid, AlertCircle, CheckCircle2, TrendingUp } from 'lucide-react';
 import EntryModal from './components/EntryModal.tsx';
 
@@ -75,7 +76,7 @@ const DataCockpit: React.FC<DataCockpitProps> = ({ products, setProducts, member
               className={`group glass-panel rounded-[2.5rem] overflow-hidden flex flex-col cursor-pointer hover:shadow-2xl hover:-translate-y-2 transition-all duration-500 border-2 ${isPending ? 'border-rose-400/30 animate-pulse ring-4 ring-rose-400/10' : 'border-emerald-400/20 ring-4 ring-emerald-400/5'}`}
             >
               <div className="aspect-square overflow-hidden bg-slate-100 relative">
-                <img src={p.image} className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-700" alt={p.name} />
+                <img src={resolveAssetUrl(p.image)} className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-700" alt={p.name} />
                 <div className="absolute top-4 right-4">
                   {isPending ? (
                     <div className="w-10 h-10 bg-rose-500 text-white rounded-2xl flex items-center justify-center shadow-lg animate-bounce">
@@ -1,11 +1,14 @@
 /**
  * 认证状态管理 Hook。
- * 管理 JWT token 存储、登录/登出、用户信息获取。
- * Token 持久化到 localStorage，刷新页面后自动恢复登录态。
+ * 管理 JWT token 存储、登录/登出、用户信息获取，以及当前工作区与首屏数据。
+ * Token 与所选工作区持久化到 localStorage，刷新页面后自动恢复登录态。
+ * 首屏数据（当前用户、成员、商品、目标）由一次 /api/bootstrap 请求取回，
+ * 记住了上次工作区时恢复登录也走同一请求，不再单独请求 /auth/me。
  */
 
-import { useState, useEffect, useCallback } from 'react';
-import { authApi, setAuthToken } from '../services/api';
+import { useState, useEffect, useCallback, useRef } from 'react';
+import { WorkspaceType } from '../types';
+import { authApi, bootstrapApi, BootstrapResponse, setAuthToken } from '../services/api';
 
 export interface AuthUser {
     id: string;
@@ -19,16 +22,32 @@ interface UseAuthReturn {
     isAuthenticated: boolean;
     isLoading: boolean;
     loginError: string | null;
+    workspace: WorkspaceType | null;
+    bootstrap: BootstrapResponse | null;
     login: (username: string, password: string) => Promise<boolean>;
     logout: () => void;
+    setWorkspace: (workspace: WorkspaceType | null) => void;
 }
 
 const TOKEN_KEY = 'bossops_auth_token';
+const WORKSPACE_KEY = 'bossops_workspace';
 
 export function useAuth(): UseAuthReturn {
     const [user, setUser] = useState<AuthUser | null>(null);
     const [isLoading, setIsLoading] = useState(true);
     const [loginError, setLoginError] = useState<string | null>(null);
+    const [workspace, setWorkspaceState] = useState<WorkspaceType | null>(null);
+    const [bootstrap, setBootstrap] = useState<BootstrapResponse | null>(null);
+    // 最近一次请求的工作区，快速切换时丢弃过期的响应
+    const requestedWorkspace = useRef<WorkspaceType | null>(null);
+
+    const loadBootstrap = useCallback(async (ws: WorkspaceType) => {
+        requestedWorkspace.current = ws;
+        const data = await bootstrapApi.get(ws);
+        if (requestedWorkspace.current !== ws) return;
+        setUser(data.user);
+        setBootstrap(data);
+    }, []);
 
     /**
      * 初始化时检查 localStorage 中是否有有效 token，
@@ -38,21 +57,22 @@ export function useAuth(): UseAuthReturn {
         const savedToken = localStorage.getItem(TOKEN_KEY);
         if (savedToken) {
             setAuthToken(savedToken);
-            authApi
-                .me()
-                .then((userData) => {
-                    setUser(userData);
-                })
+            const savedWorkspace = localStorage.getItem(WORKSPACE_KEY) as WorkspaceType | null;
+            const restore = savedWorkspace
+                ? loadBootstrap(savedWorkspace).then(() => setWorkspaceState(savedWorkspace))
+                : authApi.me().then((userData) => setUser(userData));
+            restore
                 .catch(() => {
                     // token 无效或过期，清除本地存储
                     localStorage.removeItem(TOKEN_KEY);
+                    localStorage.removeItem(WORKSPACE_KEY);
                     setAuthToken('');
                 })
                 .finally(() => setIsLoading(false));
         } else {
             setIsLoading(false);
         }
-    }, []);
+    }, [loadBootstrap]);
 
     const login = useCallback(async (username: string, password: string): Promise<boolean> => {
         setLoginError(null);
@@ -68,10 +88,25 @@ export function useAuth(): UseAuthReturn {
         }
     }, []);
 
+    const setWorkspace = useCallback((ws: WorkspaceType | null) => {
+        setWorkspaceState(ws);
+        if (ws) {
+            localStorage.setItem(WORKSPACE_KEY, ws);
+            loadBootstrap(ws).catch((err) => console.error('加载首屏数据失败:', err));
+        } else {
+            requestedWorkspace.current = null;
+            localStorage.removeItem(WORKSPACE_KEY);
+        }
+    }, [loadBootstrap]);
+
     const logout = useCallback(() => {
         localStorage.removeItem(TOKEN_KEY);
+        localStorage.removeItem(WORKSPACE_KEY);
         setAuthToken('');
         setUser(null);
+        requestedWorkspace.current = null;
+        setWorkspaceState(null);
+        setBootstrap(null);
     }, []);
 
     return {
@@ -79,7 +114,10 @@ export function useAuth(): UseAuthReturn {
         isAuthenticated: !!user,
         isLoading,
         loginError,
+        workspace,
+        bootstrap,
         login,
         logout,
+        setWorkspace,
     };
 }
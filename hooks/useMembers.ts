@@ -1,15 +1,16 @@
 /**
  * 团队成员数据管理 Hook。
  * 封装成员的加载、新增、更新、删除操作，统一管理加载与错误状态。
+ * 首屏成员由 /api/bootstrap 一并返回（见 useAuth），fetchMembers 用于之后的刷新。
  */
 
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useCallback } from 'react';
 import { Member } from '../types';
 import { membersApi } from '../services/api';
 
 export function useMembers() {
     const [members, setMembers] = useState<Member[]>([]);
-    const [loading, setLoading] = useState(true);
+    const [loading, setLoading] = useState(false);
     const [error, setError] = useState<string | null>(null);
 
     const fetchMembers = useCallback(async () => {
@@ -25,10 +26,6 @@ export function useMembers() {
         }
     }, []);
 
-    useEffect(() => {
-        fetchMembers();
-    }, [fetchMembers]);
-
     const createMember = useCallback(async (data: { name: string; avatar?: string; role: string; contact: string }) => {
         const created = await membersApi.create(data);
         setMembers(prev => [...prev, created]);
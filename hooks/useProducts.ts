@@ -1,9 +1,10 @@
 /**
  * 商品数据管理 Hook。
  * 按工作区加载商品，提供 CRUD 操作并自动同步后端。
+ * 首屏商品由 /api/bootstrap 一并返回（见 useAuth），fetchProducts 用于之后的刷新。
  */
 
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useCallback } from 'react';
 import { Product, WorkspaceType } from '../types';
 import { productsApi } from '../services/api';
 
@@ -24,10 +25,6 @@ export function useProducts(workspace: WorkspaceType | null) {
         }
     }, [workspace]);
 
-    useEffect(() => {
-        fetchProducts();
-    }, [fetchProducts]);
-
     /**
      * 兼容旧组件的 setProducts 接口。
      * 接受数组或回调函数，更新本地状态。
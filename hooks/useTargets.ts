@@ -1,9 +1,10 @@
 /**
  * 致富目标数据管理 Hook。
  * 按工作区加载目标，提供 CRUD 操作并自动同步后端。
+ * 首屏目标由 /api/bootstrap 一并返回（见 useAuth），fetchTargets 用于之后的刷新。
  */
 
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useCallback } from 'react';
 import { Target, WorkspaceType } from '../types';
 import { targetsApi } from '../services/api';
 
@@ -24,10 +25,6 @@ export function useTargets(workspace: WorkspaceType | null) {
         }
     }, [workspace]);
 
-    useEffect(() => {
-        fetchTargets();
-    }, [fetchTargets]);
-
     /**
      * 兼容旧组件的 setTargets 接口。
      */
@@ -4,7 +4,7 @@
  * 支持 JWT token 自动附加到请求头。
  */
 
-import { Member, Product, Target, CreditRecord } from '../types';
+import { Member, Product, Target, CreditRecord, AIDiagnosis } from '../types';
 
 // 本地开发走 Vite 代理 (/api)，生产环境通过 VITE_API_BASE_URL 指向 Render 后端
 const BASE_URL = import.meta.env.VITE_API_BASE_URL || '/api';
@@ -24,10 +24,19 @@ interface RequestOptions {
   method?: string;
   body?: unknown;
   params?: Record<string, string>;
+  headers?: Record<string, string>;
+}
+
+/** 请求失败时抛出，携带 HTTP 状态码，调用方可据此区分冲突（409）等情况 */
+export class ApiError extends Error {
+  constructor(message: string, public status: number) {
+    super(message);
+    this.name = 'ApiError';
+  }
 }
 
 async function request<T>(endpoint: string, options: RequestOptions = {}): Promise<T> {
-  const { method = 'GET', body, params } = options;
+  const { method = 'GET', body, params, headers: extraHeaders } = options;
 
   let url = `${BASE_URL}${endpoint}`;
   if (params) {
@@ -37,6 +46,7 @@ async function request<T>(endpoint: string, options: RequestOptions = {}): Promi
 
   const headers: Record<string, string> = {
     'Content-Type': 'application/json',
+    ...extraHeaders,
   };
 
   // 有 token 时自动附加 Authorization 请求头
@@ -52,11 +62,16 @@ async function request<T>(endpoint: string, options: RequestOptions = {}): Promi
   const res = await fetch(url, fetchOptions);
   if (!res.ok) {
     const errorData = await res.json().catch(() => ({}));
-    throw new Error(errorData.detail || `请求失败: ${res.status}`);
+    throw new ApiError(errorData.detail || `请求失败: ${res.status}`, res.status);
   }
   return res.json();
 }
 
+/** 乐观并发：携带读到的版本号，服务端版本不符时返回 409 */
+function ifMatch(version?: number): Record<string, string> | undefined {
+  return version === undefined ? undefined : { 'If-Match': `"${version}"` };
+}
+
 // ============== Auth ==============
 
 interface LoginResponse {
@@ -93,8 +108,31 @@ export const authApi = {
 
 // ============== Members ==============
 
+export interface LeaderboardEntry {
+  id: string;
+  name: string;
+  role: string;
+  creditScore: number;
+  rank: number;
+}
+
+export interface LeaderboardResponse {
+  total: number;
+  top: LeaderboardEntry[];
+  member?: LeaderboardEntry;
+  around?: LeaderboardEntry[];
+}
+
 export const membersApi = {
   getAll: () => request<Member[]>('/members'),
+  leaderboard: (params: { top?: number; memberId?: string; radius?: number } = {}) =>
+    request<LeaderboardResponse>('/members/leaderboard', {
+      params: Object.fromEntries(
+        Object.entries(params)
+          .filter(([, v]) => v !== undefined)
+          .map(([k, v]) => [k, String(v)])
+      ),
+    }),
   create: (data: { name: string; avatar?: string; role: string; contact: string; username?: string; password?: string; accountRole?: string }) =>
     request<Member>('/members', { method: 'POST', body: data }),
   update: (id: string, data: Partial<Member>) =>
@@ -105,17 +143,51 @@ export const membersApi = {
 
 // ============== Products ==============
 
+export interface ProductFilters {
+  operatorId?: string;
+  status?: string;
+  excludeStatus?: string;
+  lifecycleStage?: string;
+}
+
+export interface AlertScanResult {
+  scanned: number;
+  changed: number;
+  normal: number;
+  warning: number;
+  critical: number;
+  alerts: { id: string; alertLevel: 'warning' | 'critical'; reasons: string[] }[];
+}
+
 export const productsApi = {
-  getAll: (workspace: string) =>
-    request<Product[]>('/products', { params: { workspace } }),
+  getAll: (workspace: string, filters: ProductFilters = {}) =>
+    request<Product[]>('/products', {
+      params: {
+        workspace,
+        ...Object.fromEntries(Object.entries(filters).filter(([, v]) => v !== undefined)),
+      },
+    }),
   getById: (id: string) =>
     request<Product>(`/products/${id}`),
   create: (data: Partial<Product> & { workspace: string }) =>
     request<Product>('/products', { method: 'POST', body: data }),
-  update: (id: string, data: Partial<Product>) =>
-    request<Product>(`/products/${id}`, { method: 'PUT', body: data }),
+  // 传入 version 时为条件更新，数据已被他人修改会抛出 409 错误
+  update: (id: string, data: Partial<Product>, version?: number) =>
+    request<Product>(`/products/${id}`, { method: 'PUT', body: data, headers: ifMatch(version) }),
   delete: (id: string) =>
     request<{ ok: boolean }>(`/products/${id}`, { method: 'DELETE' }),
+  getPool: (workspace: string, limit?: number) =>
+    request<Product[]>('/products/pool', { params: limit ? { workspace, limit: String(limit) } : { workspace } }),
+  claim: (id: string, memberId: string) =>
+    request<Product>(`/products/${id}/claim`, { method: 'POST', body: { memberId } }),
+  // 完成当天运营任务：服务端校验截图并推进天数、发放 DAY_COMPLETE / ASSET_COMPLETE
+  completeDay: (id: string) =>
+    request<Product>(`/products/${id}/complete-day`, { method: 'POST' }),
+  claimNext: (workspace: string, memberId: string) =>
+    request<Product>('/products/pool/claim', { method: 'POST', body: { memberId, workspace } }),
+  // 立即执行预警扫描，只有级别变化的商品会被写回
+  scanAlerts: (workspace: string) =>
+    request<AlertScanResult>('/products/alerts/scan', { method: 'POST', params: { workspace } }),
 };
 
 // ============== Targets ==============
@@ -125,12 +197,88 @@ export const targetsApi = {
     request<Target[]>('/targets', { params: { workspace } }),
   create: (data: Partial<Target> & { workspace: string }) =>
     request<Target>('/targets', { method: 'POST', body: data }),
-  update: (id: string, data: Partial<Target>) =>
-    request<Target>(`/targets/${id}`, { method: 'PUT', body: data }),
+  update: (id: string, data: Partial<Target>, version?: number) =>
+    request<Target>(`/targets/${id}`, { method: 'PUT', body: data, headers: ifMatch(version) }),
   delete: (id: string) =>
     request<{ ok: boolean }>(`/targets/${id}`, { method: 'DELETE' }),
 };
 
+// ============== Bootstrap ==============
+
+/** 首屏聚合数据；products 不含 analysisRecords，需要时通过 productsApi.getById 读取 */
+export interface BootstrapResponse {
+  user: AuthUserResponse;
+  workspace: string;
+  members: Member[];
+  products: Product[];
+  targets: Target[];
+}
+
+export const bootstrapApi = {
+  get: (workspace: string) =>
+    request<BootstrapResponse>('/bootstrap', { params: { workspace } }),
+};
+
+// ============== Blobs ==============
+
+export interface BlobMeta {
+  hash: string;
+  ref: string;
+  size: number;
+  contentType: string;
+}
+
+/**
+ * 将后端返回的图片短引用（/api/blobs/<hash>）解析为可直接使用的 URL。
+ * 后端部署在其他域名时补全 BASE_URL；其他 URL / data URL 原样返回。
+ */
+export function resolveAssetUrl(ref: string | undefined, variant?: 'sm' | 'md'): string {
+  if (!ref || !ref.startsWith('/api/blobs/')) return ref || '';
+  const url = `${BASE_URL}${ref.slice('/api'.length)}`;
+  return variant ? `${url}?variant=${variant}` : url;
+}
+
+export const blobsApi = {
+  upload: async (file: Blob): Promise<BlobMeta> => {
+    const res = await fetch(`${BASE_URL}/blobs`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': file.type || 'application/octet-stream',
+        ...(authToken ? { Authorization: `Bearer ${authToken}` } : {}),
+      },
+      body: file,
+    });
+    if (!res.ok) {
+      const errorData = await res.json().catch(() => ({}));
+      throw new Error(errorData.detail || `上传失败: ${res.status}`);
+    }
+    return res.json();
+  },
+};
+
+// ============== Diagnosis ==============
+
+export interface DiagnosisJob {
+  jobId: string;
+  productId: string;
+  recordId: string;
+  status: 'queued' | 'running' | 'done' | 'failed';
+  diagnosis: AIDiagnosis | null;
+  error: string | null;
+  createdAt: string;
+  finishedAt: string | null;
+}
+
+export const diagnosisApi = {
+  /** 为商品的分析记录排队诊断；不传 recordIds 时诊断所有尚无诊断的记录 */
+  submit: (productId: string, recordIds?: string[], force = false) =>
+    request<{ jobs: DiagnosisJob[] }>(`/diagnosis/products/${productId}`, {
+      method: 'POST',
+      body: { recordIds, force },
+    }),
+  getJob: (jobId: string) => request<DiagnosisJob>(`/diagnosis/jobs/${jobId}`),
+};
+
 // ============== Credits ==============
 
 export interface TriggerCreditBody {
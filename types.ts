@@ -88,6 +88,8 @@ export interface Product {
   lifecycleStage?: LifecycleStage;
   lastUpdateDate?: string;
   analysisRecords?: DailyAnalysisRecord[];
+  alertLevel?: 'normal' | 'warning' | 'critical' | null; // 每日预警扫描结果，由后端写入
+  version?: number; // 乐观并发版本号，由后端在每次写入时递增
 }
 
 export type TargetType = 
@@ -104,6 +106,7 @@ export interface Target {
   completionNote?: string;
   completionImages?: string[];
   operatorId: string;
+  version?: number;
 }
 
 // AI Visual Lab Engineering Types